@@ -0,0 +1,101 @@
+"""
+iMessage attributedBody Decoding
+Recovers message text that chat.db stores only in message.attributedBody
+
+Since macOS Ventura, many messages have a NULL text column and keep their
+content in attributedBody: an NSAttributedString serialized with
+NSArchiver's "typedstream" format. The plain string is the first object
+in the stream:
+
+    ...NSString \\x01 \\x94 \\x84 \\x01 + <length> <UTF-8 bytes> \\x86 ...
+
+where + is the C-string type code and <length> is a typedstream integer
+(one byte below 0x80, or 0x81 + int16 / 0x82 + int32, little-endian).
+Only the bytes up to the end of that string are looked at; attribute
+runs and dictionaries after it are never parsed.
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+
+from config import ATTRIBUTED_BODY_CACHE_SIZE
+
+_STRING_HEADER = re.compile(rb'NS(?:Mutable)?String.{1,4}?\x84\x01\+', re.DOTALL)
+
+# Attachment placeholder left in the text where an image or file was
+OBJECT_REPLACEMENT = '\ufffc'
+
+
+def decode_attributed_body(blob: Optional[bytes]) -> Optional[str]:
+    """Return the plain text of an attributedBody blob, or None"""
+    if not blob:
+        return None
+
+    match = _STRING_HEADER.search(blob)
+    if not match:
+        return None
+
+    pos = match.end()
+    if pos >= len(blob):
+        return None
+
+    tag = blob[pos]
+    if tag < 0x80:
+        length, pos = tag, pos + 1
+    elif tag == 0x81:
+        length, pos = int.from_bytes(blob[pos + 1:pos + 3], 'little'), pos + 3
+    elif tag == 0x82:
+        length, pos = int.from_bytes(blob[pos + 1:pos + 5], 'little'), pos + 5
+    else:
+        return None
+
+    if pos + length > len(blob):
+        return None
+
+    text = blob[pos:pos + length].decode('utf-8', 'replace').replace(OBJECT_REPLACEMENT, '').strip()
+    return text or None
+
+
+class AttributedBodyCache:
+    """
+    Cache of decoded text by chat.db ROWID
+
+    The sync reader and the search index often see the same rows in one
+    process, so each blob is decoded once. The blob's length is part of
+    the key, so a reused ROWID after a chat.db rebuild doesn't return
+    another message's text. Oldest entries are evicted first; single dict
+    operations are atomic, so no lock is needed across threads.
+    """
+
+    def __init__(self, maxsize: int = ATTRIBUTED_BODY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: Dict[Tuple[int, int], Optional[str]] = {}
+
+    def get(self, rowid: int, blob: Optional[bytes]) -> Optional[str]:
+        if not blob:
+            return None
+
+        key = (rowid, len(blob))
+        try:
+            return self._entries[key]
+        except KeyError:
+            pass
+
+        text = decode_attributed_body(blob)
+        if len(self._entries) >= self.maxsize:
+            try:
+                del self._entries[next(iter(self._entries))]
+            except (KeyError, StopIteration, RuntimeError):
+                pass
+        self._entries[key] = text
+        return text
+
+
+_cache = AttributedBodyCache()
+
+
+def message_text(rowid: int, text: Optional[str], attributed_body: Optional[bytes]) -> Optional[str]:
+    """A message's text, falling back to its decoded attributedBody"""
+    if text:
+        return text
+    return _cache.get(rowid, attributed_body)
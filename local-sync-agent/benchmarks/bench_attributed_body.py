@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark attributedBody decoding on a synthetic corpus
+
+Builds typedstream blobs shaped like the ones in chat.db (short texts,
+long texts that need 16-bit lengths, emoji, attachment placeholders)
+and measures cold decoding and cache hits.
+
+    python benchmarks/bench_attributed_body.py --messages 200000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attributed_body import AttributedBodyCache, decode_attributed_body
+
+HEADER = (
+    b'\x04\x0bstreamtyped\x81\xe8\x03\x84\x01@\x84\x84\x84\x12NSAttributedString\x00'
+    b'\x84\x84\x08NSObject\x00\x85\x92\x84\x84\x84\x08NSString\x01\x94\x84\x01+'
+)
+TRAILER = (
+    b'\x86\x84\x02iI\x01\x05\x92\x84\x84\x84\x0cNSDictionary\x00\x94\x84\x01i\x01\x92\x84\x96\x96'
+    b'\x1d__kIMMessagePartAttributeName\x86\x92\x84\x84\x84\x08NSNumber\x00\x84\x84\x07NSValue'
+    b'\x00\x94\x84\x01*\x84\x99\x99\x00\x86\x86\x86'
+)
+WORDS = ["lunch", "tomorrow", "call", "thanks", "see", "you", "at", "the", "office", "café", "🎉", "ok"]
+
+
+def encode_attributed_body(text: str) -> bytes:
+    """Serialize text the way Messages does (enough for the decoder)"""
+    data = text.encode('utf-8')
+    if len(data) < 0x80:
+        length = bytes([len(data)])
+    elif len(data) < 0x8000:
+        length = b'\x81' + len(data).to_bytes(2, 'little')
+    else:
+        length = b'\x82' + len(data).to_bytes(4, 'little')
+    return HEADER + length + data + TRAILER
+
+
+def make_corpus(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        roll = rng.random()
+        words = rng.randint(1, 12) if roll < 0.9 else rng.randint(40, 400)
+        text = " ".join(rng.choice(WORDS) for _ in range(words))
+        if roll > 0.98:
+            text = '\ufffc' + text
+        corpus.append((text, encode_attributed_body(text)))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark attributedBody decoding")
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages)
+    total_bytes = sum(len(blob) for _, blob in corpus)
+
+    for text, blob in corpus[:1000]:
+        assert decode_attributed_body(blob) == text.replace('\ufffc', '').strip()
+
+    start = time.perf_counter()
+    for _, blob in corpus:
+        decode_attributed_body(blob)
+    cold = time.perf_counter() - start
+
+    cache = AttributedBodyCache(maxsize=args.messages)
+    for rowid, (_, blob) in enumerate(corpus):
+        cache.get(rowid, blob)
+    start = time.perf_counter()
+    for rowid, (_, blob) in enumerate(corpus):
+        cache.get(rowid, blob)
+    cached = time.perf_counter() - start
+
+    print(f"Corpus: {args.messages} blobs, {total_bytes / 1e6:.1f} MB")
+    print(f"Decode: {cold:.3f}s ({args.messages / cold:,.0f} msgs/s, {cold / args.messages * 1e6:.2f} us/msg)")
+    print(f"Cached: {cached:.3f}s ({args.messages / cached:,.0f} msgs/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Fake Fathom Server
+In-process Fathom API for running the Fathom agent end to end on one machine
+
+FakeFathom serves generated meetings with cursor pagination and
+per-recording transcripts on a background thread. Ninja OS itself is
+stood in for by local_server.LocalSyncServer:
+
+    with LocalSyncServer(sources=...) as ninja, FakeFathom(meetings, transcripts) as fathom:
+        agent = FathomSyncAgent(ninja.url, "key")
+"""
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without this, Nagle plus
+    # the client's delayed ACK adds ~40ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self) -> bytes:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def _send(self, status: int, payload: Any):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, method: str):
+        url = urlparse(self.path)
+        body = self._body() if method in ("POST", "PUT") else b""
+        status, payload = self.server.app.handle(method, url.path, parse_qs(url.query), body)
+        self._send(status, payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+
+class FakeServer:
+    """Base class: subclasses implement handle() and return (status, JSON payload)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+        self.lock = threading.Lock()
+        self.requests = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], body: bytes):
+        raise NotImplementedError
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeFathom(FakeServer):
+    """Fathom external API: /meetings (cursor pages) and /recordings/<id>/transcript"""
+
+    def __init__(self, meetings: List[Dict[str, Any]], transcripts: Dict[str, List[Dict[str, Any]]],
+                 page_size: int = 50, **kwargs):
+        super().__init__(**kwargs)
+        self.meetings = meetings
+        self.transcripts = transcripts
+        self.page_size = page_size
+
+    def handle(self, method, path, query, body):
+        with self.lock:
+            self.requests += 1
+
+        if path == "/meetings":
+            start = int(query.get("cursor", ["0"])[0])
+            created_after = query.get("created_after", [""])[0]
+            page = [m for m in self.meetings[start:start + self.page_size]
+                    if not created_after or m["created_at"] > created_after]
+            if query.get("include_transcript", ["false"])[0] == "true":
+                page = [{**m, "transcript": self.transcripts.get(m["recording_id"], [])} for m in page]
+            end = start + self.page_size
+            return 200, {"items": page, "cursor": str(end) if end < len(self.meetings) else None}
+
+        if path.startswith("/recordings/") and path.endswith("/transcript"):
+            recording_id = path.split("/")[2]
+            if recording_id not in self.transcripts:
+                return 404, {"message": "Not found"}
+            return 200, {"transcript": self.transcripts[recording_id]}
+
+        return 404, {"message": "Not found"}
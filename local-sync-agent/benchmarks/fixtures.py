@@ -0,0 +1,411 @@
+"""
+Synthetic Source Fixtures
+Deterministic inputs for every sync agent, for benchmarking
+
+Every generator takes a seed and anchors its dates at FIXTURE_EPOCH, so
+the same arguments always produce the same bytes (apart from file mtimes,
+which are set from the same anchor). Benchmarks widen the agents'
+lookback windows rather than moving the fixtures.
+
+    python benchmarks/fixtures.py imessage /tmp/chat.db --count 100000
+    python benchmarks/fixtures.py whatsapp /tmp/exports --count 20000
+"""
+
+import os
+import sys
+import json
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_attributed_body import encode_attributed_body
+
+FIXTURE_EPOCH = datetime(2026, 1, 1)
+APPLE_EPOCH = datetime(2001, 1, 1)
+
+FIRST_NAMES = ["Alice", "Bob", "Carol", "Dan", "Erin", "Frank", "Grace", "Heidi", "Ivan", "Judy",
+               "Mallory", "Niaj", "Olivia", "Peggy", "Rupert", "Sybil", "Trent", "Victor", "Walter", "Zoë"]
+LAST_NAMES = ["Smith", "Jones", "García", "Müller", "Chen", "Okafor", "Silva", "Kowalski", "Nguyen", "Patel"]
+WORDS = ["lunch", "tomorrow", "call", "thanks", "see", "you", "at", "the", "office", "café", "🎉", "ok",
+         "deal", "proposal", "Monday", "send", "deck", "great", "meeting", "follow", "up", "budget", "?"]
+
+
+def _text(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+# ---------------------------------------------------------------- iMessage
+
+# The columns of the real chat.db tables that the agent (or Messages.app's
+# own indexes) touch, with the same names, types and indexes
+CHAT_DB_SCHEMA = """
+CREATE TABLE handle (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE,
+    id TEXT NOT NULL,
+    country TEXT,
+    service TEXT NOT NULL,
+    uncanonicalized_id TEXT,
+    person_centric_id TEXT,
+    UNIQUE (id, service)
+);
+CREATE TABLE chat (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    style INTEGER,
+    state INTEGER,
+    account_id TEXT,
+    properties BLOB,
+    chat_identifier TEXT,
+    service_name TEXT,
+    room_name TEXT,
+    account_login TEXT,
+    is_archived INTEGER DEFAULT 0,
+    last_addressed_handle TEXT,
+    display_name TEXT,
+    group_id TEXT
+);
+CREATE TABLE message (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    text TEXT,
+    replace INTEGER DEFAULT 0,
+    service_center TEXT,
+    handle_id INTEGER DEFAULT 0,
+    subject TEXT,
+    country TEXT,
+    attributedBody BLOB,
+    version INTEGER DEFAULT 0,
+    type INTEGER DEFAULT 0,
+    service TEXT,
+    account TEXT,
+    account_guid TEXT,
+    error INTEGER DEFAULT 0,
+    date INTEGER,
+    date_read INTEGER,
+    date_delivered INTEGER,
+    is_delivered INTEGER DEFAULT 0,
+    is_finished INTEGER DEFAULT 0,
+    is_from_me INTEGER DEFAULT 0,
+    is_read INTEGER DEFAULT 0,
+    cache_has_attachments INTEGER DEFAULT 0,
+    cache_roomnames TEXT,
+    associated_message_guid TEXT,
+    associated_message_type INTEGER DEFAULT 0,
+    thread_originator_guid TEXT
+);
+CREATE TABLE chat_message_join (
+    chat_id INTEGER REFERENCES chat (ROWID) ON DELETE CASCADE,
+    message_id INTEGER REFERENCES message (ROWID) ON DELETE CASCADE,
+    message_date INTEGER DEFAULT 0,
+    PRIMARY KEY (chat_id, message_id)
+);
+CREATE TABLE chat_handle_join (
+    chat_id INTEGER REFERENCES chat (ROWID) ON DELETE CASCADE,
+    handle_id INTEGER REFERENCES handle (ROWID) ON DELETE CASCADE,
+    UNIQUE (chat_id, handle_id)
+);
+CREATE INDEX message_idx_handle ON message (handle_id, date);
+CREATE INDEX message_idx_date ON message (date);
+CREATE INDEX chat_message_join_idx_message_id_only ON chat_message_join (message_id);
+CREATE INDEX chat_message_join_idx_message_date_id_chat_id ON chat_message_join (chat_id, message_date, message_id);
+"""
+
+
+def _phone_handle(rng: random.Random, index: int) -> str:
+    """The same numbers written the ways chat.db stores them"""
+    number = f"555{index:07d}"[-10:]
+    style = rng.random()
+    if style < 0.7:
+        return f"+1{number}"
+    if style < 0.85:
+        return number
+    return f"({number[:3]}) {number[3:6]}-{number[6:]}"
+
+
+def make_chat_db(path: str, messages: int, seed: int = 1, contacts: int = 0, days: int = 90) -> Dict[str, int]:
+    """
+    Write a chat.db with `messages` messages (WAL mode, like the real one)
+
+    About a third of the messages have only an attributedBody, a tenth are
+    in group chats, and chats are picked with a skewed distribution so a
+    few conversations are busy and most are quiet.
+    """
+    rng = random.Random(seed)
+    contacts = contacts or max(10, min(2000, messages // 200))
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(CHAT_DB_SCHEMA)
+
+    handles = []
+    for i in range(contacts):
+        if rng.random() < 0.15:
+            identifier = f"{rng.choice(FIRST_NAMES).lower()}{i}@example.com"
+        else:
+            identifier = _phone_handle(rng, i)
+        handles.append((i + 1, identifier, "us", "iMessage", identifier, None))
+    conn.executemany("INSERT INTO handle VALUES (?, ?, ?, ?, ?, ?)", handles)
+
+    chats = []
+    chat_handles = []
+    for handle_rowid, identifier, *_ in handles:
+        chats.append((len(chats) + 1, f"iMessage;-;{identifier}", 45, identifier, None))
+        chat_handles.append((len(chats), handle_rowid))
+    for g in range(max(1, contacts // 20)):
+        rowid = len(chats) + 1
+        chats.append((rowid, f"iMessage;+;chat{seed}{g:06d}", 43, f"chat{seed}{g:06d}", f"Group {g}"))
+        for handle_rowid in rng.sample(range(1, contacts + 1), min(contacts, rng.randint(3, 8))):
+            chat_handles.append((rowid, handle_rowid))
+    conn.executemany(
+        "INSERT INTO chat (ROWID, guid, style, chat_identifier, display_name, service_name) "
+        "VALUES (?, ?, ?, ?, ?, 'iMessage')", chats
+    )
+    conn.executemany("INSERT INTO chat_handle_join VALUES (?, ?)", chat_handles)
+
+    members: Dict[int, List[int]] = {}
+    for chat_rowid, handle_rowid in chat_handles:
+        members.setdefault(chat_rowid, []).append(handle_rowid)
+    weights = [1.0 / (rank + 1) for rank in range(len(chats))]
+    rng.shuffle(weights)
+
+    start = int((FIXTURE_EPOCH - timedelta(days=days) - APPLE_EPOCH).total_seconds() * 1e9)
+    step = int(days * 86400 * 1e9 / max(1, messages))
+    chunk = 20000
+    for offset in range(0, messages, chunk):
+        rows = []
+        joins = []
+        count = min(chunk, messages - offset)
+        chat_picks = rng.choices(range(1, len(chats) + 1), weights=weights, k=count)
+        for n, chat_rowid in enumerate(chat_picks):
+            rowid = offset + n + 1
+            date = start + rowid * step
+            is_from_me = rng.random() < 0.4
+            handle_rowid = 0 if is_from_me else rng.choice(members[chat_rowid])
+            text = _text(rng, 1, 25)
+            attributed_body = encode_attributed_body(text)
+            if rng.random() < 0.33:
+                text = None
+            rows.append((rowid, f"{seed:02d}-{rowid:08d}-FIXTURE", text, handle_rowid, attributed_body,
+                         "iMessage", date, date, int(is_from_me), 1))
+            joins.append((chat_rowid, rowid, date))
+        conn.executemany(
+            "INSERT INTO message (ROWID, guid, text, handle_id, attributedBody, service, date, "
+            "date_delivered, is_from_me, is_delivered) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        conn.executemany("INSERT INTO chat_message_join VALUES (?, ?, ?)", joins)
+        conn.commit()
+
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return {"messages": messages, "handles": contacts, "chats": len(chats)}
+
+
+# ----------------------------------------------------------------- Granola
+
+def make_granola_cache(path: str, meetings: int, seed: int = 1, segments: int = 60) -> Dict[str, int]:
+    """
+    Write a Granola cache-v3.json: {"cache": "<JSON string>"} whose string
+    holds {"state": {"documents": {id: meeting}}}, like the real cache
+
+    segments is the average number of transcript segments per meeting.
+    """
+    rng = random.Random(seed)
+    documents = {}
+    for i in range(meetings):
+        started = FIXTURE_EPOCH - timedelta(hours=i * 7 + rng.randint(0, 5))
+        attendees = [{"name": _name(rng), "email": f"person{rng.randint(0, 999)}@example.com"}
+                     for _ in range(rng.randint(2, 6))]
+        documents[f"doc-{seed}-{i:06d}"] = {
+            "id": f"doc-{seed}-{i:06d}",
+            "title": f"Meeting {i}: {_text(rng, 2, 5)}",
+            "startTime": started.isoformat() + "Z",
+            "endTime": (started + timedelta(minutes=rng.choice([15, 30, 45, 60]))).isoformat() + "Z",
+            "attendees": attendees,
+            "summary": _text(rng, 20, 80),
+            "transcript": [
+                {"speaker": rng.choice(attendees)["name"], "text": _text(rng, 5, 40)}
+                for _ in range(rng.randint(segments // 2, segments * 3 // 2))
+            ],
+        }
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"cache": json.dumps({"state": {"documents": documents}})}, f)
+    return {"meetings": meetings, "bytes": os.path.getsize(path)}
+
+
+# ---------------------------------------------------------------- WhatsApp
+
+# Each style renders the line header; the body is "Sender: text" or a system message
+def _ios_dmy_24h(dt: datetime) -> str:
+    return f"[{dt:%d/%m/%Y, %H:%M:%S}] "
+
+
+def _ios_mdy_12h(dt: datetime) -> str:
+    # iOS marks some lines with an invisible left-to-right mark
+    return f"\u200e[{dt.month}/{dt.day}/{dt:%y}, {dt.hour % 12 or 12}:{dt:%M:%S} {dt:%p}] "
+
+
+def _android_mdy_12h(dt: datetime) -> str:
+    return f"{dt.month}/{dt.day}/{dt:%y}, {dt.hour % 12 or 12}:{dt:%M} {dt:%p} - "
+
+
+def _android_dmy_24h(dt: datetime) -> str:
+    return f"{dt:%d/%m/%Y, %H:%M} - "
+
+
+def _android_dotted_24h(dt: datetime) -> str:
+    return f"{dt:%d.%m.%y, %H:%M} - "
+
+
+WHATSAPP_FORMATS = {
+    "ios_dmy_24h": _ios_dmy_24h,
+    "ios_mdy_12h": _ios_mdy_12h,
+    "android_mdy_12h": _android_mdy_12h,
+    "android_dmy_24h": _android_dmy_24h,
+    "android_dotted_24h": _android_dotted_24h,
+}
+
+
+def _export_lines(rng: random.Random, header, messages: int, senders: List[str]) -> Iterator[str]:
+    dt = FIXTURE_EPOCH - timedelta(minutes=messages * 11)
+    yield header(dt) + "Messages and calls are end-to-end encrypted."
+    for _ in range(messages):
+        dt += timedelta(minutes=rng.randint(1, 20), seconds=rng.randint(0, 59))
+        text = _text(rng, 1, 20)
+        if rng.random() < 0.05:
+            text += "\n" + _text(rng, 3, 12)
+        yield header(dt) + f"{rng.choice(senders)}: {text}"
+
+
+def make_whatsapp_exports(
+    directory: str,
+    messages: int,
+    seed: int = 1,
+    chats_per_format: int = 4
+) -> Dict[str, int]:
+    """
+    Write chat exports in every WHATSAPP_FORMATS style
+
+    `messages` is the total across all files. Some senders are phone
+    numbers, as in exports of chats with unsaved contacts.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    files = len(WHATSAPP_FORMATS) * chats_per_format
+    per_file = max(1, messages // files)
+
+    written = 0
+    for format_name, header in WHATSAPP_FORMATS.items():
+        for c in range(chats_per_format):
+            contact = _name(rng)
+            senders = [contact, "You" if format_name.startswith("ios") else _name(rng)]
+            if rng.random() < 0.5:
+                senders.append(f"+1 555 {rng.randint(100, 999)} {rng.randint(1000, 9999)}")
+            path = os.path.join(directory, f"WhatsApp Chat with {contact} ({format_name} {c}).txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                for line in _export_lines(rng, header, per_file, senders):
+                    f.write(line + "\n")
+            written += per_file
+    return {"files": files, "messages": written}
+
+
+# ------------------------------------------------------------------- Plaud
+
+PLAUD_EXTENSIONS = ['.m4a', '.mp3', '.wav', '.ogg']
+
+
+def make_plaud_tree(directory: str, recordings: int, seed: int = 1, size: int = 64 * 1024) -> Dict[str, int]:
+    """
+    Write a Plaud-style tree: recordings in year/month folders, plus
+    non-audio files and a hidden folder the scanner should skip
+
+    Audio files hold `size` pseudo-random bytes (+/-50%); the fake server
+    doesn't decode them.
+    """
+    rng = random.Random(seed)
+    total_bytes = 0
+    for i in range(recordings):
+        recorded = FIXTURE_EPOCH - timedelta(hours=i * 3 + rng.randint(0, 2))
+        folder = os.path.join(directory, f"{recorded:%Y}", f"{recorded:%m}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"REC_{recorded:%Y%m%d_%H%M%S}_{i:05d}{rng.choice(PLAUD_EXTENSIONS)}")
+        data = rng.randbytes(rng.randint(size // 2, size * 3 // 2))
+        with open(path, 'wb') as f:
+            f.write(data)
+        timestamp = recorded.timestamp()
+        os.utime(path, (timestamp, timestamp))
+        total_bytes += len(data)
+
+        if i % 10 == 0:
+            with open(os.path.join(folder, f"REC_{i:05d}.txt"), 'w') as f:
+                f.write(_text(rng, 10, 30))
+
+    hidden = os.path.join(directory, ".cache")
+    os.makedirs(hidden, exist_ok=True)
+    with open(os.path.join(hidden, "preview.m4a"), 'wb') as f:
+        f.write(rng.randbytes(1024))
+    return {"recordings": recordings, "bytes": total_bytes}
+
+
+# ------------------------------------------------------------------ Fathom
+
+def make_fathom_meetings(count: int, seed: int = 1) -> Tuple[List[Dict], Dict[str, List[Dict]]]:
+    """Meetings as the Fathom API lists them (newest first), and transcripts by recording_id"""
+    rng = random.Random(seed)
+    meetings = []
+    transcripts = {}
+    for i in range(count):
+        created = FIXTURE_EPOCH - timedelta(hours=i * 5)
+        recording_id = f"{seed}{i:07d}"
+        invitees = [{"name": _name(rng), "email": f"guest{rng.randint(0, 999)}@example.com",
+                     "is_external": rng.random() < 0.5} for _ in range(rng.randint(1, 5))]
+        meetings.append({
+            "title": f"Call {i}: {_text(rng, 2, 4)}",
+            "url": f"https://fathom.video/calls/{recording_id}",
+            "share_url": f"https://fathom.video/share/{recording_id}",
+            "recording_id": recording_id,
+            "created_at": created.isoformat() + "Z",
+            "recording_start_time": (created - timedelta(minutes=45)).isoformat() + "Z",
+            "recording_end_time": created.isoformat() + "Z",
+            "calendar_invitees": invitees,
+            "recorded_by": {"name": "Benchmark User", "email": "me@example.com"},
+            "default_summary": {"markdown_formatted": _text(rng, 20, 60)},
+        })
+        transcripts[recording_id] = [
+            {"speaker": {"display_name": rng.choice(invitees)["name"]},
+             "text": _text(rng, 5, 30), "timestamp": f"00:{m // 60:02d}:{m % 60:02d}"}
+            for m in range(rng.randint(30, 120))
+        ]
+    return meetings, transcripts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a benchmark fixture")
+    parser.add_argument("kind", choices=["imessage", "granola", "whatsapp", "plaud"])
+    parser.add_argument("path", help="Output file (imessage, granola) or directory (whatsapp, plaud)")
+    parser.add_argument("--count", type=int, default=10000,
+                        help="Messages (imessage, whatsapp), meetings (granola) or recordings (plaud)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    generators = {
+        "imessage": make_chat_db,
+        "granola": make_granola_cache,
+        "whatsapp": make_whatsapp_exports,
+        "plaud": make_plaud_tree,
+    }
+    print(json.dumps(generators[args.kind](args.path, args.count, seed=args.seed)))
+
+
+if __name__ == "__main__":
+    main()
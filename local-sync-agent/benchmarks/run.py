@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Sync Agent Benchmarks
+Runs every agent end to end against synthetic fixtures and fake servers
+
+Each agent runs in its own process with an empty HOME (so a fresh sync
+state database) against a LocalSyncServer (and FakeFathom) in this process.
+Reported per agent: wall time, CPU time, peak RSS of the agent process,
+and source records per second. Fixtures are generated once per size and
+seed and reused from --fixtures.
+
+    python benchmarks/run.py                           # small sizes, all agents
+    python benchmarks/run.py --size medium --agents imessage,whatsapp
+    python benchmarks/run.py --save-baseline           # record this machine's baseline
+    python benchmarks/run.py --fail-on-regression      # exit 1 if slower than the baseline
+
+The baseline is machine-specific and not checked in: run --save-baseline
+once on a machine before --fail-on-regression, which exits 2 if the
+agents it runs have no baseline for the chosen size.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import argparse
+import tempfile
+import subprocess
+from typing import Any, Dict, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import fixtures
+from fake_servers import FakeFathom
+from local_server import LocalSyncServer, PUSH_SOURCES
+
+AGENTS = ("imessage", "granola", "whatsapp", "plaud", "fathom")
+
+# Source records per agent: messages, meetings, messages, recordings, meetings
+SIZES = {
+    "small": {"imessage": 10_000, "granola": 500, "whatsapp": 20_000, "plaud": 100, "fathom": 200},
+    "medium": {"imessage": 100_000, "granola": 5_000, "whatsapp": 200_000, "plaud": 500, "fathom": 1_000},
+    "large": {"imessage": 1_000_000, "granola": 20_000, "whatsapp": 1_000_000, "plaud": 2_000, "fathom": 5_000},
+}
+
+DEFAULT_FIXTURES_DIR = os.path.join(tempfile.gettempdir(), "ninja_os_bench_fixtures")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")  # Written by --save-baseline, not checked in
+
+
+def fixture_path(fixtures_dir: str, agent: str, count: int, seed: int) -> str:
+    """Generate the agent's fixture unless it exists; returns its path"""
+    suffix = {"imessage": ".db", "granola": ".json"}.get(agent, "")
+    path = os.path.join(fixtures_dir, f"{agent}-{count}-s{seed}{suffix}")
+    meta_path = path + ".meta.json"
+    if agent == "fathom" or os.path.exists(meta_path):
+        return path
+
+    os.makedirs(fixtures_dir, exist_ok=True)
+    print(f"Generating {agent} fixture ({count:,} records)...", flush=True)
+    generate = {
+        "imessage": fixtures.make_chat_db,
+        "granola": fixtures.make_granola_cache,
+        "whatsapp": fixtures.make_whatsapp_exports,
+        "plaud": fixtures.make_plaud_tree,
+    }[agent]
+    meta = generate(path, count, seed=seed)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return path
+
+
+def _peak_rss_bytes() -> int:
+    """Peak resident memory of this process"""
+    # On Linux ru_maxrss starts from the parent's peak at fork, so a small
+    # agent would report the runner's memory; VmHWM is reset by exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_worker(agent: str, fixture: str, ninja_url: str, fathom_url: Optional[str], result_path: str):
+    """Body of the per-agent process: run one full sync and write its measurements"""
+    import config
+    # Fixtures are anchored in the past and much larger than one sync batch
+    config.LOOKBACK_HOURS = 24 * 365 * 20
+    config.MAX_ITEMS_PER_SYNC = 10 ** 9
+    config.FATHOM_RATE_LIMIT_PER_SECOND = 0
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    if agent == "imessage":
+        from sync_imessage import IMessageSyncAgent
+        result = IMessageSyncAgent(ninja_url, db_path=fixture).sync(since_hours=config.LOOKBACK_HOURS, force=True)
+    elif agent == "granola":
+        from sync_granola import GranolaSyncAgent
+        result = GranolaSyncAgent(ninja_url, fixture).sync(force=True)
+    elif agent == "whatsapp":
+        from sync_whatsapp import WhatsAppSyncAgent
+        result = WhatsAppSyncAgent(ninja_url).sync_directory(fixture, force=True)
+    elif agent == "plaud":
+        from sync_plaud import PlaudSyncAgent
+        result = PlaudSyncAgent(ninja_url).sync_directory(fixture, force=True)
+    else:
+        import sync_fathom
+        sync_fathom.FATHOM_API_URL = fathom_url
+        result = sync_fathom.FathomSyncAgent(ninja_url, "benchmark").sync(force=True)
+
+    measurements = {
+        "wall_s": time.perf_counter() - wall_start,
+        "cpu_s": time.process_time() - cpu_start,
+        "peak_rss_mb": _peak_rss_bytes() / (1024 * 1024),
+        "error": result.get("error") if isinstance(result, dict) else None,
+    }
+    with open(result_path, 'w') as f:
+        json.dump(measurements, f)
+
+
+def run_agent(agent: str, count: int, args) -> Dict[str, Any]:
+    """Run one agent in a child process against fresh fake servers"""
+    path = fixture_path(args.fixtures, agent, count, args.seed)
+    records = count
+    if agent == "whatsapp":
+        with open(path + ".meta.json") as f:
+            records = json.load(f)["messages"]
+
+    fathom = None
+    if agent == "fathom":
+        meetings, transcripts = fixtures.make_fathom_meetings(count, seed=args.seed)
+        fathom = FakeFathom(meetings, transcripts).start()
+
+    best = None
+    try:
+        for _ in range(args.repeat):
+            with LocalSyncServer(sources=PUSH_SOURCES + ("fathom",)) as ninja, tempfile.TemporaryDirectory(prefix="ninja_os_bench_home_") as home:
+                result_path = os.path.join(home, "result.json")
+                command = [sys.executable, os.path.abspath(__file__), "--worker", agent,
+                           "--fixture", path, "--ninja-url", ninja.url, "--result", result_path]
+                if fathom:
+                    command += ["--fathom-url", fathom.url]
+                subprocess.run(
+                    command, env={**os.environ, "HOME": home}, check=True,
+                    stdout=None if args.verbose else subprocess.DEVNULL
+                )
+                with open(result_path) as f:
+                    run = json.load(f)
+                run.update({
+                    "records": records,
+                    "records_per_s": records / run["wall_s"] if run["wall_s"] else 0.0,
+                    "pushed": ninja.items + ninja.transcriptions,
+                    "requests": ninja.requests,
+                })
+            if best is None or run["wall_s"] < best["wall_s"]:
+                best = run
+    finally:
+        if fathom:
+            fathom.stop()
+    return best
+
+
+def _change(current: float, base: float) -> str:
+    return f"{(current - base) / base * 100:+.0f}%" if base else "n/a"
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> bool:
+    """Print each agent against the baseline; returns True if any regressed beyond tolerance"""
+    regressed = False
+    print(f"\n{'agent':<10} {'wall':>8} {'records/s':>10} {'peak RSS':>9}")
+    for agent, run in results.items():
+        base = baseline.get(agent)
+        if not base:
+            print(f"{agent:<10} {'(no baseline)':>29}")
+            continue
+        slower = run["wall_s"] > base["wall_s"] * (1 + tolerance)
+        bigger = run["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance)
+        flag = "  REGRESSION" if slower or bigger else ""
+        regressed = regressed or slower or bigger
+        print(f"{agent:<10} {_change(run['wall_s'], base['wall_s']):>8} "
+              f"{_change(run['records_per_s'], base['records_per_s']):>10} "
+              f"{_change(run['peak_rss_mb'], base['peak_rss_mb']):>9}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sync agents on synthetic data")
+    parser.add_argument("--agents", default=",".join(AGENTS), help="Comma-separated agents to run")
+    parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per agent; the fastest is reported")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Where generated fixtures are kept")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown/growth vs baseline")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--json", help="Also write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the agents' own output")
+    # Internal: run a single agent (see run_agent)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--fixture", help=argparse.SUPPRESS)
+    parser.add_argument("--ninja-url", help=argparse.SUPPRESS)
+    parser.add_argument("--fathom-url", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.fixture, args.ninja_url, args.fathom_url, args.result)
+        return
+
+    agents = [agent.strip() for agent in args.agents.split(",") if agent.strip()]
+    unknown = set(agents) - set(AGENTS)
+    if unknown:
+        parser.error(f"Unknown agents: {', '.join(sorted(unknown))}")
+
+    results = {}
+    print(f"{'agent':<10} {'records':>10} {'wall s':>8} {'cpu s':>8} {'records/s':>11} {'peak RSS MB':>12} {'pushed':>8}")
+    for agent in agents:
+        run = run_agent(agent, SIZES[args.size][agent], args)
+        results[agent] = run
+        print(f"{agent:<10} {run['records']:>10,} {run['wall_s']:>8.2f} {run['cpu_s']:>8.2f} "
+              f"{run['records_per_s']:>11,.0f} {run['peak_rss_mb']:>12.1f} {run['pushed']:>8,}"
+              + (f"  ERROR: {run['error']}" if run.get("error") else ""), flush=True)
+
+    report = {
+        "size": args.size,
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines[args.size] = {**baselines.get(args.size, {}), **results}
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nSaved {args.size} baseline to {args.baseline}")
+        return
+
+    baseline = baselines.get(args.size, {})
+    missing = [agent for agent in results if agent not in baseline]
+    if args.fail_on_regression and missing:
+        print(f"\nNo {args.size} baseline for {', '.join(missing)} in {args.baseline}; "
+              "run with --save-baseline first")
+        sys.exit(2)
+    if baseline and compare(results, baseline, args.tolerance) and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+iMessage chat.db Snapshot Reader
+One tuned, read-only, consistent view of chat.db per run
+
+Messages.app keeps writing to chat.db (in WAL mode) while we read it.
+Reading through separate connections, each in autocommit mode, can see
+the database change between queries, and a busy moment can fail with
+"database is locked". A ChatDbSnapshot is opened once per run and gives
+every query the same state of the database:
+
+    "transaction"  A read-only connection that holds one read transaction
+                   (BEGIN + first read). In WAL mode this pins a snapshot
+                   while Messages.app keeps writing, but for as long as
+                   it is open SQLite can't checkpoint the WAL past it, so
+                   chat.db-wal grows. Callers release() it before waiting
+                   on anything slow, such as a push to the server.
+    "copy"         chat.db is copied with SQLite's online backup API to a
+                   temporary file, which is opened with immutable=1 (no
+                   locking at all). Costs a full copy; useful when the
+                   run is long and holding a read transaction isn't wanted.
+
+The connection is tuned for bulk reads (query_only, mmap, a larger page
+cache, in-memory temp storage).
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+from typing import Optional
+from urllib.parse import quote
+
+from config import (
+    IMESSAGE_SNAPSHOT_MODE, IMESSAGE_MMAP_BYTES, IMESSAGE_CACHE_KIB, IMESSAGE_BUSY_TIMEOUT_SECONDS
+)
+
+SNAPSHOT_MODES = ('transaction', 'copy')
+
+
+def highest_message_rowid(conn: sqlite3.Connection) -> int:
+    """
+    Highest ROWID the message table has handed out
+
+    message is AUTOINCREMENT, so sqlite_sequence remembers the ROWID of a
+    newest message that has since been deleted; a rebuilt chat.db starts
+    it over. Falls back to MAX(ROWID) if there is no sqlite_sequence.
+    """
+    max_rowid = conn.execute("SELECT MAX(ROWID) FROM message").fetchone()[0] or 0
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'message'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    return max(max_rowid, row[0] if row and row[0] else 0)
+
+
+class ChatDbSnapshot:
+    """A consistent read-only view of one chat.db"""
+
+    def __init__(self, db_path: str, mode: str = IMESSAGE_SNAPSHOT_MODE):
+        if mode not in SNAPSHOT_MODES:
+            raise ValueError(f"Unknown snapshot mode {mode!r}, expected one of {SNAPSHOT_MODES}")
+        self.db_path = os.path.expanduser(db_path)
+        self.mode = mode
+        self.conn: Optional[sqlite3.Connection] = None
+        self._copy_dir: Optional[str] = None
+
+    def _connect(self, uri: str) -> sqlite3.Connection:
+        # Autocommit, so the only transaction is the one opened below
+        return sqlite3.connect(
+            uri, uri=True, timeout=IMESSAGE_BUSY_TIMEOUT_SECONDS,
+            isolation_level=None, check_same_thread=False
+        )
+
+    def _copy(self, source: sqlite3.Connection) -> str:
+        """Back up chat.db (including its WAL) to a private file"""
+        self._copy_dir = tempfile.mkdtemp(prefix="ninja_os_chatdb_")
+        copy_path = os.path.join(self._copy_dir, "chat.db")
+        dest = sqlite3.connect(copy_path)
+        try:
+            source.backup(dest)
+            # A single file with no WAL, so it can be opened immutable
+            dest.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            dest.close()
+        return copy_path
+
+    def open(self) -> "ChatDbSnapshot":
+        """Open the snapshot. Raises sqlite3.Error if chat.db can't be read."""
+        try:
+            source = self._connect(f"file:{quote(self.db_path)}?mode=ro")
+            if self.mode == 'copy':
+                try:
+                    copy_path = self._copy(source)
+                finally:
+                    source.close()
+                self.conn = self._connect(f"file:{quote(copy_path)}?immutable=1")
+            else:
+                self.conn = source
+
+            self.conn.execute("PRAGMA query_only = 1")
+            self.conn.execute(f"PRAGMA mmap_size = {int(IMESSAGE_MMAP_BYTES)}")
+            self.conn.execute(f"PRAGMA cache_size = -{int(IMESSAGE_CACHE_KIB)}")
+            self.conn.execute("PRAGMA temp_store = MEMORY")
+
+            if self.mode == 'transaction':
+                self.conn.execute("BEGIN")
+            # The first read fixes the snapshot (and checks access)
+            self.conn.execute("SELECT 1 FROM message LIMIT 1").fetchall()
+        except sqlite3.Error:
+            self.close()
+            raise
+        return self
+
+    def release(self):
+        """
+        End the read transaction (transaction mode) so checkpoints can run
+
+        Later queries each read the database as it is when they run. A copy
+        holds no lock on chat.db, so this does nothing in copy mode.
+        """
+        if self.mode == 'transaction' and self.conn is not None and self.conn.in_transaction:
+            self.conn.execute("COMMIT")
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except sqlite3.Error:
+                pass
+            self.conn = None
+        if self._copy_dir:
+            shutil.rmtree(self._copy_dir, ignore_errors=True)
+            self._copy_dir = None
+
+    def __enter__(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.open()
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.close()
@@ -23,7 +23,58 @@ WHATSAPP_DATA_PATH = "~/Library/Application Support/WhatsApp"
 # Fathom.video API key (get from fathom.video settings)
 FATHOM_API_KEY = ""  # Set this or pass via --api-key
 
+# Local sync state (dedup IDs, cursors); replaces ~/.ninja_os_*_synced.json
+SYNC_STATE_DB_PATH = "~/.ninja_os_sync_state.db"
+IMESSAGE_SEARCH_INDEX_PATH = "~/.ninja_os_imessage_index.db"  # Full-text index for iMessage --search
+FINGERPRINT_HASH_CONTENT = False  # Also hash file contents to ignore touch-only changes
+
 # Sync settings
 SYNC_INTERVAL_MINUTES = 15  # How often to run automatic sync
 MAX_ITEMS_PER_SYNC = 100    # Maximum items per sync batch
 LOOKBACK_HOURS = 24         # How far back to look for new items
+
+# Push settings
+PUSH_BATCH_MAX_ITEMS = 50               # Items per /api/sync/push request
+PUSH_BATCH_MAX_BYTES = 4 * 1024 * 1024  # Serialized JSON per request
+PUSH_MAX_IN_FLIGHT = 2                  # Concurrent push requests
+HTTP_MAX_CONNECTIONS_PER_HOST = 8       # Shared keep-alive pool, per host, across all agents
+HTTP_POOL_HOSTS = 4                     # Hosts kept in the pool (Ninja OS, Fathom, ...)
+REQUEST_TIMEOUT_SECONDS = 60
+TRANSCRIBE_TIMEOUT_SECONDS = 600        # Whisper on long recordings is slow
+MAX_RETRIES = 4                         # Retries on 429/5xx/connection errors
+RETRY_BACKOFF_SECONDS = 1.0             # Base delay, doubled per attempt
+RETRY_BACKOFF_MAX_SECONDS = 60.0
+NINJA_OS_RATE_LIMIT_PER_SECOND = 0      # Requests/s to Ninja OS (0 = only back off when the server throttles)
+COMPRESS_REQUESTS = True                # gzip JSON bodies (Content-Encoding: gzip)
+COMPRESS_MIN_BYTES = 1024               # Don't bother compressing smaller bodies
+STREAMING_UPLOAD = True                 # Upload audio as raw chunks instead of base64 JSON
+UPLOAD_CHUNK_BYTES = 4 * 1024 * 1024    # Audio bytes per upload request
+OUTBOX_ENABLED = True                   # Queue pushes that fail while the server is down
+OUTBOX_RETRY_BACKOFF_SECONDS = 60       # First replay delay, doubled per failed replay
+OUTBOX_RETRY_BACKOFF_MAX_SECONDS = 3600
+OUTBOX_MAX_AGE_DAYS = 7                 # Drop queued requests older than this
+RESOLVE_PEOPLE_BEFORE_PUSH = True       # Look up participants in one request per push and send personHint.id
+PERSON_LOOKUP_BATCH_SIZE = 500          # Identifiers per /api/sync/resolve-people request
+CONTACT_CACHE_TTL_SECONDS = 3600        # How long a resolved phone/email/name is reused
+CONTACT_CACHE_NEGATIVE_TTL_SECONDS = 300  # Same, for identifiers with no matching person
+CONTACT_CACHE_MAX_ENTRIES = 10000
+DEFAULT_PHONE_REGION = "US"             # Country for phone numbers written without a country code
+GRANOLA_STOP_AFTER_OLD_MEETINGS = 0  # Stop reading the cache after N consecutive out-of-window
+                                     # meetings (0 = read it all; only safe if the cache is newest-first)
+FATHOM_TWO_PHASE = True      # List meetings first, fetch transcripts only for unsynced ones
+FATHOM_TRANSCRIPT_CONCURRENCY = 4  # Parallel transcript downloads in two-phase mode
+FATHOM_RATE_LIMIT_PER_SECOND = 1.0  # Fathom allows 60 API calls per minute
+FATHOM_RATE_LIMIT_BURST = 5
+WHATSAPP_PARSE_WORKERS = 0   # Processes for parsing exports (0 = one per core, 1 = in-process)
+WHATSAPP_DATE_ORDER = "auto"  # Ambiguous export dates: "auto" (warn, use the system locale), "mdy" or "dmy"
+CONVERSATION_APPEND_MODE = True  # iMessage/WhatsApp bridge: one interaction per chat per day, new messages appended
+IMESSAGE_PAGE_SIZE = 5000   # Messages read (and pushed) per page from chat.db
+ATTRIBUTED_BODY_CACHE_SIZE = 50000  # Decoded attributedBody texts kept in memory (by ROWID)
+IMESSAGE_SNAPSHOT_MODE = "transaction"  # chat.db reads: "transaction" (read transaction, released before pushes) or "copy" (backup to a temp file)
+IMESSAGE_MMAP_BYTES = 256 * 1024 * 1024  # Memory-mapped reads of chat.db
+IMESSAGE_CACHE_KIB = 64 * 1024           # SQLite page cache for chat.db reads
+IMESSAGE_BUSY_TIMEOUT_SECONDS = 10       # Wait this long if Messages.app has chat.db locked
+SYNC_CONCURRENCY = 3        # Max sources syncing at once (1 = sequential)
+SYNC_SOURCE_TIMEOUT_SECONDS = 600  # Per-source time limit (0 = none)
+WATCH_DEBOUNCE_SECONDS = 5  # --watch: wait this long after the last change before syncing
+WATCH_POLL_SECONDS = 10     # --watch: polling interval when watchdog isn't installed
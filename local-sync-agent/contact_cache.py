@@ -0,0 +1,94 @@
+"""
+Ninja OS Contact Cache
+Process-wide cache of person lookups, keyed by normalized identifier
+
+Agents see the same handful of phones, emails and names on every sync;
+without a cache each one costs a request (search-person) or a server-side
+lookup per pushed item. Entries expire after CONTACT_CACHE_TTL_SECONDS
+(misses after CONTACT_CACHE_NEGATIVE_TTL_SECONDS, so people added in
+Ninja OS are picked up soon), and the least recently used entries are
+evicted beyond CONTACT_CACHE_MAX_ENTRIES.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from normalization import get_identifier_index
+from config import CONTACT_CACHE_TTL_SECONDS, CONTACT_CACHE_NEGATIVE_TTL_SECONDS, CONTACT_CACHE_MAX_ENTRIES
+
+IDENTIFIER_KINDS = ('phone', 'email', 'name')
+
+# Returned by get() when there is no live entry (None is a cached miss)
+MISSING = object()
+
+
+def identifier_key(kind: str, value: str) -> Optional[str]:
+    """
+    Cache key for a phone, email or name, or None if it's empty once normalized
+
+    Phones and emails use the canonical keys from the shared identifier
+    index, so every variant of one number or address shares an entry.
+    """
+    if kind in ('phone', 'email'):
+        return get_identifier_index().key(value or "")
+    name = " ".join((value or "").casefold().split())
+    return f"name:{name}" if name else None
+
+
+class ContactCache:
+    """TTL + LRU map of identifier keys to lookup results"""
+
+    def __init__(
+        self,
+        maxsize: int = CONTACT_CACHE_MAX_ENTRIES,
+        ttl: float = CONTACT_CACHE_TTL_SECONDS,
+        negative_ttl: float = CONTACT_CACHE_NEGATIVE_TTL_SECONDS
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        """The cached value, or MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any):
+        """Cache a result; empty results (None, []) use the shorter negative TTL"""
+        ttl = self.ttl if value else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache: Optional[ContactCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_contact_cache() -> ContactCache:
+    """Return the process-wide contact cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ContactCache()
+        return _cache
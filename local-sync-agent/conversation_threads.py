@@ -0,0 +1,192 @@
+"""
+Ninja OS Conversation Threads
+Append-only sync of ongoing chats (iMessage, WhatsApp bridge)
+
+Each conversation is synced as one interaction per thread per day with a
+stable externalId. The first push for a thread-day creates it; later
+pushes carry only the messages that arrived since, marked as an append.
+
+Server contract (POST /api/sync/push, per item):
+    "mode": "append"         Append instead of skipping an existing externalId
+    "appendAfter": <id>      Last message ID already stored for this
+                             thread-day (null for its first push)
+    "lastMessageId": <id>    Last message in this delta, and its date as a
+    "lastMessageDate": "<n>" string (chat.db dates don't fit in a JS
+                             number); the server keeps them as the
+                             thread-day's cursor
+    "rewrite": true          Replace the stored transcript (never implied)
+The server answers "created" for a new interaction and "appended" once the
+delta is stored, including when it was already stored by a retried
+request. Only then does the thread-day's last message ID move forward.
+If appendAfter isn't the server's cursor (an earlier delta was lost, or
+--force started the thread-day over) it answers "conflict" with its
+cursor; the thread-day takes that cursor and the delta is rebuilt from it.
+"""
+
+import hashlib
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sync_state import SyncStateStore, get_state_store
+
+APPLIED_STATUSES = ('created', 'appended')
+
+Deltas = Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]
+
+
+class ConversationThreads:
+    """
+    Tracks the last message synced for each thread-day
+
+    Messages are dicts with an "id" and a sortable "date" (any number, as
+    long as one source uses it consistently); everything else is left to
+    the caller.
+    """
+
+    def __init__(self, source: str, store: Optional[SyncStateStore] = None):
+        self.source = source
+        self.namespace = f"{source}_threads"
+        self.store = store or get_state_store()
+
+    def thread_id(self, thread_key: str, day: date) -> str:
+        """Stable externalId for one thread's messages on one day"""
+        return hashlib.md5(
+            f"{self.source}_thread_{thread_key}_{day.isoformat()}".encode()
+        ).hexdigest()
+
+    def pending(self, thread_id: str, messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Split off the messages not yet synced for a thread-day
+
+        Returns them in date order along with the appendAfter ID to send
+        (None if nothing has been synced for this thread-day yet).
+        """
+        messages = sorted(messages, key=lambda m: m['date'])
+        state = self.store.get_state(self.namespace, thread_id)
+        if not state:
+            return messages, None
+
+        # Line up on the last synced message itself when it's at hand, so
+        # a cursor date taken from the server can't be off by a rounding
+        last_id = state['lastIds'][-1]
+        anchor = next((m for m in messages if m['id'] == last_id), None)
+        last_date = anchor['date'] if anchor else state['lastDate']
+        sent_at_last_date = set(state['lastIds'])
+        fresh = [
+            m for m in messages
+            if m['date'] > last_date or (m['date'] == last_date and m['id'] not in sent_at_last_date)
+        ]
+        return fresh, state['lastIds'][-1]
+
+    @staticmethod
+    def delta_fields(fresh: List[Dict[str, Any]], append_after: Optional[str]) -> Dict[str, Any]:
+        """The append fields of an item carrying the messages from pending()"""
+        return {
+            "mode": "append",
+            "appendAfter": append_after,
+            "lastMessageId": fresh[-1]['id'],
+            "lastMessageDate": str(fresh[-1]['date']),
+        }
+
+    def mark_sent(self, thread_id: str, messages: List[Dict[str, Any]]):
+        """Advance a thread-day past messages the server has stored"""
+        if not messages:
+            return
+        state = self.store.get_state(self.namespace, thread_id) or {"lastDate": None, "lastIds": []}
+
+        for message in sorted(messages, key=lambda m: m['date']):
+            if state['lastDate'] is None or message['date'] > state['lastDate']:
+                state = {"lastDate": message['date'], "lastIds": [message['id']]}
+            elif message['date'] == state['lastDate'] and message['id'] not in state['lastIds']:
+                state['lastIds'].append(message['id'])
+
+        self.store.set_state(self.namespace, thread_id, state)
+
+    def adopt(self, thread_id: str, cursor: Optional[Dict[str, Any]], messages: List[Dict[str, Any]]):
+        """
+        Take the server's cursor for a thread-day after a conflict
+
+        Without a cursor (a thread-day stored before the server kept one)
+        there is nothing to line up against, so the messages that were
+        sent are taken as stored rather than risk adding them twice.
+        """
+        if cursor and cursor.get('id') is not None and cursor.get('date') is not None and messages:
+            # The date comes back as sent (a string); read it as the source's own type
+            last_date = type(messages[0]['date'])(cursor['date'])
+            self.store.set_state(self.namespace, thread_id, {"lastDate": last_date, "lastIds": [cursor['id']]})
+        else:
+            self.mark_sent(thread_id, messages)
+
+    def record_results(
+        self,
+        results: Iterable[Dict[str, Any]],
+        sent: Dict[str, List[Dict[str, Any]]]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Mark the deltas the server applied, given push results and {externalId: messages}
+
+        Thread-days that came back as conflicts take the server's cursor;
+        returns them as {externalId: cursor}.
+        """
+        conflicts = {}
+        for item_result in results:
+            external_id = item_result.get('id')
+            if external_id not in sent:
+                continue
+            if item_result.get('status') in APPLIED_STATUSES:
+                self.mark_sent(external_id, sent[external_id])
+            elif item_result.get('status') == 'conflict':
+                self.adopt(external_id, item_result.get('appendCursor'), sent[external_id])
+                conflicts[external_id] = item_result.get('appendCursor')
+        return conflicts
+
+    def push(
+        self,
+        client,
+        items: List[Dict[str, Any]],
+        sent: Dict[str, List[Dict[str, Any]]],
+        rebuild: Callable[[Set[str]], Deltas],
+        sync_type: str = "incremental"
+    ) -> Dict[str, Any]:
+        """
+        Push deltas, record what the server applied, and resend conflicts once
+
+        rebuild(externalIds) builds the deltas for those thread-days again
+        (after they took the server's cursor). A thread-day with nothing
+        newer than the server's cursor is reported as skipped. Returns the
+        push response with the retried items' results in place.
+        """
+        result = client.push_items(source=self.source, items=items, sync_type=sync_type)
+        conflicts = self.record_results(result.get('results', []), sent)
+        if not conflicts:
+            return result
+
+        retry_items, retry_sent = rebuild(set(conflicts))
+        rebuilt = {item['externalId'] for item in retry_items}
+        retried = {}
+        if retry_items:
+            print(f"Resending {len(retry_items)} conversations from the server's last message...")
+            try:
+                retry = client.push_items(source=self.source, items=retry_items, sync_type=sync_type)
+                self.record_results(retry.get('results', []), retry_sent)
+                retried = {r.get('id'): r for r in retry.get('results', [])}
+            except Exception as e:
+                print(f"Resend failed: {e}")
+
+        results = []
+        for item_result in result.get('results', []):
+            external_id = item_result.get('id')
+            if external_id in conflicts:
+                if external_id in retried:
+                    item_result = retried[external_id]
+                elif external_id not in rebuilt:
+                    item_result = {"id": external_id, "status": "skipped",
+                                   "interactionId": item_result.get('interactionId')}
+            results.append(item_result)
+
+        failed = sum(1 for r in results if r.get('status') in ('failed', 'conflict'))
+        return {**result, "results": results, "processed": len(results) - failed, "failed": failed}
+
+    def reset(self):
+        """Forget all thread-days, so the next sync resends them whole"""
+        self.store.delete_state(self.namespace)
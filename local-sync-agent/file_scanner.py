@@ -0,0 +1,86 @@
+"""
+Ninja OS File Scanner
+Finds input files (exports, recordings) under a directory tree
+
+One os.scandir walk per sync: directories are pruned by name before they
+are entered, files are filtered by extension before they are stat'ed, and
+each stat is done once and handed back to the caller.
+"""
+
+import os
+import heapq
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+# Never contain sync inputs; hidden directories are skipped as well
+DEFAULT_SKIP_DIRS = {'.git', '.Trash', '__MACOSX', '__pycache__', 'node_modules'}
+
+
+class ScannedFile(NamedTuple):
+    path: str
+    stat: os.stat_result
+
+
+def scan_files(
+    root: str,
+    extensions: Iterable[str],
+    skip_dirs: Iterable[str] = DEFAULT_SKIP_DIRS,
+    include: Optional[Callable[[str, os.stat_result], bool]] = None,
+    newest: Optional[int] = None
+) -> List[ScannedFile]:
+    """
+    Return files under root with one of the given extensions, newest first
+
+    include is called with each candidate's path and stat and can reject
+    it (e.g. already synced) before it counts towards newest. With newest,
+    only that many files are kept, using a bounded heap rather than
+    sorting the whole tree. Symlinked directories aren't followed, and a
+    file reachable by several paths (hard links, symlinks) is returned once.
+    """
+    extensions = {ext.lower() for ext in extensions}
+    skip_dirs = set(skip_dirs)
+
+    seen = set()
+    heap: list = []
+    counter = 0
+    stack = [os.path.expanduser(root)]
+
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in skip_dirs and not entry.name.startswith('.'):
+                            stack.append(entry.path)
+                        continue
+
+                    if os.path.splitext(entry.name)[1].lower() not in extensions:
+                        continue
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                file_key = (stat.st_dev, stat.st_ino)
+                if file_key in seen:
+                    continue
+                seen.add(file_key)
+
+                if include and not include(entry.path, stat):
+                    continue
+
+                # The counter breaks mtime ties without comparing stat results
+                counter += 1
+                record = (stat.st_mtime_ns, counter, ScannedFile(entry.path, stat))
+                if newest is None or len(heap) < newest:
+                    heapq.heappush(heap, record)
+                elif record > heap[0]:
+                    heapq.heapreplace(heap, record)
+
+    return [record[2] for record in sorted(heap, reverse=True)]
@@ -0,0 +1,136 @@
+"""
+Ninja OS File Watcher
+Notifies the sync daemon when a source's local data changes
+
+Uses watchdog (FSEvents on macOS, inotify on Linux) when it is installed,
+otherwise falls back to polling file and directory mtimes.
+"""
+
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import WATCH_POLL_SECONDS
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import (
+        FileSystemEventHandler, EVENT_TYPE_CREATED, EVENT_TYPE_MODIFIED, EVENT_TYPE_MOVED
+    )
+    HAS_WATCHDOG = True
+except ImportError:
+    HAS_WATCHDOG = False
+
+
+class PollingWatcher:
+    """
+    Stat-based watcher
+
+    Files are compared by (mtime_ns, size). Directories are compared by
+    the mtimes of the directory and its subdirectories, which change when
+    entries are added, removed or renamed, so the tree's files are never
+    stat'ed individually.
+    """
+
+    def __init__(self, interval: float = WATCH_POLL_SECONDS):
+        self.interval = interval
+        self.paths: Dict[str, List[str]] = {}
+        self._snapshots: Dict[str, Tuple] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, source: str, paths: List[str]):
+        self.paths[source] = [os.path.expanduser(p) for p in paths]
+
+    def _snapshot(self, path: str) -> Tuple:
+        try:
+            if not os.path.isdir(path):
+                stat = os.stat(path)
+                return (stat.st_mtime_ns, stat.st_size)
+            dir_mtimes = []
+            for root, dirs, _ in os.walk(path):
+                dir_mtimes.append((root, os.stat(root).st_mtime_ns))
+            return tuple(dir_mtimes)
+        except OSError:
+            return ()
+
+    def _poll(self, callback: Callable[[str], None]):
+        for source, paths in self.paths.items():
+            for path in paths:
+                snapshot = self._snapshot(path)
+                previous = self._snapshots.get(path)
+                self._snapshots[path] = snapshot
+                if previous is not None and snapshot != previous:
+                    callback(source)
+
+    def start(self, callback: Callable[[str], None]):
+        # Take a baseline so existing state doesn't fire on the first poll
+        for paths in self.paths.values():
+            for path in paths:
+                self._snapshots[path] = self._snapshot(path)
+
+        def run():
+            while not self._stop.wait(self.interval):
+                self._poll(callback)
+
+        self._thread = threading.Thread(target=run, name="poll-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class WatchdogWatcher:
+    """Native filesystem-event watcher backed by watchdog"""
+
+    def __init__(self):
+        self.paths: Dict[str, List[str]] = {}
+        self._observer = None
+
+    def watch(self, source: str, paths: List[str]):
+        self.paths[source] = [os.path.expanduser(p) for p in paths]
+
+    def start(self, callback: Callable[[str], None]):
+        # Watch each file's parent directory (files like chat.db-wal are
+        # replaced, not just modified) and each directory recursively
+        targets: Dict[str, List[Tuple[str, str]]] = {}
+        recursive_dirs = set()
+        for source, paths in self.paths.items():
+            for path in paths:
+                if os.path.isdir(path):
+                    targets.setdefault(path, []).append((source, path))
+                    recursive_dirs.add(path)
+                else:
+                    parent = os.path.dirname(path)
+                    if os.path.isdir(parent):
+                        targets.setdefault(parent, []).append((source, path))
+
+        class Handler(FileSystemEventHandler):
+            def __init__(self, matches: List[Tuple[str, str]]):
+                self.matches = matches
+
+            def on_any_event(self, event):
+                # Reads (opened, closed_no_write) and deletions aren't new data
+                if event.event_type not in (EVENT_TYPE_CREATED, EVENT_TYPE_MODIFIED, EVENT_TYPE_MOVED):
+                    return
+                changed = [event.src_path, getattr(event, "dest_path", "") or ""]
+                for source, path in self.matches:
+                    if any(p == path or p.startswith(path + os.sep) for p in changed if p):
+                        callback(source)
+
+        self._observer = Observer()
+        for directory, matches in targets.items():
+            self._observer.schedule(Handler(matches), directory, recursive=directory in recursive_dirs)
+        self._observer.start()
+
+    def stop(self):
+        if self._observer:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+
+
+def create_watcher(polling: bool = False):
+    """Return a native watcher if available, otherwise a polling one"""
+    if HAS_WATCHDOG and not polling:
+        return WatchdogWatcher()
+    return PollingWatcher()
@@ -0,0 +1,244 @@
+"""
+iMessage Search Index
+Local SQLite FTS5 sidecar for searching chat.db
+
+chat.db has no text index, so LIKE '%query%' scans every message. This
+keeps a copy of message text, including text decoded from attributedBody,
+in an FTS5 table (rowid = chat.db ROWID) next to the sync state, updated
+incrementally from the last indexed ROWID before each search.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from attributed_body import message_text
+from chat_db import highest_message_rowid
+from config import IMESSAGE_SEARCH_INDEX_PATH, IMESSAGE_PAGE_SIZE
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+    text,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TABLE IF NOT EXISTS message_meta (
+    rowid INTEGER PRIMARY KEY,
+    guid TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    is_from_me INTEGER NOT NULL,
+    contact TEXT,
+    chat TEXT
+);
+CREATE INDEX IF NOT EXISTS message_meta_date ON message_meta (date);
+
+CREATE TABLE IF NOT EXISTS index_state (
+    source TEXT PRIMARY KEY,
+    last_rowid INTEGER NOT NULL,
+    last_guid TEXT
+);
+"""
+
+# Terms are quoted so user input can't produce FTS5 syntax errors;
+# "a phrase" stays a phrase and a trailing * keeps prefix matching
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+APPLE_EPOCH = datetime(2001, 1, 1)
+
+
+def has_fts5() -> bool:
+    """Whether this Python's SQLite was built with FTS5"""
+    try:
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def build_match_query(query: str) -> str:
+    """Turn a user query into an FTS5 MATCH expression (all terms must match)"""
+    terms = []
+    for phrase, word in _QUERY_TOKEN.findall(query):
+        if phrase:
+            terms.append('"' + phrase.replace('"', '') + '"')
+        elif word.endswith('*') and len(word) > 1:
+            terms.append('"' + word.rstrip('*').replace('"', '') + '"*')
+        else:
+            terms.append('"' + word.replace('"', '') + '"')
+    return " ".join(terms)
+
+
+def _to_apple_time(dt: datetime) -> int:
+    return int((dt - APPLE_EPOCH).total_seconds() * 1e9)
+
+
+def _from_apple_time(apple_time: int) -> datetime:
+    return APPLE_EPOCH + timedelta(seconds=apple_time / 1e9)
+
+
+class MessageSearchIndex:
+    """FTS5 index over one chat.db"""
+
+    def __init__(self, source_db: str, index_path: str = IMESSAGE_SEARCH_INDEX_PATH):
+        self.source_db = os.path.expanduser(source_db)
+        self.index_path = os.path.expanduser(index_path)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _indexed_through(self, source: sqlite3.Connection) -> int:
+        """
+        ROWID indexed so far, or 0 if the index must be rebuilt
+
+        As with the sync cursor, a different message at the last indexed
+        ROWID, or a table that no longer reaches it, means chat.db was
+        rebuilt and its ROWIDs were reassigned. If that message was just
+        deleted, newer ROWIDs are still past it and the index is kept.
+        """
+        state = self.conn.execute(
+            "SELECT last_rowid, last_guid FROM index_state WHERE source = ?", (self.source_db,)
+        ).fetchone()
+        if not state:
+            return 0
+
+        row = source.execute("SELECT guid FROM message WHERE ROWID = ?", (state[0],)).fetchone()
+        if row is None:
+            rebuilt = highest_message_rowid(source) < state[0]
+        else:
+            rebuilt = row[0] != state[1]
+        if rebuilt:
+            print("iMessage database appears to have been rebuilt, rebuilding search index")
+            self.clear()
+            return 0
+        return state[0]
+
+    def update(self, source: sqlite3.Connection) -> int:
+        """Index messages added to chat.db since the last update. Returns the number added."""
+        added = 0
+        with self._lock:
+            after_rowid = self._indexed_through(source)
+            while True:
+                rows = source.execute("""
+                    SELECT
+                        m.ROWID,
+                        m.guid,
+                        m.text,
+                        m.attributedBody,
+                        m.date,
+                        m.is_from_me,
+                        h.id,
+                        c.chat_identifier
+                    FROM message m
+                    LEFT JOIN handle h ON m.handle_id = h.ROWID
+                    LEFT JOIN chat_message_join cmj ON m.ROWID = cmj.message_id
+                    LEFT JOIN chat c ON cmj.chat_id = c.ROWID
+                    WHERE m.ROWID > ?
+                    ORDER BY m.ROWID
+                    LIMIT ?
+                """, (after_rowid, IMESSAGE_PAGE_SIZE)).fetchall()
+                if not rows:
+                    break
+
+                texts = []
+                metas = []
+                for rowid, guid, text, attributed_body, date, is_from_me, contact, chat in rows:
+                    if rowid == after_rowid:
+                        # Same message joined to a second chat
+                        continue
+                    after_rowid = rowid
+                    text = message_text(rowid, text, attributed_body)
+                    if not text:
+                        continue
+                    texts.append((rowid, text))
+                    metas.append((rowid, guid, date or 0, int(bool(is_from_me)), contact, chat))
+
+                last = rows[-1]
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO message_fts (rowid, text) VALUES (?, ?)", texts
+                    )
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO message_meta (rowid, guid, date, is_from_me, contact, chat) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", metas
+                    )
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO index_state (source, last_rowid, last_guid) VALUES (?, ?, ?)",
+                        (self.source_db, last[0], last[1])
+                    )
+                added += len(texts)
+        return added
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        contact: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Ranked full-text search
+
+        Terms must all match; "quoted phrases" match exactly and term*
+        matches prefixes. contact matches any part of the sender handle or
+        chat identifier. Results are ordered by relevance, then date.
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+
+        sql = """
+            SELECT
+                message_fts.text,
+                snippet(message_fts, 0, '[', ']', '...', 12),
+                m.date,
+                m.is_from_me,
+                m.contact,
+                m.chat
+            FROM message_fts
+            JOIN message_meta m ON m.rowid = message_fts.rowid
+            WHERE message_fts MATCH ?
+        """
+        params: List[Any] = [match]
+        if since:
+            sql += " AND m.date >= ?"
+            params.append(_to_apple_time(since))
+        if until:
+            sql += " AND m.date <= ?"
+            params.append(_to_apple_time(until))
+        if contact:
+            sql += " AND (m.contact LIKE ? OR m.chat LIKE ?)"
+            params.extend([f"%{contact}%", f"%{contact}%"])
+        sql += " ORDER BY bm25(message_fts), m.date DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+
+        return [{
+            "text": row[0],
+            "snippet": row[1],
+            "date": _from_apple_time(row[2]).isoformat(),
+            "isFromMe": bool(row[3]),
+            "contact": row[4],
+            "chat": row[5],
+        } for row in rows]
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM message_fts")
+            self.conn.execute("DELETE FROM message_meta")
+            self.conn.execute("DELETE FROM index_state WHERE source = ?", (self.source_db,))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,218 @@
+"""
+Incremental JSON reading
+Walks large JSON documents without loading them whole
+
+Only the value currently being returned is materialized; everything that
+is skipped is scanned and discarded. Used for Granola's cache, which can
+be hundreds of MB and stores its real payload as a JSON string inside a
+JSON document.
+"""
+
+import re
+import json
+from typing import Any, Iterator, List, Optional, TextIO
+
+CHUNK_SIZE = 1 << 16
+
+# Longest run of string content: plain characters or complete escapes
+_STRING_BODY = re.compile(r'(?:[^"\\]+|\\(?:u[0-9a-fA-F]{4}|[^u]))*')
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_PRIMITIVE_END = re.compile(r'[,\]}\s]')
+_WHITESPACE = re.compile(r'\s*')
+
+
+def file_chunks(f: TextIO, size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield a text file in fixed-size chunks"""
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class JSONTextStream:
+    """
+    Cursor over a JSON document arriving as text chunks
+
+    Methods consume input from the current position: callers walk the
+    document structure themselves (enter an object, read a key, then read
+    or skip its value).
+    """
+
+    def __init__(self, chunks: Iterator[str]):
+        self._chunks = chunks
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Append the next chunk, dropping consumed input. Returns False at EOF."""
+        if self.eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _ensure(self, n: int) -> bool:
+        while len(self.buf) - self.pos < n:
+            if not self._fill():
+                return False
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or '' at end of input"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, found {self.peek()!r}")
+        self.pos += 1
+
+    def next_member(self, first: bool) -> bool:
+        """
+        Advance to the next object member or array element
+
+        Call after entering a container ('{' or '[') with first=True, then
+        with first=False after each member. Returns False (and consumes
+        the closing bracket) when the container ends.
+        """
+        char = self.peek()
+        if char in ('}', ']'):
+            self.pos += 1
+            return False
+        if not first:
+            self.expect(',')
+        return True
+
+    def read_key(self) -> str:
+        key = self.read_value()
+        self.expect(':')
+        return key
+
+    def read_value(self) -> Any:
+        """Parse the next value and return it"""
+        parts: List[str] = []
+        self._scan_value(parts)
+        return json.loads("".join(parts))
+
+    def skip_value(self):
+        """Consume the next value without building it"""
+        self._scan_value(None)
+
+    def _scan_value(self, parts: Optional[List[str]]):
+        char = self.peek()
+        if char == '"':
+            self._scan_string(parts)
+        elif char in ('{', '['):
+            self._scan_container(parts)
+        elif char:
+            self._scan_primitive(parts)
+        else:
+            raise ValueError("Unexpected end of JSON input")
+
+    def _scan_string(self, parts: Optional[List[str]]):
+        start = self.pos
+        self.pos += 1
+        while True:
+            self.pos = _STRING_BODY.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                if self.buf[self.pos] == '"':
+                    self.pos += 1
+                    if parts is not None:
+                        parts.append(self.buf[start:self.pos])
+                    return
+                if len(self.buf) - self.pos >= 6:
+                    raise ValueError(f"Invalid escape at offset {self.pos}")
+            # Need more input (possibly to complete an escape)
+            if parts is not None:
+                parts.append(self.buf[start:self.pos])
+            start = 0
+            if not self._fill():
+                raise ValueError("Unterminated string")
+    
+    def _scan_container(self, parts: Optional[List[str]]):
+        depth = 0
+        start = self.pos
+        while True:
+            match = _STRUCTURAL.search(self.buf, self.pos)
+            if not match:
+                if parts is not None:
+                    parts.append(self.buf[start:])
+                self.pos = len(self.buf)
+                start = 0
+                if not self._fill():
+                    raise ValueError("Unterminated container")
+                continue
+            char = match.group()
+            if char == '"':
+                if parts is not None:
+                    parts.append(self.buf[start:match.start()])
+                self.pos = match.start()
+                self._scan_string(parts)
+                start = self.pos
+                continue
+            self.pos = match.end()
+            depth += 1 if char in '{[' else -1
+            if depth == 0:
+                if parts is not None:
+                    parts.append(self.buf[start:self.pos])
+                return
+
+    def _scan_primitive(self, parts: Optional[List[str]]):
+        collected = []
+        while True:
+            match = _PRIMITIVE_END.search(self.buf, self.pos)
+            end = match.start() if match else len(self.buf)
+            collected.append(self.buf[self.pos:end])
+            self.pos = end
+            if match or not self._fill():
+                break
+        if parts is not None:
+            parts.append("".join(collected))
+
+    def iter_string(self) -> Iterator[str]:
+        """
+        Decode the next string value incrementally
+
+        Yields the unescaped text a buffer at a time, so a JSON document
+        embedded as a string can be fed to another JSONTextStream without
+        ever holding the whole string.
+        """
+        self.expect('"')
+        pending = ''
+        while True:
+            end = _STRING_BODY.match(self.buf, self.pos).end()
+            closed = end < len(self.buf) and self.buf[end] == '"'
+
+            if end > self.pos:
+                text = json.loads('"' + self.buf[self.pos:end] + '"')
+                self.pos = end
+                joined = bool(pending)
+                text, pending = pending + text, ''
+                if not closed and '\ud800' <= text[-1] <= '\udbff':
+                    text, pending = text[:-1], text[-1]
+                if joined:
+                    # Rejoin a surrogate pair split across buffers
+                    text = text.encode('utf-16', 'surrogatepass').decode('utf-16', 'surrogatepass')
+                if text:
+                    yield text
+
+            if closed:
+                self.pos = end + 1
+                if pending:
+                    yield pending
+                return
+
+            if len(self.buf) - end >= 6:
+                raise ValueError(f"Invalid escape at offset {end}")
+            if not self._fill():
+                raise ValueError("Unterminated string")
@@ -0,0 +1,687 @@
+#!/usr/bin/env python3
+"""
+Ninja OS Local Sync Server
+A stand-in for the Ninja OS sync API, for offline end-to-end runs
+
+Implements the routes the agents use: /api/sync/push, /api/sync/transcribe,
+/api/sync/search-person, /api/sync/resolve-people, /api/sync/logs and the
+resumable /api/sync/uploads. It follows server/routes.ts: an externalId is
+created once and then skipped, append-mode items extend the stored
+transcript from its last applied message (a retried delta isn't added
+twice; one that doesn't line up is a conflict), and participants are
+matched against people loaded with --people. Everything is kept in memory
+and nothing is transcribed.
+
+For measuring throughput and retry behavior it can add latency to every
+response, fail a share of requests (before they change any state), and
+record each request as one JSON line:
+
+    python local_server.py --port 5055 --latency-ms 80 --error-rate 0.05 --record requests.jsonl
+    python sync_manager.py --url http://127.0.0.1:5055
+"""
+
+import re
+import gzip
+import json
+import time
+import uuid
+import zlib
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# Sources accepted by /api/sync/push in server/routes.ts
+PUSH_SOURCES = ("granola", "plaud", "imessage", "whatsapp")
+
+# Same limits as the real server (express.json limit, uploadId format)
+MAX_BODY_BYTES = 50 * 1024 * 1024
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+MAX_PENDING_UPLOADS = 20  # Per source
+MAX_RESOLVE_IDENTIFIERS = 1000
+UPLOAD_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+DEFAULT_PORT = 5055
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _digits(value: str) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def _cursor_date(value: Any) -> Optional[str]:
+    """
+    A cursor date as the real server stores it: String(lastMessageDate)
+
+    express.json parses numbers as doubles, so an integer past 2**53 (a
+    chat.db date) has lost precision by then; do the same here.
+    """
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool) and abs(value) > 2 ** 53:
+        value = int(float(value))
+    return str(value)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without this, Nagle plus
+    # the client's delayed ACK adds ~40ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self) -> Tuple[Optional[bytes], Optional[Tuple[int, Dict[str, Any]]]]:
+        """The decoded request body, or an error response"""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            # The body is left unread, so the connection can't be reused
+            self.close_connection = True
+            return None, (413, {"message": "request entity too large"})
+        body = self.rfile.read(length)
+        encoding = (self.headers.get("Content-Encoding") or "identity").lower()
+        try:
+            if encoding == "gzip":
+                body = gzip.decompress(body)
+            elif encoding == "deflate":
+                body = zlib.decompress(body)
+            elif encoding != "identity":
+                return None, (415, {"message": f'unsupported content encoding "{encoding}"'})
+        except (OSError, zlib.error, EOFError):
+            return None, (400, {"message": "invalid compressed body"})
+        return body, None
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, method: str):
+        self.server.app.serve(self, method)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+
+class LocalSyncServer:
+    """In-memory Ninja OS sync API on a background thread"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0,
+        error_status: int = 503,
+        retry_after: Optional[float] = None,
+        record_path: Optional[str] = None,
+        people: Optional[List[Dict[str, Any]]] = None,
+        sources: Sequence[str] = PUSH_SOURCES,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            host, port: Address to listen on (port 0 picks a free port)
+            latency_ms: Added to every response
+            jitter_ms: Up to this much more, chosen at random per request
+            error_rate: Share of requests (0-1) answered with error_status
+            error_status: Status for injected errors (e.g. 503, 500, 429)
+            retry_after: Retry-After seconds sent with injected errors
+            record_path: Append one JSON line per request to this file
+            people: [{id, name, phone, email}] to match participants against
+            sources: Sources accepted by /api/sync/push
+            seed: Seed for latency jitter and error injection
+        """
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.people = people or []
+        self.sources = tuple(sources)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self._record = open(record_path, 'a', buffering=1) if record_path else None
+        self._thread: Optional[threading.Thread] = None
+
+        self.interactions: Dict[str, Dict[str, Any]] = {}
+        self.sync_logs: List[Dict[str, Any]] = []
+        self.uploads: Dict[str, int] = {}
+        self.upload_sources: Dict[str, str] = {}
+
+        self.requests = 0
+        self.items = 0
+        self.transcriptions = 0
+        self.upload_bytes = 0
+        self.errors_injected = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "LocalSyncServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.close()
+
+    def close(self):
+        self.httpd.server_close()
+        if self._record:
+            self._record.close()
+            self._record = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "items": self.items,
+                "interactions": len(self.interactions),
+                "transcriptions": self.transcriptions,
+                "uploadBytes": self.upload_bytes,
+                "errorsInjected": self.errors_injected,
+            }
+
+    # ---- Request handling ----
+
+    def serve(self, handler: _Handler, method: str):
+        """Delay, maybe fail, then route one request and record it"""
+        started = time.perf_counter()
+        url = urlparse(handler.path)
+        with self.lock:
+            self.requests += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+            inject = self.error_rate > 0 and self.random.random() < self.error_rate
+            if inject:
+                self.errors_injected += 1
+
+        body, error = handler._read_body() if method in ("POST", "PUT") else (b"", None)
+        if delay:
+            time.sleep(delay)
+
+        headers = {}
+        if inject:
+            status, payload = self.error_status, {"message": "Injected error"}
+            if self.retry_after is not None:
+                headers["Retry-After"] = f"{self.retry_after:g}"
+        elif error:
+            status, payload = error
+        else:
+            try:
+                status, payload = self.handle(method, url.path, parse_qs(url.query), body)
+            except Exception as e:
+                status, payload = 500, {"message": str(e)}
+
+        handler._send(status, payload, headers)
+        self._log_request(method, url.path, status, body, payload, inject, started)
+
+    def _log_request(self, method: str, path: str, status: int, body: Optional[bytes],
+                     payload: Any, injected: bool, started: float):
+        if not self._record:
+            return
+        entry = {
+            "time": _now(),
+            "method": method,
+            "path": path,
+            "status": status,
+            "ms": round((time.perf_counter() - started) * 1000, 2),
+            "bytes": len(body or b""),
+            "injected": injected,
+        }
+        if path == "/api/sync/push" and isinstance(payload, dict) and "results" in payload:
+            entry["items"] = payload["received"]
+            entry["statuses"] = {}
+            for result in payload["results"]:
+                entry["statuses"][result["status"]] = entry["statuses"].get(result["status"], 0) + 1
+        elif path == "/api/sync/transcribe" and isinstance(payload, dict):
+            entry["result"] = payload.get("status")
+        line = json.dumps(entry)
+        with self.lock:
+            if self._record:
+                self._record.write(line + "\n")
+
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], body: bytes) -> Tuple[int, Any]:
+        """Route a request; returns (status, JSON payload)"""
+        if path.startswith("/api/sync/uploads/"):
+            upload_id = path[len("/api/sync/uploads/"):]
+            if method == "GET":
+                return self._upload_status(upload_id)
+            if method == "PUT":
+                return self._upload_chunk(upload_id, query, body)
+
+        if method == "GET" and path == "/api/sync/logs":
+            return self._logs(query)
+        if method == "GET" and path == "/api/sync/search-person":
+            return self._search_person(query)
+
+        if method == "POST" and path in ("/api/sync/push", "/api/sync/transcribe", "/api/sync/resolve-people"):
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                return 400, {"message": "Invalid JSON body"}
+            if not isinstance(request, dict):
+                return 400, {"message": "Invalid JSON body"}
+            if path == "/api/sync/push":
+                return self._push(request)
+            if path == "/api/sync/transcribe":
+                return self._transcribe(request)
+            return self._resolve_people(request)
+
+        return 404, {"message": "Not found"}
+
+    # ---- People (storage.getPersonByPhone / ByEmail / searchPeopleByName) ----
+
+    def _person_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
+        normalized = _digits(phone)
+        if not normalized:
+            return None
+        for person in self.people:
+            candidate = _digits(person.get("phone") or "")
+            if candidate and (candidate == normalized or candidate.endswith(normalized)
+                              or normalized.endswith(candidate)):
+                return person
+        return None
+
+    def _person_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        email = email.lower()
+        for person in self.people:
+            if (person.get("email") or "").lower() == email:
+                return person
+        return None
+
+    def _people_by_name(self, name: str) -> List[Dict[str, Any]]:
+        name = name.lower()
+        return [person for person in self.people if name in (person.get("name") or "").lower()]
+
+    def _match_item(self, item: Dict[str, Any]) -> Optional[str]:
+        """personId for a pushed item, in the order routes.ts tries"""
+        person_hint = item.get("personHint") or {}
+        if item.get("personResolved"):
+            return person_hint.get("id") or None
+
+        for participant in item.get("participants") or []:
+            if participant.get("phone"):
+                person = self._person_by_phone(participant["phone"])
+                if person:
+                    return person["id"]
+            if participant.get("email"):
+                person = self._person_by_email(participant["email"])
+                if person:
+                    return person["id"]
+            if participant.get("name"):
+                matches = self._people_by_name(participant["name"])
+                if len(matches) == 1:
+                    return matches[0]["id"]
+
+        if person_hint.get("id"):
+            return person_hint["id"]
+        if person_hint.get("phone"):
+            person = self._person_by_phone(person_hint["phone"])
+            return person["id"] if person else None
+        if person_hint.get("email"):
+            person = self._person_by_email(person_hint["email"])
+            return person["id"] if person else None
+        if person_hint.get("name"):
+            matches = self._people_by_name(person_hint["name"])
+            return matches[0]["id"] if len(matches) == 1 else None
+        return None
+
+    # ---- Routes ----
+
+    def _logs(self, query: Dict[str, List[str]]) -> Tuple[int, Any]:
+        source = query.get("source", [None])[0]
+        with self.lock:
+            logs = [log for log in self.sync_logs if not source or log["source"] == source]
+        return 200, sorted(logs, key=lambda log: log["startedAt"], reverse=True)
+
+    def _push(self, request: Dict[str, Any]) -> Tuple[int, Any]:
+        source, items = request.get("source"), request.get("items")
+        if not source or source not in self.sources:
+            return 400, {"message": f"Invalid source. Must be one of: {', '.join(self.sources)}"}
+        if not isinstance(items, list):
+            return 400, {"message": "Items array required"}
+
+        sync_log = {
+            "id": str(uuid.uuid4()),
+            "source": source,
+            "syncType": request.get("syncType") or "incremental",
+            "status": "processing",
+            "itemsReceived": len(items),
+            "itemsProcessed": 0,
+            "itemsFailed": 0,
+            "errorMessage": None,
+            "metadata": request.get("metadata"),
+            "startedAt": _now(),
+            "completedAt": None,
+        }
+        results = []
+        processed = failed = 0
+
+        with self.lock:
+            self.sync_logs.append(sync_log)
+            self.items += len(items)
+            for item in items:
+                try:
+                    result = self._push_item(source, item)
+                except Exception as e:
+                    result = {"id": (item.get("externalId") if isinstance(item, dict) else None) or "unknown",
+                              "status": "failed", "error": str(e)}
+                results.append(result)
+                if result["status"] in ("failed", "conflict"):
+                    failed += 1
+                else:
+                    processed += 1
+            sync_log.update({
+                "status": "completed",
+                "itemsProcessed": processed,
+                "itemsFailed": failed,
+                "completedAt": _now(),
+            })
+
+        return 200, {
+            "syncId": sync_log["id"],
+            "received": len(items),
+            "processed": processed,
+            "failed": failed,
+            "results": results,
+        }
+
+    def _push_item(self, source: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Store one pushed item (caller holds the lock)"""
+        external_id = item.get("externalId")
+        if not external_id:
+            return {"id": "unknown", "status": "failed", "error": "Missing externalId"}
+
+        participants = item.get("participants") or []
+        names = [p.get("name") or p.get("phone") or p.get("email") for p in participants]
+        names = [name for name in names if name]
+        transcript = item.get("transcript")
+
+        next_cursor = ({"id": item["lastMessageId"], "date": _cursor_date(item.get("lastMessageDate"))}
+                       if item.get("mode") == "append" and item.get("lastMessageId") else None)
+
+        existing = self.interactions.get(external_id)
+        if existing and item.get("mode") == "append" and transcript:
+            # The interaction's cursor is the last message applied: a retried
+            # delta ending there changes nothing, one that doesn't start
+            # there is a conflict, and only a rewrite replaces the transcript
+            cursor = existing.get("appendCursor")
+            previous = existing["transcript"] or ""
+            if item.get("rewrite"):
+                updated = transcript
+            elif cursor and item.get("lastMessageId") and item["lastMessageId"] == cursor["id"]:
+                return {"id": external_id, "status": "appended", "interactionId": existing["id"]}
+            elif cursor and item.get("appendAfter") == cursor["id"]:
+                updated = f"{previous}\n{transcript}" if previous else transcript
+            elif not cursor and item.get("appendAfter") and previous:
+                # Stored without a cursor: fall back to the text check
+                updated = previous if previous.endswith(transcript) else f"{previous}\n{transcript}"
+            else:
+                return {"id": external_id, "status": "conflict", "interactionId": existing["id"],
+                        "appendCursor": cursor, "error": "appendAfter is not the last stored message"}
+            existing["transcript"] = updated
+            existing["appendCursor"] = next_cursor or cursor
+            if item.get("timestamp") and item["timestamp"] > existing["occurredAt"]:
+                existing["occurredAt"] = item["timestamp"]
+            existing["participants"] = list(dict.fromkeys((existing["participants"] or []) + names))
+            return {"id": external_id, "status": "appended", "interactionId": existing["id"]}
+        if existing:
+            return {"id": external_id, "status": "skipped", "interactionId": existing["id"]}
+
+        person_id = self._match_item(item)
+        item_type = item.get("type")
+        interaction = {
+            "id": str(uuid.uuid4()),
+            "personId": person_id,
+            "type": item_type or "meeting",
+            "source": source,
+            "title": item.get("title") or f"{source.capitalize()} {item_type or 'interaction'}",
+            "summary": item.get("summary"),
+            "transcript": transcript or item.get("content"),
+            "externalId": external_id,
+            "externalLink": item.get("externalLink"),
+            "duration": item.get("duration"),
+            "occurredAt": item.get("timestamp") or _now(),
+            "participants": names or None,
+            "appendCursor": next_cursor,
+        }
+        self.interactions[external_id] = interaction
+        result = {"id": external_id, "status": "created", "interactionId": interaction["id"]}
+        if person_id:
+            result["personId"] = person_id
+        return result
+
+    def _upload_status(self, upload_id: str) -> Tuple[int, Any]:
+        if not UPLOAD_ID.match(upload_id):
+            return 400, {"message": "Invalid uploadId"}
+        with self.lock:
+            return 200, {"uploadId": upload_id, "offset": self.uploads.get(upload_id, 0)}
+
+    def _upload_chunk(self, upload_id: str, query: Dict[str, List[str]], body: bytes) -> Tuple[int, Any]:
+        if not UPLOAD_ID.match(upload_id):
+            return 400, {"message": "Invalid uploadId"}
+        with self.lock:
+            current = self.uploads.get(upload_id, 0)
+            try:
+                offset = int(query.get("offset", ["0"])[0])
+            except ValueError:
+                offset = -1
+            if offset != current:
+                return 409, {"message": "Offset mismatch", "uploadId": upload_id, "offset": current}
+            if current + len(body) > MAX_UPLOAD_BYTES:
+                return 413, {"message": f"Uploads are limited to {MAX_UPLOAD_BYTES} bytes"}
+            if upload_id not in self.uploads:
+                source = query.get("source", ["unknown"])[0]
+                pending = sum(1 for other in self.uploads if self.upload_sources.get(other) == source)
+                if pending >= MAX_PENDING_UPLOADS:
+                    return 429, {"message": f"Too many pending uploads for {source}"}
+                self.upload_sources[upload_id] = source
+            # Only the length is kept; the audio itself is discarded
+            self.uploads[upload_id] = current + len(body)
+            self.upload_bytes += len(body)
+            return 200, {"uploadId": upload_id, "offset": self.uploads[upload_id]}
+
+    def _transcribe(self, request: Dict[str, Any]) -> Tuple[int, Any]:
+        upload_id = request.get("uploadId")
+        audio_base64 = request.get("audioBase64")
+        if not request.get("audioUrl") and not audio_base64 and not upload_id:
+            return 400, {"message": "Either audioUrl, audioBase64 or uploadId required"}
+
+        if upload_id and not UPLOAD_ID.match(upload_id):
+            return 400, {"message": "Invalid uploadId"}
+        external_id = request.get("externalId")
+        if not external_id:
+            return 400, {"message": "externalId required for deduplication"}
+
+        with self.lock:
+            self.transcriptions += 1
+            if not upload_id:
+                self.upload_bytes += len(audio_base64 or "")
+
+            # Checked before the upload, as a retry of a request that
+            # succeeded finds its upload already removed
+            existing = self.interactions.get(external_id)
+            if existing:
+                self.uploads.pop(upload_id, None)
+                self.upload_sources.pop(upload_id, None)
+                return 200, {"status": "skipped", "message": "Already exists", "interactionId": existing["id"]}
+            if upload_id and upload_id not in self.uploads:
+                return 400, {"message": "Unknown uploadId"}
+            # The upload is only removed once the interaction exists
+            audio_bytes = self.uploads.pop(upload_id) if upload_id else len(audio_base64 or "") * 3 // 4
+            self.upload_sources.pop(upload_id, None)
+
+            person_id = None
+            person_hint = request.get("personHint") or {}
+            if person_hint.get("id"):
+                person_id = person_hint["id"]
+            elif person_hint.get("phone"):
+                person = self._person_by_phone(person_hint["phone"])
+                person_id = person["id"] if person else None
+            elif person_hint.get("name"):
+                matches = self._people_by_name(person_hint["name"])
+                person_id = matches[0]["id"] if len(matches) == 1 else None
+
+            transcript = f"[local server: {audio_bytes} bytes of audio, not transcribed]"
+            interaction = {
+                "id": str(uuid.uuid4()),
+                "personId": person_id,
+                "type": "call",
+                "source": request.get("source") or "plaud",
+                "title": "Plaud Recording",
+                "summary": None,
+                "transcript": transcript,
+                "externalId": external_id,
+                "externalLink": request.get("audioUrl"),
+                "duration": None,
+                "occurredAt": request.get("timestamp") or _now(),
+                "participants": None,
+            }
+            self.interactions[external_id] = interaction
+
+        return 200, {
+            "status": "created",
+            "interactionId": interaction["id"],
+            "personId": person_id,
+            "transcriptLength": len(transcript),
+        }
+
+    def _search_person(self, query: Dict[str, List[str]]) -> Tuple[int, Any]:
+        phone = query.get("phone", [None])[0]
+        email = query.get("email", [None])[0]
+        name = query.get("name", [None])[0]
+        if phone:
+            person = self._person_by_phone(phone)
+            return 200, {"matches": [person] if person else []}
+        if email:
+            person = self._person_by_email(email)
+            return 200, {"matches": [person] if person else []}
+        if name:
+            return 200, {"matches": self._people_by_name(name)}
+        return 200, {"matches": []}
+
+    def _resolve_people(self, request: Dict[str, Any]) -> Tuple[int, Any]:
+        identifiers = request.get("identifiers")
+        if not isinstance(identifiers, list):
+            return 400, {"message": "Identifiers array required"}
+        if len(identifiers) > MAX_RESOLVE_IDENTIFIERS:
+            return 400, {"message": f"At most {MAX_RESOLVE_IDENTIFIERS} identifiers per request"}
+
+        person_ids = []
+        for identifier in identifiers:
+            identifier = identifier if isinstance(identifier, dict) else {}
+            person_id = None
+            if identifier.get("phone"):
+                person = self._person_by_phone(identifier["phone"])
+                person_id = person["id"] if person else None
+            elif identifier.get("email"):
+                person = self._person_by_email(identifier["email"])
+                person_id = person["id"] if person else None
+            elif identifier.get("name"):
+                matches = self._people_by_name(identifier["name"])
+                person_id = matches[0]["id"] if len(matches) == 1 else None
+            person_ids.append(person_id)
+        return 200, {"personIds": person_ids}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the Ninja OS sync API",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python local_server.py                                  # serve on 127.0.0.1:5055
+  python local_server.py --latency-ms 100 --jitter-ms 50  # slow network
+  python local_server.py --error-rate 0.1 --error-status 429 --retry-after 2
+  python local_server.py --record requests.jsonl --people people.json
+
+Then point an agent at it:
+  python sync_manager.py --url http://127.0.0.1:5055
+        """
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Up to this much extra random delay")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="Share of requests (0-1) that fail before they are processed")
+    parser.add_argument("--error-status", type=int, default=503, help="Status of injected errors (default: 503)")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with injected errors")
+    parser.add_argument("--record", help="Append one JSON line per request to this file")
+    parser.add_argument("--people", help="JSON file of people [{id, name, phone, email}] to match against")
+    parser.add_argument("--accept-source", action="append", default=[],
+                        help="Also accept pushes from this source (the real server only accepts "
+                             f"{', '.join(PUSH_SOURCES)})")
+    parser.add_argument("--seed", type=int, help="Seed for jitter and error injection")
+
+    args = parser.parse_args()
+    if not 0 <= args.error_rate <= 1:
+        parser.error("--error-rate must be between 0 and 1")
+
+    people = None
+    if args.people:
+        with open(args.people) as f:
+            people = json.load(f)
+
+    server = LocalSyncServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        record_path=args.record,
+        people=people,
+        sources=PUSH_SOURCES + tuple(args.accept_source),
+        seed=args.seed
+    )
+    print(f"Ninja OS local sync server on {server.url}")
+    print(f"  python sync_manager.py --url {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStopped. {json.dumps(server.stats())}")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
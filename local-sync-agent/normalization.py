@@ -0,0 +1,186 @@
+"""
+Contact Identifier Normalization
+Canonical phone (E.164) and email keys for participant matching
+
+The same person shows up as "(555) 123-4567", "+15551234567" and
+"5551234567" in iMessage handles, as "+1 555 123 4567" or a WhatsApp JID
+in chat exports, and as differently cased emails elsewhere. Each variant
+is normalized once into a canonical key, and IdentifierIndex remembers
+raw variant -> key for the whole process, so every agent (and the contact
+cache) agrees on one key per person.
+
+Phones use the phonenumbers library when it is installed, and otherwise
+a small built-in parser: numbers without a country code are read as
+DEFAULT_PHONE_REGION numbers.
+
+Emails are stripped and case-folded; for Gmail addresses, which ignore
+dots in the local part, the dots are removed from the key too. Matching
+against Ninja OS still sends the address as written (lowercased), since
+the server compares stored emails exactly.
+"""
+
+import re
+from typing import Dict, NamedTuple, Optional
+
+from config import DEFAULT_PHONE_REGION
+
+try:
+    import phonenumbers
+except ImportError:
+    phonenumbers = None
+
+# Country calling codes for the built-in parser (phonenumbers knows them all)
+CALLING_CODES = {
+    "US": "1", "CA": "1", "GB": "44", "IE": "353", "DE": "49", "FR": "33", "ES": "34",
+    "IT": "39", "NL": "31", "CH": "41", "AT": "43", "SE": "46", "AU": "61", "NZ": "64",
+    "IN": "91", "SG": "65", "IL": "972", "BR": "55", "MX": "52", "ZA": "27",
+}
+
+GMAIL_DOMAINS = ('gmail.com', 'googlemail.com')
+
+_PHONE_CHARS = re.compile(r'^\+?[\d\s().\-/]{5,}$')
+_NON_DIGITS = re.compile(r'\D')
+_WHATSAPP_JID = re.compile(r'^(\d{6,15})@(?:s\.whatsapp\.net|c\.us)$')
+
+
+class Identifier(NamedTuple):
+    """A classified handle: phone and email are what to send, key is what to compare"""
+    raw: str
+    phone: Optional[str]
+    email: Optional[str]
+    key: Optional[str]
+
+
+def normalize_phone(value: str, region: str = DEFAULT_PHONE_REGION) -> Optional[str]:
+    """E.164 form of a phone number ("+15551234567"), or None if it isn't one"""
+    value = (value or "").strip()
+    if not value or not _PHONE_CHARS.match(value):
+        return None
+
+    if phonenumbers is not None:
+        try:
+            number = phonenumbers.parse(value, region)
+        except phonenumbers.NumberParseException:
+            return None
+        if not phonenumbers.is_possible_number(number):
+            return None
+        return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+    digits = _NON_DIGITS.sub('', value)
+    if value.startswith('+'):
+        international = digits
+    elif digits.startswith('00'):
+        international = digits[2:]
+    else:
+        code = CALLING_CODES.get(region.upper())
+        if not code:
+            return None
+        if code == "1":
+            # North American numbers: 10 digits, or 11 with the leading 1
+            if len(digits) == 11 and digits.startswith('1'):
+                digits = digits[1:]
+            if len(digits) != 10:
+                return None
+        else:
+            digits = digits[1:] if digits.startswith('0') else digits
+            if not 6 <= len(digits) <= 12:
+                return None
+        international = code + digits
+
+    if not 7 <= len(international) <= 15 or international.startswith('0'):
+        return None
+    return '+' + international
+
+
+def normalize_email(value: str) -> Optional[str]:
+    """Canonical comparison key for an email address, or None if it isn't one"""
+    value = (value or "").strip()
+    if value.lower().startswith('mailto:'):
+        value = value[7:]
+    local, at, domain = value.casefold().rpartition('@')
+    if not at or not local or '.' not in domain:
+        return None
+    if domain in GMAIL_DOMAINS:
+        local, domain = local.replace('.', ''), GMAIL_DOMAINS[0]
+    return f"{local}@{domain}"
+
+
+def classify(value: str, region: str = DEFAULT_PHONE_REGION) -> Identifier:
+    """Classify a raw handle (phone, email, WhatsApp JID or anything else)"""
+    raw = (value or "").strip()
+
+    jid = _WHATSAPP_JID.match(raw)
+    if jid:
+        phone = '+' + jid.group(1)
+        return Identifier(value, phone, None, f"phone:{phone}")
+
+    if '@' in raw:
+        key = normalize_email(raw)
+        if key:
+            email = raw[7:] if raw.lower().startswith('mailto:') else raw
+            return Identifier(value, None, email.lower(), f"email:{key}")
+        return Identifier(value, None, None, None)
+
+    phone = normalize_phone(raw, region)
+    if phone:
+        return Identifier(value, phone, None, f"phone:{phone}")
+
+    # Short codes and other digit-only senders are still phones, just not E.164
+    digits = _NON_DIGITS.sub('', raw)
+    if digits and _PHONE_CHARS.match(raw):
+        return Identifier(value, digits, None, f"phone:{digits}")
+    return Identifier(value, None, None, None)
+
+
+class IdentifierIndex:
+    """
+    Process-wide map of raw identifier -> Identifier
+
+    Each distinct raw string is parsed once; chat.db handle tables and
+    chat exports repeat the same handful of senders many times. Single
+    dict operations are atomic, so lookups need no lock.
+    """
+
+    def __init__(self, region: str = DEFAULT_PHONE_REGION):
+        self.region = region
+        self._entries: Dict[str, Identifier] = {}
+
+    def classify(self, value: str) -> Identifier:
+        try:
+            return self._entries[value]
+        except KeyError:
+            pass
+        identifier = classify(value, self.region)
+        self._entries[value] = identifier
+        return identifier
+
+    def key(self, value: str) -> Optional[str]:
+        """Canonical key for a raw phone, email or JID"""
+        return self.classify(value).key
+
+    def participant(self, label: str) -> Dict[str, str]:
+        """
+        Participant dict for a sender label
+
+        Chat exports use the contact's name when it's saved on the phone,
+        and the number (or JID) otherwise; numbers become a phone
+        participant so they can still be matched.
+        """
+        identifier = self.classify(label)
+        participant = {"name": label}
+        if identifier.phone:
+            participant["phone"] = identifier.phone
+        elif identifier.email:
+            participant["email"] = identifier.email
+        return participant
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_index = IdentifierIndex()
+
+
+def get_identifier_index() -> IdentifierIndex:
+    """Return the process-wide identifier index"""
+    return _index
@@ -0,0 +1,255 @@
+"""
+Ninja OS Sync Outbox
+Durable queue for pushes and transcriptions that couldn't reach the server
+
+When Ninja OS is unreachable (connection errors, timeouts, 429/5xx after
+the client's own retries), the request payload is stored in the sync state
+database instead of being thrown away. The next sync replays it before
+running the agents, backing off between attempts while the server stays
+down. Entries are keyed by externalId, so re-queuing an item replaces the
+older copy rather than sending it twice. An entry the server rejects
+outright (a 4xx other than 429, e.g. "Unknown uploadId" once an upload
+has expired) is dropped, so the agent sends it afresh on its next sync.
+"""
+
+import json
+import time
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from sync_state import SyncStateStore, get_state_store
+from config import (
+    OUTBOX_RETRY_BACKOFF_SECONDS, OUTBOX_RETRY_BACKOFF_MAX_SECONDS, OUTBOX_MAX_AGE_DAYS
+)
+
+SENT_STATUSES = ('created', 'skipped', 'appended')
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Whether a failed request is worth queuing (server unavailable, not a rejected payload)"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+def is_rejected_error(error: Exception) -> bool:
+    """Whether the server refused the request itself (4xx other than 429), so resending it can't succeed"""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return 400 <= error.response.status_code < 500 and error.response.status_code != 429
+    return False
+
+
+class Outbox:
+    """Queued requests, stored in the outbox table of the sync state database"""
+
+    def __init__(self, store: Optional[SyncStateStore] = None):
+        self.store = store or get_state_store()
+
+    def _put(self, kind: str, source: str, external_id: str, payload: Dict[str, Any], error: str):
+        with self.store.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO outbox "
+                "(kind, source, external_id, payload, attempts, next_attempt_at, last_error, queued_at) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                (kind, source, external_id, json.dumps(payload, default=str),
+                 time.time() + OUTBOX_RETRY_BACKOFF_SECONDS, error, datetime.now().isoformat())
+            )
+
+    def enqueue_items(self, source: str, items: List[Dict[str, Any]], sync_type: str, error: Exception):
+        """Queue push items (one entry per externalId)"""
+        for item in items:
+            if item.get("externalId"):
+                self._put("push", source, item["externalId"],
+                          {"item": item, "syncType": sync_type}, str(error))
+        print(f"Queued {len(items)} {source} items in the outbox for retry")
+
+    def enqueue_transcription(self, request: Dict[str, Any], error: Exception):
+        """Queue a transcribe_audio() call, given its keyword arguments"""
+        self._put("transcribe", request.get("source") or "plaud", request["external_id"], request, str(error))
+        print(f"Queued transcription {request['external_id']} in the outbox for retry")
+
+    def discard(
+        self,
+        kind: str,
+        source: str,
+        external_ids: List[str],
+        items: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        """
+        Drop entries that have since been sent directly
+        
+        Otherwise a queued append delta could be replayed after a newer
+        delta covering the same messages was already applied. Given the
+        sent items ({externalId: item}), a queued append delta is only
+        dropped if the sent one started from the same appendAfter and so
+        carried all of its messages; one holding other messages stays
+        queued (if the server has moved past it, replay gets "conflict"
+        and drops it then).
+        """
+        external_ids = [external_id for external_id in external_ids if external_id]
+        if not external_ids or not self.store.query("SELECT 1 FROM outbox LIMIT 1"):
+            return
+        with self.store.transaction() as conn:
+            for external_id in external_ids:
+                row = conn.execute(
+                    "SELECT payload FROM outbox WHERE kind = ? AND source = ? AND external_id = ?",
+                    (kind, source, external_id)
+                ).fetchone()
+                if row is None:
+                    continue
+                if items is not None and not self._covers(items.get(external_id), json.loads(row[0])):
+                    continue
+                conn.execute(
+                    "DELETE FROM outbox WHERE kind = ? AND source = ? AND external_id = ?",
+                    (kind, source, external_id)
+                )
+
+    @staticmethod
+    def _covers(sent: Optional[Dict[str, Any]], payload: Dict[str, Any]) -> bool:
+        """Whether a sent push item carried everything a queued one holds"""
+        queued = payload.get("item") or {}
+        if queued.get("mode") != "append":
+            return True
+        return bool(sent) and sent.get("mode") == "append" and sent.get("appendAfter") == queued.get("appendAfter")
+
+    def is_queued(self, source: str, external_id: str) -> bool:
+        return bool(self.store.query(
+            "SELECT 1 FROM outbox WHERE source = ? AND external_id = ?", (source, external_id)
+        ))
+
+    def depth(self) -> Dict[str, int]:
+        """Queued entries per source"""
+        return dict(self.store.query(
+            "SELECT source, COUNT(*) FROM outbox GROUP BY source ORDER BY source"
+        ))
+
+    def _due(self) -> List[Dict[str, Any]]:
+        rows = self.store.query(
+            "SELECT kind, source, external_id, payload, attempts, queued_at FROM outbox "
+            "WHERE next_attempt_at <= ? ORDER BY queued_at",
+            (time.time(),)
+        )
+        return [{
+            "kind": row[0], "source": row[1], "external_id": row[2],
+            "payload": json.loads(row[3]), "attempts": row[4], "queued_at": row[5],
+        } for row in rows]
+
+    def _delete(self, entry: Dict[str, Any]):
+        with self.store.transaction() as conn:
+            conn.execute(
+                "DELETE FROM outbox WHERE kind = ? AND source = ? AND external_id = ?",
+                (entry["kind"], entry["source"], entry["external_id"])
+            )
+
+    def _defer(self, entry: Dict[str, Any], error: Any):
+        """Schedule the next attempt with exponential backoff and jitter"""
+        attempts = entry["attempts"] + 1
+        delay = min(OUTBOX_RETRY_BACKOFF_SECONDS * (2 ** attempts), OUTBOX_RETRY_BACKOFF_MAX_SECONDS)
+        with self.store.transaction() as conn:
+            conn.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE kind = ? AND source = ? AND external_id = ?",
+                (attempts, time.time() + delay * random.uniform(0.5, 1.5), str(error),
+                 entry["kind"], entry["source"], entry["external_id"])
+            )
+
+    def _sent(self, entry: Dict[str, Any], status: str):
+        self._delete(entry)
+        if status in ('created', 'skipped'):
+            self.store.mark_synced(entry["source"], [entry["external_id"]])
+
+    def _failed(self, entries: List[Dict[str, Any]], error: Exception, counts: Dict[str, int]):
+        """Drop entries the server rejected; retry anything else later"""
+        if not is_rejected_error(error):
+            for entry in entries:
+                self._defer(entry, error)
+            counts["failed"] += len(entries)
+            return
+        for entry in entries:
+            print(f"Dropping outbox entry {entry['source']}/{entry['external_id']}: {error}")
+            self._delete(entry)
+        counts["rejected"] += len(entries)
+
+    def replay(self, client) -> Dict[str, int]:
+        """
+        Resend entries whose backoff has elapsed
+
+        client should not queue failures itself (use_outbox=False) so a
+        failed replay only moves the entry's next attempt. Entries older
+        than OUTBOX_MAX_AGE_DAYS are dropped.
+
+        Returns counts of sent, failed, rejected (dropped after a 4xx) and
+        expired entries.
+        """
+        counts = {"sent": 0, "failed": 0, "rejected": 0, "expired": 0}
+        cutoff = (datetime.now() - timedelta(days=OUTBOX_MAX_AGE_DAYS)).isoformat()
+
+        pushes: Dict[tuple, List[Dict[str, Any]]] = {}
+        for entry in self._due():
+            if entry["queued_at"] < cutoff:
+                print(f"Dropping outbox entry {entry['source']}/{entry['external_id']} "
+                      f"after {OUTBOX_MAX_AGE_DAYS} days")
+                self._delete(entry)
+                counts["expired"] += 1
+            elif entry["kind"] == "push":
+                pushes.setdefault((entry["source"], entry["payload"]["syncType"]), []).append(entry)
+            else:
+                try:
+                    result = client.transcribe_audio(**entry["payload"])
+                except Exception as e:
+                    self._failed([entry], e, counts)
+                    continue
+                if result.get("status") in SENT_STATUSES:
+                    self._sent(entry, result["status"])
+                    counts["sent"] += 1
+                else:
+                    self._defer(entry, result.get("error") or result.get("message"))
+                    counts["failed"] += 1
+
+        for (source, sync_type), entries in pushes.items():
+            try:
+                result = client.push_items(
+                    source=source,
+                    items=[entry["payload"]["item"] for entry in entries],
+                    sync_type=sync_type
+                )
+            except Exception as e:
+                self._failed(entries, e, counts)
+                continue
+
+            item_results = {r.get("id"): r for r in result.get("results", [])}
+            for entry in entries:
+                item_result = item_results.get(entry["external_id"], {})
+                if item_result.get("status") in SENT_STATUSES:
+                    self._sent(entry, item_result["status"])
+                    counts["sent"] += 1
+                elif item_result.get("status") == "conflict":
+                    # A queued append delta that no longer lines up with the
+                    # server; the agent resends its messages from the
+                    # server's cursor on its next sync
+                    self._delete(entry)
+                    counts["rejected"] += 1
+                else:
+                    self._defer(entry, item_result.get("error", "Not in push results"))
+                    counts["failed"] += 1
+
+        return counts
+
+
+_outbox: Optional[Outbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    """Return the process-wide outbox"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox()
+        return _outbox
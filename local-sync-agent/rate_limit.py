@@ -0,0 +1,237 @@
+"""
+HTTP Rate Limiting
+Token-bucket rate limiter and retry scheduler shared by Ninja OS and Fathom requests
+
+Every host gets one RateLimiter for the whole process, so the Fathom
+page prefetch, its transcript workers and the Ninja OS push workers each
+draw from a single budget per host instead of throttling independently.
+A limiter combines:
+
+    - a token bucket (requests per second, with a burst allowance)
+    - a concurrency limit that halves on 429 and grows back by one after
+      a full window of successful requests (AIMD)
+    - a pause until Retry-After, or until the rate-limit window resets
+      when RateLimit-Remaining / X-RateLimit-Remaining reaches 0, that
+      applies to every thread using the host
+"""
+
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from config import RETRY_BACKOFF_SECONDS, RETRY_BACKOFF_MAX_SECONDS
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Reset headers above this are epoch timestamps rather than delays
+_EPOCH_THRESHOLD = 10 ** 9
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Delay requested by a Retry-After header (seconds or HTTP date), if any"""
+    value = response.headers.get("Retry-After", "").strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def rate_limit_status(response: requests.Response) -> Tuple[Optional[int], Optional[float]]:
+    """
+    (remaining requests, seconds until the window resets) from rate-limit headers
+
+    Reads the IETF RateLimit-* headers and the common X-RateLimit-* ones;
+    a reset given as an epoch timestamp is converted to a delay.
+    """
+    headers = response.headers
+    remaining = headers.get("RateLimit-Remaining") or headers.get("X-RateLimit-Remaining")
+    reset = headers.get("RateLimit-Reset") or headers.get("X-RateLimit-Reset")
+
+    try:
+        remaining = int(remaining) if remaining is not None else None
+    except ValueError:
+        remaining = None
+    try:
+        reset = float(reset) if reset is not None else None
+    except ValueError:
+        reset = None
+
+    if reset is not None and reset > _EPOCH_THRESHOLD:
+        reset = max(0.0, reset - time.time())
+    return remaining, reset
+
+
+def retry_delay(attempt: int, response: Optional[requests.Response] = None) -> float:
+    """Exponential backoff with jitter, honoring Retry-After when given"""
+    if response is not None:
+        retry_after = retry_after_seconds(response)
+        if retry_after is not None:
+            return min(retry_after, RETRY_BACKOFF_MAX_SECONDS)
+
+    delay = min(RETRY_BACKOFF_SECONDS * (2 ** attempt), RETRY_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.5)
+
+
+class RateLimiter:
+    """
+    Request budget for one host
+
+    rate is requests per second (0 = no rate limit, only the concurrency
+    limit and server-requested pauses apply). After a 429 the rate is
+    halved as well, and recovers gradually as requests succeed.
+    """
+
+    def __init__(self, name: str, rate: float = 0.0, burst: int = 1, max_concurrency: int = 8):
+        self.name = name
+        self.configured_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = self.max_concurrency
+        self.active = 0
+        self.paused_until = 0.0
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self.paused_until - now
+                if wait <= 0 and self.active < self.concurrency:
+                    self._refill(now)
+                    if self.rate <= 0 or self._tokens >= 1:
+                        if self.rate > 0:
+                            self._tokens -= 1
+                        self.active += 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                # Wait for the pause or the next token, or for a slot to be released
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, response: Optional[requests.Response] = None):
+        """Return the slot taken by acquire() and learn from the response, if there was one"""
+        with self._cond:
+            self.active -= 1
+            if response is not None:
+                self._observe(response)
+            self._cond.notify_all()
+
+    def _observe(self, response: requests.Response):
+        now = time.monotonic()
+
+        if response.status_code == 429:
+            pause = retry_after_seconds(response)
+            if pause is None:
+                pause = RETRY_BACKOFF_SECONDS
+            self.paused_until = max(self.paused_until, now + min(pause, RETRY_BACKOFF_MAX_SECONDS))
+            self._successes = 0
+            if self.rate > 0:
+                self.rate = max(self.configured_rate / 8, self.rate / 2)
+            if self.concurrency > 1:
+                self.concurrency //= 2
+                print(f"Rate limited by {self.name}, slowing to {self.concurrency} concurrent requests")
+        elif response.status_code < 500:
+            self._successes += 1
+            if self._successes >= self.concurrency:
+                self._successes = 0
+                if self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                if self.rate < self.configured_rate:
+                    self.rate = min(self.configured_rate, self.rate * 1.25)
+
+        remaining, reset = rate_limit_status(response)
+        if remaining == 0 and reset:
+            self.paused_until = max(self.paused_until, now + min(reset, RETRY_BACKOFF_MAX_SECONDS))
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, rate: float = 0.0, burst: int = 1, max_concurrency: int = 8) -> RateLimiter:
+    """
+    Return the process-wide limiter for a host
+
+    The settings are used when the limiter is first created; later
+    callers share it as is.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = RateLimiter(name, rate, burst, max_concurrency)
+        return limiter
+
+
+def send_with_retries(
+    session: requests.Session,
+    method: str,
+    url: str,
+    limiter: Optional[RateLimiter] = None,
+    max_retries: int = 0,
+    label: Optional[str] = None,
+    retry_read_timeouts: bool = True,
+    **kwargs
+) -> requests.Response:
+    """
+    Send a request through a limiter, retrying connection errors, timeouts, 429 and 5xx
+
+    With retry_read_timeouts=False a read timeout is raised at once: the
+    server has the request and may still be working on it, so resending
+    an expensive request (a transcription) would only start it again.
+
+    Returns the final response without raising for its status, so callers
+    decide what a 4xx means. Raises the connection error once retries are
+    exhausted.
+    """
+    label = label or url
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        response = None
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= max_retries or (isinstance(e, requests.ReadTimeout) and not retry_read_timeouts):
+                raise
+            delay = retry_delay(attempt)
+            print(f"Request to {label} failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        finally:
+            if limiter is not None:
+                limiter.release(response)
+
+        if response.status_code in RETRYABLE_STATUS and attempt < max_retries:
+            delay = retry_delay(attempt, response)
+            print(f"Request to {label} returned {response.status_code}, retrying in {delay:.1f}s...")
+            # The limiter already holds other threads back until Retry-After
+            time.sleep(delay)
+            attempt += 1
+            continue
+
+        return response
@@ -3,17 +3,170 @@ Ninja OS Sync Client
 Base client for pushing data to Ninja OS sync API
 """
 
+import os
+import gzip
+import json
+import threading
 import requests
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from datetime import datetime
+from urllib.parse import urlparse
+
+from config import (
+    REQUEST_TIMEOUT_SECONDS, TRANSCRIBE_TIMEOUT_SECONDS,
+    PUSH_BATCH_MAX_ITEMS, PUSH_BATCH_MAX_BYTES, PUSH_MAX_IN_FLIGHT,
+    MAX_RETRIES, NINJA_OS_RATE_LIMIT_PER_SECOND,
+    COMPRESS_REQUESTS, COMPRESS_MIN_BYTES, UPLOAD_CHUNK_BYTES, OUTBOX_ENABLED,
+    RESOLVE_PEOPLE_BEFORE_PUSH, PERSON_LOOKUP_BATCH_SIZE,
+    HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_POOL_HOSTS
+)
+from outbox import SENT_STATUSES, get_outbox, is_retryable_error
+from contact_cache import IDENTIFIER_KINDS, MISSING, get_contact_cache, identifier_key
+from rate_limit import get_rate_limiter, send_with_retries
+
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session() -> requests.Session:
+    """
+    Process-wide HTTP session used by every client and agent
+    
+    Keeps one keep-alive connection pool per host (Ninja OS, Fathom), so
+    agents reuse TLS connections instead of each opening their own. Pools
+    block at HTTP_MAX_CONNECTIONS_PER_HOST: when sources sync concurrently,
+    requests beyond the limit wait for a free connection, which bounds
+    per-host concurrency across the whole process.
+    """
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_HOSTS,
+                pool_maxsize=HTTP_MAX_CONNECTIONS_PER_HOST,
+                pool_block=True
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _shared_session = session
+        return _shared_session
 
 
 class NinjaOSSyncClient:
     """Client for syncing data to Ninja OS"""
     
-    def __init__(self, base_url: str):
+    def __init__(
+        self,
+        base_url: str,
+        batch_max_items: int = PUSH_BATCH_MAX_ITEMS,
+        batch_max_bytes: int = PUSH_BATCH_MAX_BYTES,
+        max_in_flight: int = PUSH_MAX_IN_FLIGHT,
+        max_retries: int = MAX_RETRIES,
+        timeout: float = REQUEST_TIMEOUT_SECONDS,
+        compress: bool = COMPRESS_REQUESTS,
+        use_outbox: bool = OUTBOX_ENABLED,
+        resolve_people: bool = RESOLVE_PEOPLE_BEFORE_PUSH,
+        session: Optional[requests.Session] = None
+    ):
         self.base_url = base_url.rstrip('/')
-        self.session = requests.Session()
+        self.batch_max_items = batch_max_items
+        self.batch_max_bytes = batch_max_bytes
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.compress = compress
+        self.outbox = get_outbox() if use_outbox else None
+        self.resolve_people_before_push = resolve_people
+        self.contacts = get_contact_cache()
+        
+        self.session = session or get_shared_session()
+        self.limiter = get_rate_limiter(
+            urlparse(self.base_url).netloc,
+            rate=NINJA_OS_RATE_LIMIT_PER_SECOND,
+            burst=HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_concurrency=HTTP_MAX_CONNECTIONS_PER_HOST
+        )
+    
+    def _encode_json(self, payload: Any) -> Tuple[bytes, Dict[str, str], bool]:
+        """Serialize a JSON body, gzipping it when compression is enabled and worthwhile"""
+        body = json.dumps(payload, default=str).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        
+        if self.compress and len(body) >= COMPRESS_MIN_BYTES:
+            headers["Content-Encoding"] = "gzip"
+            return gzip.compress(body, compresslevel=6), headers, True
+        
+        return body, headers, False
+    
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying connection errors, timeouts, 429 and 5xx
+        
+        Requests go through the host's shared rate limiter, so a 429 or
+        Retry-After seen by one worker slows every worker.
+        
+        JSON bodies are gzipped. If the server answers 415 to a compressed
+        body, compression is switched off for this client and the request
+        is resent uncompressed.
+        
+        Raises the last error once retries are exhausted; other 4xx
+        responses raise immediately. Pass retry_read_timeouts=False for
+        requests that must not be resent while the server may still be
+        handling them (see send_with_retries).
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        url = f"{self.base_url}{path}"
+        
+        payload = kwargs.pop("json", None)
+        compressed = False
+        if payload is not None:
+            kwargs["data"], headers, compressed = self._encode_json(payload)
+            kwargs["headers"] = {**kwargs.get("headers", {}), **headers}
+        
+        while True:
+            response = send_with_retries(
+                self.session, method, url,
+                limiter=self.limiter, max_retries=self.max_retries, label=path, **kwargs
+            )
+            
+            if compressed and response.status_code == 415:
+                print("Server does not accept compressed requests, sending uncompressed")
+                self.compress = False
+                kwargs["data"], kwargs["headers"], compressed = self._encode_json(payload)
+                continue
+            
+            response.raise_for_status()
+            return response
+    
+    def _batch_items(self, items: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Split items into batches bounded by count and serialized size
+        
+        An item larger than batch_max_bytes on its own is sent alone
+        rather than dropped.
+        """
+        batch: List[Dict[str, Any]] = []
+        batch_bytes = 0
+        
+        for item in items:
+            item_bytes = len(json.dumps(item, default=str).encode("utf-8"))
+            
+            if batch and (
+                len(batch) >= self.batch_max_items
+                or batch_bytes + item_bytes > self.batch_max_bytes
+            ):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            
+            batch.append(item)
+            batch_bytes += item_bytes
+        
+        if batch:
+            yield batch
     
     def push_items(
         self, 
@@ -38,23 +191,244 @@ class NinjaOSSyncClient:
                 - duration: Duration in minutes
                 - participants: List of {name?, phone?, email?}
                 - personHint: {id?, name?, phone?, email?} to help match
+                - personResolved: participants already resolved, personHint.id is the match
             sync_type: 'full', 'incremental', or 'single'
             metadata: Optional metadata about the sync
         
+        Items are sent in batches of at most batch_max_items items and
+        batch_max_bytes of JSON, with up to max_in_flight batches in flight.
+        With resolve_people, participants are first resolved in one lookup
+        (see _with_person_ids). Batches that fail because the server is unavailable are queued in
+        the outbox (see outbox.py) before the error is reported.
+        
         Returns:
             Response with syncId, received, processed, failed, results
+            (merged across batches; syncIds lists every batch's sync log)
         """
-        response = self.session.post(
-            f"{self.base_url}/api/sync/push",
-            json={
-                "source": source,
-                "syncType": sync_type,
-                "items": items,
-                "metadata": metadata
-            }
-        )
-        response.raise_for_status()
-        return response.json()
+        if self.resolve_people_before_push:
+            items = self._with_person_ids(items)
+        
+        batches = list(self._batch_items(items))
+        
+        def push_batch(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+            try:
+                response = self._request("POST", "/api/sync/push", json={
+                    "source": source,
+                    "syncType": sync_type,
+                    "items": batch,
+                    "metadata": metadata
+                })
+            except Exception as e:
+                if self.outbox and is_retryable_error(e):
+                    self.outbox.enqueue_items(source, batch, sync_type, e)
+                raise
+            
+            result = response.json()
+            if self.outbox:
+                self.outbox.discard("push", source, [
+                    r.get("id") for r in result.get("results", []) if r.get("status") in SENT_STATUSES
+                ], items={item.get("externalId"): item for item in batch})
+            return result
+        
+        if len(batches) <= 1:
+            return push_batch(batches[0] if batches else [])
+        
+        print(f"Pushing {len(items)} items in {len(batches)} batches...")
+        
+        def run_batch(batch: List[Dict[str, Any]]):
+            try:
+                return push_batch(batch), None
+            except Exception as e:
+                return None, e
+        
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            outcomes = list(executor.map(run_batch, batches))
+        
+        errors = [error for _, error in outcomes if error is not None]
+        if len(errors) == len(batches):
+            raise errors[-1]
+        
+        return self._merge_push_results(batches, outcomes)
+    
+    @staticmethod
+    def _item_identifiers(item: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """(kind, value) pairs in the order the push handler tries them: participants, then personHint"""
+        identifiers = []
+        for participant in item.get("participants") or []:
+            if isinstance(participant, dict):
+                identifiers.extend((kind, participant[kind]) for kind in IDENTIFIER_KINDS if participant.get(kind))
+        hint = item.get("personHint") or {}
+        for kind in IDENTIFIER_KINDS:
+            if hint.get(kind):
+                identifiers.append((kind, hint[kind]))
+                break
+        return identifiers
+    
+    def resolve_people(self, identifiers: List[Tuple[str, str]]) -> Dict[str, Optional[str]]:
+        """
+        Resolve phones, emails and names to person IDs
+        
+        Args:
+            identifiers: (kind, value) pairs, kind one of 'phone', 'email', 'name'
+        
+        Returns:
+            {identifier_key: personId or None}. Identifiers not in the
+            contact cache are looked up together via /api/sync/resolve-people,
+            PERSON_LOOKUP_BATCH_SIZE at a time. A name resolves only if it
+            matches exactly one person, as in the push handler.
+        """
+        resolved: Dict[str, Optional[str]] = {}
+        lookups: Dict[str, Dict[str, str]] = {}
+        for kind, value in identifiers:
+            key = identifier_key(kind, value)
+            if not key or key in resolved or key in lookups:
+                continue
+            cached = self.contacts.get(key)
+            if cached is MISSING:
+                lookups[key] = {kind: value}
+            else:
+                resolved[key] = cached
+        
+        keys = list(lookups)
+        for start in range(0, len(keys), PERSON_LOOKUP_BATCH_SIZE):
+            chunk = keys[start:start + PERSON_LOOKUP_BATCH_SIZE]
+            response = self._request("POST", "/api/sync/resolve-people", json={
+                "identifiers": [lookups[key] for key in chunk]
+            })
+            for key, person_id in zip(chunk, response.json().get("personIds", [])):
+                self.contacts.put(key, person_id)
+                resolved[key] = person_id
+        
+        return resolved
+    
+    def _with_person_ids(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Resolve every item's participants in one lookup and attach the result
+        
+        Items get personHint.id (when a participant matched) and
+        personResolved, so the server skips its own per-participant
+        queries. If the lookup fails, items are returned as they were and
+        the server matches them itself.
+        """
+        pending = []
+        for index, item in enumerate(items):
+            if item.get("personResolved") or (item.get("personHint") or {}).get("id"):
+                continue
+            identifiers = self._item_identifiers(item)
+            if identifiers:
+                pending.append((index, identifiers))
+        if not pending:
+            return items
+        
+        try:
+            resolved = self.resolve_people([identifier for _, identifiers in pending for identifier in identifiers])
+        except requests.RequestException as e:
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code == 404:
+                # Older server without the endpoint; don't ask again
+                self.resolve_people_before_push = False
+            print(f"Person lookup failed ({e}), leaving participant matching to the server")
+            return items
+        
+        items = list(items)
+        for index, identifiers in pending:
+            person_id = next(filter(None, (resolved.get(identifier_key(*identifier)) for identifier in identifiers)), None)
+            hint = dict(items[index].get("personHint") or {})
+            if person_id:
+                hint["id"] = person_id
+            items[index] = {**items[index], "personHint": hint or None, "personResolved": True}
+        return items
+    
+    def _merge_push_results(self, batches: List[List[Dict[str, Any]]], outcomes: List) -> Dict[str, Any]:
+        """
+        Merge per-batch responses into one response of the usual shape
+        
+        Items in a batch that failed after all retries are reported as
+        failed so callers don't mark them synced.
+        """
+        merged: Dict[str, Any] = {
+            "syncId": None,
+            "syncIds": [],
+            "received": 0,
+            "processed": 0,
+            "failed": 0,
+            "results": [],
+        }
+        
+        for batch, (result, error) in zip(batches, outcomes):
+            if error is not None:
+                merged["received"] += len(batch)
+                merged["failed"] += len(batch)
+                merged["results"].extend(
+                    {"id": item.get("externalId", "unknown"), "status": "failed", "error": str(error)}
+                    for item in batch
+                )
+                continue
+            
+            if result.get("syncId"):
+                merged["syncIds"].append(result["syncId"])
+                merged["syncId"] = merged["syncId"] or result["syncId"]
+            merged["received"] += result.get("received", len(batch))
+            merged["processed"] += result.get("processed", 0)
+            merged["failed"] += result.get("failed", 0)
+            merged["results"].extend(result.get("results", []))
+        
+        return merged
+    
+    def upload_audio_file(
+        self,
+        file_path: str,
+        upload_id: str,
+        source: Optional[str] = None,
+        chunk_size: int = UPLOAD_CHUNK_BYTES
+    ) -> int:
+        """
+        Stream an audio file to Ninja OS as raw chunks
+        
+        Resumes from the offset the server already holds for upload_id, so
+        an interrupted upload continues where it stopped. Only one chunk is
+        in memory at a time, regardless of file size.
+        
+        Args:
+            file_path: Path to the audio file
+            upload_id: Stable ID for the upload (the item's externalId)
+            source: Source the upload belongs to (the server caps each
+                source's pending uploads)
+            chunk_size: Bytes sent per request
+        
+        Returns:
+            Total bytes held by the server
+        """
+        path = f"/api/sync/uploads/{upload_id}"
+        total = os.path.getsize(file_path)
+        offset = self._request("GET", path).json().get("offset", 0)
+        
+        if offset > total:
+            raise ValueError(f"Server holds {offset} bytes for {upload_id}, but file is {total} bytes")
+        if offset:
+            print(f"Resuming upload at {offset / 1024:.1f} KB of {total / 1024:.1f} KB")
+        
+        with open(file_path, 'rb') as f:
+            while offset < total:
+                f.seek(offset)
+                chunk = f.read(chunk_size)
+                try:
+                    response = self._request(
+                        "PUT", path,
+                        params={"offset": offset, "source": source},
+                        data=chunk,
+                        headers={"Content-Type": "application/octet-stream"}
+                    )
+                except requests.HTTPError as e:
+                    # Server has a different offset (e.g. a retried chunk that
+                    # partially landed); continue from where it actually is
+                    if e.response is not None and e.response.status_code == 409:
+                        offset = e.response.json().get("offset", 0)
+                        continue
+                    raise
+                offset = response.json().get("offset", offset + len(chunk))
+        
+        return offset
     
     def transcribe_audio(
         self,
@@ -63,7 +437,9 @@ class NinjaOSSyncClient:
         external_id: str = None,
         source: str = "plaud",
         timestamp: Optional[str] = None,
-        person_hint: Optional[Dict[str, str]] = None
+        person_hint: Optional[Dict[str, str]] = None,
+        upload_id: Optional[str] = None,
+        filename: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Send audio for transcription and create interaction
@@ -71,27 +447,57 @@ class NinjaOSSyncClient:
         Args:
             audio_base64: Base64-encoded audio data
             audio_url: URL to audio file
+            upload_id: ID of a completed upload_audio_file() upload
+            filename: Original file name (the server uses its extension)
             external_id: Unique ID for deduplication
             source: Source identifier (default: 'plaud')
             timestamp: ISO datetime of recording
             person_hint: {id?, name?, phone?} to help match
         
+        If the server is unavailable the call is queued in the outbox
+        before the error is raised (base64 audio is stored as-is, so a
+        replay doesn't re-read the file).
+        
         Returns:
             Response with status, interactionId, personId, transcriptLength
         """
-        response = self.session.post(
-            f"{self.base_url}/api/sync/transcribe",
-            json={
-                "audioBase64": audio_base64,
-                "audioUrl": audio_url,
-                "externalId": external_id,
-                "source": source,
-                "timestamp": timestamp,
-                "personHint": person_hint
-            }
-        )
-        response.raise_for_status()
-        return response.json()
+        try:
+            response = self._request(
+                "POST",
+                "/api/sync/transcribe",
+                timeout=TRANSCRIBE_TIMEOUT_SECONDS,
+                # A timed-out transcription is still running on the server;
+                # it is replayed from the outbox later instead
+                retry_read_timeouts=False,
+                json={
+                    "audioBase64": audio_base64,
+                    "audioUrl": audio_url,
+                    "uploadId": upload_id,
+                    "filename": filename,
+                    "externalId": external_id,
+                    "source": source,
+                    "timestamp": timestamp,
+                    "personHint": person_hint
+                }
+            )
+        except Exception as e:
+            if self.outbox and external_id and is_retryable_error(e):
+                self.outbox.enqueue_transcription({
+                    "audio_base64": audio_base64,
+                    "audio_url": audio_url,
+                    "upload_id": upload_id,
+                    "filename": filename,
+                    "external_id": external_id,
+                    "source": source,
+                    "timestamp": timestamp,
+                    "person_hint": person_hint,
+                }, e)
+            raise
+        
+        result = response.json()
+        if self.outbox and result.get("status") in SENT_STATUSES:
+            self.outbox.discard("transcribe", source, [external_id])
+        return result
     
     def search_person(
         self,
@@ -108,7 +514,7 @@ class NinjaOSSyncClient:
             name: Name to search
         
         Returns:
-            List of matching people
+            List of matching people (cached in the contact cache)
         """
         params = {}
         if phone:
@@ -118,12 +524,17 @@ class NinjaOSSyncClient:
         elif name:
             params['name'] = name
         
-        response = self.session.get(
-            f"{self.base_url}/api/sync/search-person",
-            params=params
-        )
-        response.raise_for_status()
-        return response.json().get('matches', [])
+        key = identifier_key(*next(iter(params.items()))) if params else None
+        if key:
+            cached = self.contacts.get(f"search:{key}")
+            if cached is not MISSING:
+                return cached
+        
+        response = self._request("GET", "/api/sync/search-person", params=params)
+        matches = response.json().get('matches', [])
+        if key:
+            self.contacts.put(f"search:{key}", matches)
+        return matches
     
     def get_sync_logs(self, source: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get sync logs, optionally filtered by source"""
@@ -131,11 +542,7 @@ class NinjaOSSyncClient:
         if source:
             params['source'] = source
         
-        response = self.session.get(
-            f"{self.base_url}/api/sync/logs",
-            params=params
-        )
-        response.raise_for_status()
+        response = self._request("GET", "/api/sync/logs", params=params)
         return response.json()
 
 
@@ -4,17 +4,31 @@ Fathom.video Sync Agent
 Fetches meeting recordings and transcripts from Fathom API and pushes to Ninja OS
 """
 
-import os
 import json
 import hashlib
 import requests
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
-from sync_client import NinjaOSSyncClient
-from config import NINJA_OS_URL, LOOKBACK_HOURS, MAX_ITEMS_PER_SYNC
+from sync_client import NinjaOSSyncClient, get_shared_session
+from sync_state import SyncedIdSet, get_state_store
+from rate_limit import get_rate_limiter, send_with_retries
+from config import (
+    NINJA_OS_URL, LOOKBACK_HOURS, MAX_ITEMS_PER_SYNC, MAX_RETRIES,
+    FATHOM_TWO_PHASE, FATHOM_TRANSCRIPT_CONCURRENCY, FATHOM_RATE_LIMIT_PER_SECOND, FATHOM_RATE_LIMIT_BURST
+)
 
 FATHOM_API_URL = "https://api.fathom.ai/external/v1"
+CHECKPOINT_NAMESPACE = "fathom_checkpoint"
+
+
+def _parse_time(value: str) -> datetime:
+    """Parse a Fathom ISO timestamp into a naive UTC datetime"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
 
 
 class FathomSyncAgent:
@@ -22,24 +36,26 @@ class FathomSyncAgent:
     
     def __init__(self, ninja_url: str, api_key: str):
         self.client = NinjaOSSyncClient(ninja_url)
+        self.session = get_shared_session()
         self.api_key = api_key
-        self.synced_ids_file = os.path.expanduser("~/.ninja_os_fathom_synced.json")
-        self.synced_ids = self._load_synced_ids()
+        self.synced_ids = SyncedIdSet("fathom", legacy_file="~/.ninja_os_fathom_synced.json")
+        self.state = get_state_store()
+        self.two_phase = FATHOM_TWO_PHASE
+        # Page prefetch plus transcript workers share Fathom's per-key limit
+        self.limiter = get_rate_limiter(
+            "api.fathom.ai",
+            rate=FATHOM_RATE_LIMIT_PER_SECOND,
+            burst=FATHOM_RATE_LIMIT_BURST,
+            max_concurrency=FATHOM_TRANSCRIPT_CONCURRENCY + 1
+        )
     
-    def _load_synced_ids(self) -> set:
-        """Load previously synced IDs to avoid duplicates"""
-        if os.path.exists(self.synced_ids_file):
-            try:
-                with open(self.synced_ids_file, 'r') as f:
-                    return set(json.load(f))
-            except:
-                pass
-        return set()
-    
-    def _save_synced_ids(self):
-        """Save synced IDs"""
-        with open(self.synced_ids_file, 'w') as f:
-            json.dump(list(self.synced_ids), f)
+    def _get(self, path: str, **kwargs) -> requests.Response:
+        """GET from the Fathom API, waiting out 429s and retrying 5xx"""
+        return send_with_retries(
+            self.session, "GET", f"{FATHOM_API_URL}{path}",
+            limiter=self.limiter, max_retries=MAX_RETRIES, label=f"Fathom {path}",
+            headers={"X-Api-Key": self.api_key}, timeout=30, **kwargs
+        )
     
     def _generate_external_id(self, meeting: Dict[str, Any]) -> str:
         """Generate a unique ID for a meeting"""
@@ -48,69 +64,117 @@ class FathomSyncAgent:
         unique_str = f"fathom_{meeting_id}{meeting.get('title', '')}{meeting.get('created_at', '')}"
         return hashlib.md5(unique_str.encode()).hexdigest()
     
-    def _fetch_meetings(self, created_after: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Fetch meetings from Fathom API"""
-        headers = {
-            "X-Api-Key": self.api_key,
-            "Content-Type": "application/json"
-        }
+    def _fetch_page(self, params: Dict[str, str], cursor: Optional[str]) -> Dict[str, Any]:
+        """Fetch one page of meetings"""
+        page_params = dict(params)
+        if cursor:
+            page_params["cursor"] = cursor
+        
+        response = self._get("/meetings", params=page_params)
+        response.raise_for_status()
+        return response.json()
+    
+    def _fetch_meetings(
+        self,
+        created_after: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Yield (meetings, next_cursor) for each page from Fathom API
         
+        The next page is requested in the background while the caller
+        processes the current one, so at most two pages are held at once.
+        In two-phase mode pages list metadata only, without transcripts.
+        """
         params = {
-            "include_transcript": "true"
+            "include_transcript": "false" if self.two_phase else "true"
         }
         
         if created_after:
             params["created_after"] = created_after
         
-        all_meetings = []
-        cursor = None
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="fathom-fetch") as prefetch:
+            future = prefetch.submit(self._fetch_page, params, cursor)
+            while future is not None:
+                data = future.result()
+                next_cursor = data.get("cursor")
+                future = prefetch.submit(self._fetch_page, params, next_cursor) if next_cursor else None
+                try:
+                    yield data.get("items", []), next_cursor
+                except GeneratorExit:
+                    if future is not None:
+                        future.cancel()
+                    raise
+    
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        return self.state.get_state(CHECKPOINT_NAMESPACE, "meetings")
+    
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]):
+        self.state.set_state(CHECKPOINT_NAMESPACE, "meetings", checkpoint)
+    
+    def _needs_sync(self, meeting: Dict[str, Any]) -> bool:
+        """Not yet synced and within the lookback window (needs only list metadata)"""
+        if self._generate_external_id(meeting) in self.synced_ids:
+            return False
         
-        while True:
-            if cursor:
-                params["cursor"] = cursor
-            
+        timestamp = meeting.get('created_at') or meeting.get('recording_start_time')
+        if timestamp:
             try:
-                response = requests.get(
-                    f"{FATHOM_API_URL}/meetings",
-                    headers=headers,
-                    params=params,
-                    timeout=30
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                meetings = data.get("items", [])
-                all_meetings.extend(meetings)
-                
-                cursor = data.get("cursor")
-                if not cursor or len(all_meetings) >= MAX_ITEMS_PER_SYNC:
-                    break
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching Fathom meetings: {e}")
-                break
+                meeting_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00').replace('+00:00', ''))
+                if datetime.now() - meeting_time > timedelta(hours=LOOKBACK_HOURS * 24 * 7):
+                    return False
+            except:
+                pass
         
-        return all_meetings
+        return True
+    
+    def _fetch_transcript(self, meeting: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Fetch one recording's transcript, or None if it can't be fetched right now"""
+        recording_id = meeting.get('recording_id')
+        if not recording_id:
+            print(f"Fathom meeting has no recording_id, set FATHOM_TWO_PHASE = False to sync it: "
+                  f"{meeting.get('title')}")
+            return None
+        
+        try:
+            response = self._get(f"/recordings/{recording_id}/transcript")
+            if response.status_code == 404:
+                return []
+            response.raise_for_status()
+            return response.json().get("transcript", [])
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching transcript for {meeting.get('title')}: {e}")
+            return None
+    
+    def _with_transcripts(self, meetings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Second phase: fetch transcripts for meetings that need syncing
+        
+        Meetings whose transcript couldn't be fetched are left out, so they
+        are retried next sync rather than pushed without one.
+        """
+        if not meetings:
+            return []
+        
+        workers = min(FATHOM_TRANSCRIPT_CONCURRENCY, len(meetings))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fathom-transcript") as executor:
+            transcripts = list(executor.map(self._fetch_transcript, meetings))
+        
+        ready = []
+        for meeting, transcript in zip(meetings, transcripts):
+            if transcript is not None:
+                meeting["transcript"] = transcript
+                ready.append(meeting)
+        return ready
     
     def _parse_meeting(self, meeting: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Parse a Fathom meeting into sync format"""
+        """Parse a Fathom meeting into sync format (callers check _needs_sync first)"""
         try:
             external_id = self._generate_external_id(meeting)
-            
-            if external_id in self.synced_ids:
-                return None
-            
             timestamp = meeting.get('created_at') or meeting.get('recording_start_time')
             if not timestamp:
                 timestamp = datetime.now().isoformat()
             
-            try:
-                meeting_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00').replace('+00:00', ''))
-                if datetime.now() - meeting_time > timedelta(hours=LOOKBACK_HOURS * 24 * 7):
-                    return None
-            except:
-                pass
-            
             transcript_data = meeting.get('transcript', [])
             transcript_lines = []
             for entry in transcript_data:
@@ -178,53 +242,157 @@ class FathomSyncAgent:
             return None
     
     def sync(self, force: bool = False) -> Dict[str, Any]:
-        """Sync Fathom meetings to Ninja OS"""
+        """
+        Sync Fathom meetings to Ninja OS
+        
+        With FATHOM_TWO_PHASE, pages list meetings without transcripts and
+        transcripts are fetched only for meetings not yet synced, so steady-
+        state runs don't download transcripts just to discard them.
+        
+        Each page is parsed and pushed as it arrives, then the pagination
+        cursor is checkpointed, so an interrupted sync (or one that hits
+        MAX_ITEMS_PER_SYNC) resumes at the next page. Once pagination
+        completes, the newest created_at seen bounds the next run's window,
+        unless a meeting wasn't stored (its transcript couldn't be fetched,
+        or its push failed): then the window starts from the earliest such
+        meeting, so it is retried.
+        """
         print("Connecting to Fathom API...")
         
         if force:
-            self.synced_ids = set()
+            self.synced_ids.clear()
+            self.state.delete_state(CHECKPOINT_NAMESPACE)
         
-        created_after = None
-        if not force:
+        checkpoint = self._load_checkpoint() or {}
+        cursor = checkpoint.get("cursor")
+        
+        if cursor:
+            created_after = checkpoint.get("createdAfter")
+            print(f"Resuming Fathom pagination (meetings after {created_after})")
+        elif force:
+            created_after = None
+        else:
             lookback = datetime.now() - timedelta(hours=LOOKBACK_HOURS * 24 * 7)
             created_after = lookback.isoformat() + "Z"
+            last_created_at = min(filter(None, [checkpoint.get("lastCreatedAt"), checkpoint.get("heldBack")]), default="")
+            try:
+                # Overlap a day so meetings processed late by Fathom are still listed
+                since_last = _parse_time(last_created_at) - timedelta(hours=24)
+                if since_last > lookback:
+                    created_after = since_last.isoformat() + "Z"
+            except (TypeError, ValueError):
+                pass
         
-        meetings = self._fetch_meetings(created_after)
-        print(f"Found {len(meetings)} meetings from Fathom")
+        last_created_at = checkpoint.get("lastCreatedAt")
+        totals = {"received": 0, "processed": 0, "failed": 0, "results": []}
+        meeting_count = 0
+        completed = False
+        held_back = checkpoint.get("heldBack", "") if cursor else ""
+        fetch_error = None
         
-        items = []
-        for meeting in meetings:
-            parsed = self._parse_meeting(meeting)
-            if parsed:
-                items.append(parsed)
-            if len(items) >= MAX_ITEMS_PER_SYNC:
-                break
+        def hold_back(created_at: Optional[str]):
+            nonlocal held_back
+            if created_at and (not held_back or created_at < held_back):
+                held_back = created_at
         
-        if not items:
+        try:
+            for meetings, next_cursor in self._fetch_meetings(created_after, cursor):
+                meeting_count += len(meetings)
+                
+                for meeting in meetings:
+                    created_at = meeting.get('created_at')
+                    if created_at and (not last_created_at or created_at > last_created_at):
+                        last_created_at = created_at
+                
+                meetings = [m for m in meetings if self._needs_sync(m)]
+                if self.two_phase:
+                    needed = meetings
+                    meetings = self._with_transcripts(needed)
+                    
+                    # Keep the next run's window open for meetings held back
+                    fetched = {id(m) for m in meetings}
+                    for meeting in needed:
+                        if id(meeting) not in fetched:
+                            hold_back(meeting.get('created_at'))
+                
+                items = []
+                created = {}
+                for meeting in meetings:
+                    parsed = self._parse_meeting(meeting)
+                    if parsed:
+                        items.append(parsed)
+                        created[parsed['externalId']] = meeting.get('created_at')
+                
+                if items:
+                    print(f"Syncing {len(items)} new meetings...")
+                    try:
+                        result = self.client.push_items(
+                            source="fathom",
+                            items=items,
+                            sync_type="incremental" if not force else "full",
+                            metadata={"api_version": "v1"}
+                        )
+                    except Exception as e:
+                        print(f"Sync failed: {e}")
+                        # This page is resumed next time; heldBack covers it if the cursor is dropped
+                        for created_at in created.values():
+                            hold_back(created_at)
+                        self._save_checkpoint({**(self._load_checkpoint() or {}), "heldBack": held_back})
+                        return {"error": str(e), **totals}
+                    
+                    stored = {
+                        item_result.get('id') for item_result in result.get('results', [])
+                        if item_result.get('status') in ['created', 'skipped']
+                    }
+                    self.synced_ids.update(stored)
+                    for external_id, created_at in created.items():
+                        if external_id not in stored:
+                            hold_back(created_at)
+                    
+                    totals["syncId"] = result.get("syncId")
+                    totals["received"] += result.get("received", len(items))
+                    totals["processed"] += result.get("processed", 0)
+                    totals["failed"] += result.get("failed", 0)
+                    totals["results"].extend(result.get("results", []))
+                
+                if not next_cursor:
+                    completed = True
+                    break
+                
+                self._save_checkpoint({
+                    "cursor": next_cursor,
+                    "createdAfter": created_after,
+                    "lastCreatedAt": last_created_at,
+                    "heldBack": held_back,
+                })
+                
+                if totals["received"] >= MAX_ITEMS_PER_SYNC:
+                    print("Reached MAX_ITEMS_PER_SYNC, the next sync continues from here")
+                    break
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching Fathom meetings: {e}")
+            fetch_error = f"Fathom API error: {e}"
+            response = getattr(e, 'response', None)
+            if cursor and not meeting_count and response is not None and 400 <= response.status_code < 500:
+                # The saved cursor is no longer accepted; start over next time
+                print("Discarding Fathom resume cursor")
+                self._save_checkpoint({"lastCreatedAt": min(filter(None, [last_created_at, held_back]), default="")})
+        
+        if completed:
+            self._save_checkpoint({"lastCreatedAt": min(filter(None, [last_created_at, held_back]), default="")})
+        
+        print(f"Found {meeting_count} meetings from Fathom")
+        
+        if fetch_error:
+            # Pages pushed so far are checkpointed; report the rest as failed, not done
+            return {"error": fetch_error, **totals}
+        
+        if not totals["received"]:
             print("No new meetings to sync")
             return {"synced": 0, "message": "No new meetings"}
         
-        print(f"Syncing {len(items)} new meetings...")
-        
-        try:
-            result = self.client.push_items(
-                source="fathom",
-                items=items,
-                sync_type="incremental" if not force else "full",
-                metadata={"api_version": "v1"}
-            )
-            
-            for item_result in result.get('results', []):
-                if item_result.get('status') in ['created', 'skipped']:
-                    self.synced_ids.add(item_result.get('id'))
-            
-            self._save_synced_ids()
-            
-            print(f"Sync complete: {result.get('processed', 0)} processed, {result.get('failed', 0)} failed")
-            return result
-        except Exception as e:
-            print(f"Sync failed: {e}")
-            return {"error": str(e)}
+        print(f"Sync complete: {totals['processed']} processed, {totals['failed']} failed")
+        return totals
 
 
 def main():
@@ -9,10 +9,20 @@ import json
 import hashlib
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterator
 
+from json_stream import JSONTextStream, file_chunks
 from sync_client import NinjaOSSyncClient
-from config import NINJA_OS_URL, GRANOLA_CACHE_PATH, LOOKBACK_HOURS, MAX_ITEMS_PER_SYNC
+from sync_state import SyncedIdSet, FileChangeIndex
+from config import (
+    NINJA_OS_URL, GRANOLA_CACHE_PATH, LOOKBACK_HOURS, MAX_ITEMS_PER_SYNC,
+    GRANOLA_STOP_AFTER_OLD_MEETINGS
+)
+
+# Keys that hold the meeting list/map in the various cache layouts
+MEETING_CONTAINER_KEYS = ('meetings', 'notes', 'documents', 'items')
+# Fields that mark a bare top-level object as a meeting
+MEETING_FIELDS = ('title', 'startTime', 'start_time', 'transcript', 'created_at')
 
 
 class GranolaSyncAgent:
@@ -21,62 +31,113 @@ class GranolaSyncAgent:
     def __init__(self, ninja_url: str, cache_path: str):
         self.client = NinjaOSSyncClient(ninja_url)
         self.cache_path = os.path.expanduser(cache_path)
-        self.synced_ids_file = os.path.expanduser("~/.ninja_os_granola_synced.json")
-        self.synced_ids = self._load_synced_ids()
-    
-    def _load_synced_ids(self) -> set:
-        """Load previously synced IDs to avoid duplicates"""
-        if os.path.exists(self.synced_ids_file):
-            try:
-                with open(self.synced_ids_file, 'r') as f:
-                    return set(json.load(f))
-            except:
-                pass
-        return set()
-    
-    def _save_synced_ids(self):
-        """Save synced IDs"""
-        with open(self.synced_ids_file, 'w') as f:
-            json.dump(list(self.synced_ids), f)
+        self.synced_ids = SyncedIdSet("granola", legacy_file="~/.ninja_os_granola_synced.json")
+        self.files = FileChangeIndex("granola")
+        # Why the last _read_cache() stopped before the end of the file, if it did
+        self.read_error: Optional[str] = None
     
     def _generate_external_id(self, meeting: Dict[str, Any]) -> str:
         """Generate a unique ID for a meeting"""
         unique_str = f"granola_{meeting.get('id', '')}{meeting.get('title', '')}{meeting.get('startTime', '')}"
         return hashlib.md5(unique_str.encode()).hexdigest()
     
-    def _read_cache(self) -> List[Dict[str, Any]]:
-        """Read Granola's cache file"""
+    def _read_cache(self) -> Iterator[Dict[str, Any]]:
+        """
+        Stream meetings from Granola's cache file one at a time
+        
+        The cache can be hundreds of MB, so it is walked incrementally and
+        only one meeting is held in memory at a time. Stop iterating to stop
+        reading the file. If it can't be read to the end (truncated,
+        unparseable, an I/O error), the meetings before the error are
+        still yielded and read_error says what went wrong.
+        """
+        self.read_error = None
         if not os.path.exists(self.cache_path):
             print(f"Granola cache not found at: {self.cache_path}")
-            return []
+            return
         
         try:
-            with open(self.cache_path, 'r') as f:
-                data = json.load(f)
-            
-            # Granola uses a complex double-JSON structure
-            # Handle various cache formats
-            meetings = []
-            
-            if isinstance(data, list):
-                meetings = data
-            elif isinstance(data, dict):
-                # Try common keys
-                for key in ['meetings', 'notes', 'documents', 'items']:
-                    if key in data:
-                        meetings = data[key]
-                        break
-                # If still empty, check if values are meetings
-                if not meetings:
-                    meetings = list(data.values())
-            
-            return meetings if isinstance(meetings, list) else []
-        except json.JSONDecodeError as e:
-            print(f"Error parsing Granola cache: {e}")
-            return []
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                yield from self._iter_meetings(JSONTextStream(file_chunks(f)), top_level=True)
+        except ValueError as e:
+            self.read_error = f"Error parsing Granola cache: {e}"
+            print(self.read_error)
         except Exception as e:
-            print(f"Error reading Granola cache: {e}")
-            return []
+            self.read_error = f"Error reading Granola cache: {e}"
+            print(self.read_error)
+    
+    def _iter_meetings(self, stream: JSONTextStream, top_level: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Find meetings in a cache document
+        
+        Granola uses a double-JSON structure: {"cache": "<JSON string>"}
+        whose decoded string holds {"state": {"documents": {...}}}. Older
+        layouts are a plain list, a dict with one of MEETING_CONTAINER_KEYS,
+        or a dict whose values are the meetings themselves.
+        """
+        char = stream.peek()
+        
+        if char == '[':
+            yield from self._iter_container(stream)
+            return
+        
+        if char != '{':
+            stream.skip_value()
+            return
+        
+        stream.expect('{')
+        first = True
+        while stream.next_member(first):
+            first = False
+            key = stream.read_key()
+            value_char = stream.peek()
+            
+            if key == 'cache' and value_char == '"':
+                # Decode the embedded JSON string as it is read
+                chunks = stream.iter_string()
+                yield from self._iter_meetings(JSONTextStream(chunks))
+                for _ in chunks:
+                    pass
+            elif key == 'state' and value_char == '{':
+                yield from self._iter_meetings(stream)
+            elif key in MEETING_CONTAINER_KEYS and value_char in ('[', '{'):
+                yield from self._iter_container(stream)
+            elif top_level and value_char == '{':
+                value = stream.read_value()
+                if any(field in value for field in MEETING_FIELDS):
+                    yield value
+            else:
+                stream.skip_value()
+    
+    def _iter_container(self, stream: JSONTextStream) -> Iterator[Dict[str, Any]]:
+        """Yield the object elements of a list, or the object values of a dict keyed by ID"""
+        is_dict = stream.peek() == '{'
+        stream.expect('{' if is_dict else '[')
+        first = True
+        while stream.next_member(first):
+            first = False
+            if is_dict:
+                stream.read_key()
+            if stream.peek() == '{':
+                yield stream.read_value()
+            else:
+                stream.skip_value()
+    
+    def _meeting_timestamp(self, meeting: Dict[str, Any]) -> str:
+        """ISO timestamp of a meeting's start (now if unknown)"""
+        start_time = meeting.get('startTime') or meeting.get('start_time') or meeting.get('date')
+        if start_time:
+            if isinstance(start_time, str):
+                return start_time
+            return datetime.fromtimestamp(start_time / 1000 if start_time > 1e10 else start_time).isoformat()
+        return datetime.now().isoformat()
+    
+    def _is_before_lookback(self, timestamp: str) -> bool:
+        try:
+            meeting_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00').replace('+00:00', ''))
+            return datetime.now() - meeting_time > timedelta(hours=LOOKBACK_HOURS * 24 * 7)  # 1 week default
+        except:
+            return False
     
     def _parse_meeting(self, meeting: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Parse a Granola meeting into sync format"""
@@ -89,21 +150,11 @@ class GranolaSyncAgent:
             
             # Extract meeting time
             start_time = meeting.get('startTime') or meeting.get('start_time') or meeting.get('date')
-            if start_time:
-                if isinstance(start_time, str):
-                    timestamp = start_time
-                else:
-                    timestamp = datetime.fromtimestamp(start_time / 1000 if start_time > 1e10 else start_time).isoformat()
-            else:
-                timestamp = datetime.now().isoformat()
+            timestamp = self._meeting_timestamp(meeting)
             
             # Check if within lookback window
-            try:
-                meeting_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00').replace('+00:00', ''))
-                if datetime.now() - meeting_time > timedelta(hours=LOOKBACK_HOURS * 24 * 7):  # 1 week default
-                    return None
-            except:
-                pass
+            if self._is_before_lookback(timestamp):
+                return None
             
             # Extract transcript
             transcript = meeting.get('transcript', '')
@@ -160,23 +211,51 @@ class GranolaSyncAgent:
     
     def sync(self, force: bool = False) -> Dict[str, Any]:
         """Sync Granola meetings to Ninja OS"""
+        if force:
+            self.synced_ids.clear()
+        elif self.files.is_unchanged(self.cache_path):
+            print("Granola cache unchanged since last sync")
+            return {"synced": 0, "message": "Cache unchanged"}
+        
         print(f"Reading Granola cache from: {self.cache_path}")
-        meetings = self._read_cache()
-        print(f"Found {len(meetings)} meetings in cache")
         
-        if force:
-            self.synced_ids = set()
+        # Stat before reading so a write during the sync is seen next time
+        try:
+            cache_stat = os.stat(self.cache_path)
+        except OSError:
+            cache_stat = None
         
-        # Parse meetings
+        # Parse meetings as they stream out of the cache
         items = []
-        for meeting in meetings:
+        capped = False
+        scanned = 0
+        old_streak = 0
+        for meeting in self._read_cache():
+            scanned += 1
             parsed = self._parse_meeting(meeting)
             if parsed:
                 items.append(parsed)
             if len(items) >= MAX_ITEMS_PER_SYNC:
+                capped = True
                 break
+            
+            # Optionally stop once meetings are consistently past the window
+            if GRANOLA_STOP_AFTER_OLD_MEETINGS:
+                old_streak = old_streak + 1 if self._is_before_lookback(self._meeting_timestamp(meeting)) else 0
+                if old_streak >= GRANOLA_STOP_AFTER_OLD_MEETINGS:
+                    print(f"Stopping after {old_streak} meetings older than the lookback window")
+                    break
+        
+        print(f"Scanned {scanned} meetings in cache")
+        
+        # A cache that wasn't read to the end is read again next time
+        complete = cache_stat is not None and self.read_error is None
         
         if not items:
+            if self.read_error:
+                return {"error": self.read_error}
+            if complete:
+                self.files.record(self.cache_path, cache_stat)
             print("No new meetings to sync")
             return {"synced": 0, "message": "No new meetings"}
         
@@ -191,11 +270,14 @@ class GranolaSyncAgent:
             )
             
             # Mark synced items
-            for item_result in result.get('results', []):
-                if item_result.get('status') in ['created', 'skipped']:
-                    self.synced_ids.add(item_result.get('id'))
+            self.synced_ids.update(
+                item_result.get('id') for item_result in result.get('results', [])
+                if item_result.get('status') in ['created', 'skipped']
+            )
             
-            self._save_synced_ids()
+            # Only skip this cache next time if nothing was left unread or unsent
+            if complete and not capped and not result.get('failed'):
+                self.files.record(self.cache_path, cache_stat)
             
             print(f"Sync complete: {result.get('processed', 0)} processed, {result.get('failed', 0)} failed")
             return result
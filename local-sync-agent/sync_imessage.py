@@ -13,11 +13,21 @@ import os
 import sqlite3
 import json
 import hashlib
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Set, Tuple, Iterator
 
 from sync_client import NinjaOSSyncClient
-from config import NINJA_OS_URL, IMESSAGE_DB_PATH, LOOKBACK_HOURS, MAX_ITEMS_PER_SYNC
+from sync_state import SyncedIdSet, get_state_store
+from conversation_threads import ConversationThreads
+from outbox import SENT_STATUSES
+from imessage_search import MessageSearchIndex, has_fts5
+from attributed_body import message_text
+from normalization import get_identifier_index
+from chat_db import ChatDbSnapshot, highest_message_rowid
+from config import NINJA_OS_URL, IMESSAGE_DB_PATH, LOOKBACK_HOURS, IMESSAGE_PAGE_SIZE, CONVERSATION_APPEND_MODE
+
+CURSOR_NAMESPACE = "imessage_cursor"
 
 
 class IMessageSyncAgent:
@@ -26,40 +36,48 @@ class IMessageSyncAgent:
     def __init__(self, ninja_url: str, db_path: str = IMESSAGE_DB_PATH):
         self.client = NinjaOSSyncClient(ninja_url)
         self.db_path = os.path.expanduser(db_path)
-        self.synced_ids_file = os.path.expanduser("~/.ninja_os_imessage_synced.json")
-        self.synced_ids = self._load_synced_ids()
-    
-    def _load_synced_ids(self) -> set:
-        if os.path.exists(self.synced_ids_file):
-            try:
-                with open(self.synced_ids_file, 'r') as f:
-                    return set(json.load(f))
-            except:
-                pass
-        return set()
-    
-    def _save_synced_ids(self):
-        with open(self.synced_ids_file, 'w') as f:
-            json.dump(list(self.synced_ids), f)
+        self.synced_ids = SyncedIdSet("imessage", legacy_file="~/.ninja_os_imessage_synced.json")
+        self.state = get_state_store()
+        self.threads = ConversationThreads("imessage", self.state)
+        self.append_mode = CONVERSATION_APPEND_MODE
+        self._snapshot: Optional[ChatDbSnapshot] = None
     
-    def _check_database_access(self) -> bool:
-        """Check if we can access the iMessage database"""
+    def _open_snapshot(self) -> Optional[ChatDbSnapshot]:
+        """Open a snapshot of the iMessage database, or explain why it can't be read"""
         if not os.path.exists(self.db_path):
             print(f"iMessage database not found at: {self.db_path}")
-            return False
+            return None
         
         try:
-            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
-            conn.execute("SELECT 1 FROM message LIMIT 1")
-            conn.close()
-            return True
+            return ChatDbSnapshot(self.db_path).open()
         except sqlite3.OperationalError as e:
             print(f"Cannot access iMessage database: {e}")
             print("\nTo fix this:")
             print("1. Open System Settings > Privacy & Security > Full Disk Access")
             print("2. Add Terminal.app (or your IDE)")
             print("3. Restart Terminal/IDE")
-            return False
+            return None
+    
+    @contextmanager
+    def reading(self) -> Iterator[Optional[sqlite3.Connection]]:
+        """
+        One consistent, read-only view of chat.db (see chat_db.py)
+        
+        sync() and search_messages() each read through this; wrap several
+        calls in it to share one snapshot and connection between them.
+        Yields None if the database can't be read.
+        """
+        if self._snapshot is not None:
+            yield self._snapshot.conn
+            return
+        
+        self._snapshot = self._open_snapshot()
+        try:
+            yield self._snapshot.conn if self._snapshot else None
+        finally:
+            if self._snapshot:
+                self._snapshot.close()
+            self._snapshot = None
     
     def _apple_time_to_datetime(self, apple_time: int) -> datetime:
         """Convert Apple's timestamp to datetime"""
@@ -69,62 +87,130 @@ class IMessageSyncAgent:
         return apple_epoch + timedelta(seconds=seconds)
     
     def _get_handle_info(self, conn: sqlite3.Connection) -> Dict[int, Dict[str, str]]:
-        """Get phone/email info for all handles"""
+        """
+        Get phone/email info for all handles
+        
+        Handles are normalized once per load (E.164 phones, lowercased
+        emails) through the shared identifier index, so the same contact
+        stored as "(555) 123-4567" and "+15551234567" is one participant.
+        """
         cursor = conn.execute("""
             SELECT ROWID, id, service
             FROM handle
         """)
         
+        index = get_identifier_index()
         handles = {}
-        for row in cursor:
-            handles[row[0]] = {
-                "identifier": row[1],
-                "service": row[2],
-                "phone": row[1] if row[1].startswith('+') or row[1].replace('-', '').isdigit() else None,
-                "email": row[1] if '@' in row[1] else None,
+        for rowid, raw_id, service in cursor:
+            identifier = index.classify(raw_id or "")
+            handles[rowid] = {
+                "identifier": raw_id,
+                "service": service,
+                "phone": identifier.phone,
+                "email": identifier.email,
+                "key": identifier.key,
             }
         
         return handles
     
-    def _get_conversations(
-        self, 
-        conn: sqlite3.Connection, 
-        handles: Dict[int, Dict[str, str]],
-        since: datetime
-    ) -> List[Dict[str, Any]]:
-        """Get conversations with messages since the given date"""
-        
-        # Convert datetime to Apple timestamp
+    def _datetime_to_apple_time(self, dt: datetime) -> int:
+        """Convert datetime to Apple's timestamp"""
         apple_epoch = datetime(2001, 1, 1)
-        since_apple = int((since - apple_epoch).total_seconds() * 1e9)
+        return int((dt - apple_epoch).total_seconds() * 1e9)
+    
+    def _load_cursor(self, conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+        """
+        Load the ROWID high-water mark for this database
         
-        # Get messages grouped by chat/handle
-        cursor = conn.execute("""
-            SELECT 
-                m.ROWID as message_id,
-                m.guid,
-                m.text,
-                m.date,
-                m.is_from_me,
-                m.handle_id,
-                c.ROWID as chat_id,
-                c.chat_identifier,
-                c.display_name
-            FROM message m
-            LEFT JOIN chat_message_join cmj ON m.ROWID = cmj.message_id
-            LEFT JOIN chat c ON cmj.chat_id = c.ROWID
-            WHERE m.date > ?
-            ORDER BY m.date DESC
-            LIMIT ?
-        """, (since_apple, MAX_ITEMS_PER_SYNC * 10))
+        If the row the cursor points at now holds a different message, or
+        the table no longer reaches that ROWID, chat.db has been rebuilt
+        (restore, migration, Messages in iCloud re-download) and ROWIDs
+        mean something else, so the cursor is discarded.
+        """
+        cursor_state = self.state.get_state(CURSOR_NAMESPACE, self.db_path)
+        if not cursor_state:
+            return None
+        
+        row = conn.execute(
+            "SELECT guid FROM message WHERE ROWID = ?", (cursor_state['rowid'],)
+        ).fetchone()
+        
+        if row is None:
+            rebuilt = highest_message_rowid(conn) < cursor_state['rowid']
+        else:
+            rebuilt = row[0] != cursor_state.get('guid')
+        
+        if rebuilt:
+            print("iMessage database appears to have been rebuilt, resetting cursor")
+            self.state.delete_state(CURSOR_NAMESPACE, self.db_path)
+            return None
         
-        # Group messages by chat/conversation
+        return cursor_state
+    
+    def _save_cursor(self, rowid: int, date: int, guid: str):
+        self.state.set_state(CURSOR_NAMESPACE, self.db_path, {
+            "rowid": rowid,
+            "date": date,
+            "guid": guid,
+        })
+    
+    def _read_message_pages(
+        self,
+        conn: sqlite3.Connection,
+        after_rowid: int,
+        since_apple: int
+    ) -> Iterator[List[Tuple]]:
+        """
+        Yield new messages in ROWID order, IMESSAGE_PAGE_SIZE messages at a time
+        
+        A message in several chats comes back once per chat. Pages are cut
+        on message ROWIDs, before the chat join, so all of a message's rows
+        are in the same page and the next page can start after its ROWID.
+        """
+        while True:
+            rows = conn.execute("""
+                WITH page AS (
+                    SELECT ROWID FROM message
+                    WHERE ROWID > ? AND date > ?
+                    ORDER BY ROWID
+                    LIMIT ?
+                )
+                SELECT 
+                    m.ROWID as message_id,
+                    m.guid,
+                    m.text,
+                    m.date,
+                    m.is_from_me,
+                    m.handle_id,
+                    c.ROWID as chat_id,
+                    c.chat_identifier,
+                    c.display_name,
+                    m.attributedBody
+                FROM page
+                JOIN message m ON m.ROWID = page.ROWID
+                LEFT JOIN chat_message_join cmj ON m.ROWID = cmj.message_id
+                LEFT JOIN chat c ON cmj.chat_id = c.ROWID
+                ORDER BY m.ROWID
+            """, (after_rowid, since_apple, IMESSAGE_PAGE_SIZE)).fetchall()
+            
+            if not rows:
+                return
+            
+            yield rows
+            after_rowid = rows[-1][0]
+    
+    def _get_conversations(
+        self, 
+        rows: List[Tuple],
+        handles: Dict[int, Dict[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """Group a page of message rows into conversations"""
         conversations: Dict[str, Dict[str, Any]] = {}
         
-        for row in cursor:
+        for row in rows:
             message_id = row[0]
             guid = row[1]
-            text = row[2]
+            text = message_text(message_id, row[2], row[9])
             date = row[3]
             is_from_me = row[4]
             handle_id = row[5]
@@ -151,6 +237,7 @@ class IMessageSyncAgent:
             
             conversations[conv_key]["messages"].append({
                 "id": guid,
+                "rowid": message_id,
                 "text": text,
                 "date": date,
                 "isFromMe": bool(is_from_me),
@@ -161,36 +248,77 @@ class IMessageSyncAgent:
         
         return list(conversations.values())
     
-    def sync(self, since_hours: Optional[int] = None, force: bool = False) -> Dict[str, Any]:
-        """Sync recent iMessage conversations to Ninja OS"""
-        
-        if not self._check_database_access():
-            return {"error": "Cannot access iMessage database"}
-        
-        if force:
-            self.synced_ids = set()
-        
-        hours = since_hours or LOOKBACK_HOURS
-        since = datetime.now() - timedelta(hours=hours)
-        
-        print(f"Reading iMessages since {since}...")
-        
-        try:
-            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
-            handles = self._get_handle_info(conn)
-            conversations = self._get_conversations(conn, handles, since)
-            conn.close()
-        except Exception as e:
-            return {"error": f"Database error: {e}"}
+    def _participants(self, conv: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Participant info for a conversation"""
+        participants = []
+        if conv['phone']:
+            participants.append({"phone": conv['phone'], "name": conv['displayName']})
+        elif conv['email']:
+            participants.append({"email": conv['email'], "name": conv['displayName']})
+        elif conv['displayName']:
+            participants.append({"name": conv['displayName']})
+        return participants
+    
+    def _build_delta_items(
+        self,
+        conversations: List[Dict[str, Any]],
+        only: Optional[Set[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+        """
+        Turn conversations into append items, one per thread per day
         
-        print(f"Found {len(conversations)} conversations with recent messages")
+        Only messages not yet synced for the thread-day are included (and
+        only thread-days in only, if given). Returns the items and
+        {externalId: messages} for marking them sent.
+        """
+        items = []
+        sent = {}
+        for conv in conversations:
+            sender_name = conv['displayName'] or conv['phone'] or "Them"
+            
+            days: Dict[Any, List[Dict[str, Any]]] = {}
+            for msg in conv['messages']:
+                days.setdefault(self._apple_time_to_datetime(msg['date']).date(), []).append(msg)
+            
+            for day, messages in days.items():
+                external_id = self.threads.thread_id(conv['chatIdentifier'], day)
+                if only is not None and external_id not in only:
+                    continue
+                fresh, append_after = self.threads.pending(external_id, messages)
+                if not fresh:
+                    continue
+                
+                transcript_lines = []
+                for msg in fresh:
+                    sender = "Me" if msg['isFromMe'] else sender_name
+                    timestamp = self._apple_time_to_datetime(msg['date']).strftime("%H:%M")
+                    transcript_lines.append(f"[{timestamp}] {sender}: {msg['text']}")
+                
+                items.append({
+                    "externalId": external_id,
+                    **self.threads.delta_fields(fresh, append_after),
+                    "type": "text",
+                    "title": f"iMessage with {conv['displayName'] or conv['phone'] or conv['email'] or 'Unknown'}",
+                    "transcript": "\n".join(transcript_lines),
+                    "timestamp": self._apple_time_to_datetime(fresh[-1]['date']).isoformat(),
+                    "participants": self._participants(conv),
+                })
+                sent[external_id] = fresh
         
-        # Prepare items for sync
+        return items, sent
+    
+    @staticmethod
+    def _conversation_id(conv: Dict[str, Any]) -> str:
+        """externalId of a whole-conversation item (without append mode)"""
+        # Create external ID from chat identifier and date range
+        external_id = f"imessage_{conv['chatIdentifier']}_{conv['latestDate']}"
+        return hashlib.md5(external_id.encode()).hexdigest()
+    
+    def _build_items(self, conversations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Turn conversations into sync items, skipping ones already synced"""
         items = []
         for conv in conversations:
-            # Create external ID from chat identifier and date range
-            external_id = f"imessage_{conv['chatIdentifier']}_{conv['latestDate']}"
-            external_id = hashlib.md5(external_id.encode()).hexdigest()
+            external_id = self._conversation_id(conv)
             
             if external_id in self.synced_ids:
                 continue
@@ -205,82 +333,221 @@ class IMessageSyncAgent:
             
             transcript = "\n".join(transcript_lines)
             
-            # Prepare participant info
-            participants = []
-            if conv['phone']:
-                participants.append({"phone": conv['phone'], "name": conv['displayName']})
-            elif conv['email']:
-                participants.append({"email": conv['email'], "name": conv['displayName']})
-            elif conv['displayName']:
-                participants.append({"name": conv['displayName']})
-            
             items.append({
                 "externalId": external_id,
                 "type": "text",
                 "title": f"iMessage with {conv['displayName'] or conv['phone'] or conv['email'] or 'Unknown'}",
                 "transcript": transcript,
                 "timestamp": self._apple_time_to_datetime(conv['latestDate']).isoformat(),
-                "participants": participants,
+                "participants": self._participants(conv),
             })
-            
-            if len(items) >= MAX_ITEMS_PER_SYNC:
-                break
         
-        if not items:
-            print("No new conversations to sync")
-            return {"synced": 0, "message": "No new conversations"}
+        return items
+    
+    def _first_rowids(self, conversations: List[Dict[str, Any]]) -> Dict[str, int]:
+        """The lowest ROWID among the messages behind each item's externalId"""
+        first: Dict[str, int] = {}
+        for conv in conversations:
+            for msg in conv['messages']:
+                if self.append_mode:
+                    day = self._apple_time_to_datetime(msg['date']).date()
+                    external_id = self.threads.thread_id(conv['chatIdentifier'], day)
+                else:
+                    external_id = self._conversation_id(conv)
+                first[external_id] = min(first.get(external_id, msg['rowid']), msg['rowid'])
+        return first
+    
+    def sync(self, since_hours: Optional[int] = None, force: bool = False) -> Dict[str, Any]:
+        """
+        Sync new iMessages to Ninja OS
+        
+        Reads only rows past the persisted ROWID cursor. The lookback window
+        is used on the first run, after --force, or if chat.db was rebuilt.
+        Each page is pushed before the cursor moves past it, so an
+        interrupted sync resumes where it stopped. If some of a page's
+        items aren't stored (failed, queued in the outbox, or in
+        conflict), the cursor stops short of their first message and the
+        sync ends there; the next sync reads them again. The read
+        transaction on chat.db is released before each push (see
+        ChatDbSnapshot.release) so Messages.app's WAL can be checkpointed
+        meanwhile; each page is still read in a single query, and messages
+        that arrive mid-sync are picked up by a later page or sync.
+        
+        In append mode (CONVERSATION_APPEND_MODE) each conversation is one
+        interaction per day, and only its new messages are sent.
+        """
+        with self.reading() as conn:
+            if conn is None:
+                return {"error": "Cannot access iMessage database"}
+            return self._sync(conn, since_hours, force)
+    
+    def _sync(self, conn: sqlite3.Connection, since_hours: Optional[int], force: bool) -> Dict[str, Any]:
+        if force:
+            self.synced_ids.clear()
+            self.threads.reset()
+            self.state.delete_state(CURSOR_NAMESPACE, self.db_path)
+        
+        hours = since_hours or LOOKBACK_HOURS
+        since = datetime.now() - timedelta(hours=hours)
         
-        print(f"Syncing {len(items)} conversations...")
+        totals = {"received": 0, "processed": 0, "failed": 0, "results": []}
+        conversation_count = 0
         
         try:
-            result = self.client.push_items(
-                source="imessage",
-                items=items,
-                sync_type="incremental" if not force else "full"
-            )
-            
-            for item_result in result.get('results', []):
-                if item_result.get('status') in ['created', 'skipped']:
-                    self.synced_ids.add(item_result.get('id'))
+            handles = self._get_handle_info(conn)
+            cursor_state = self._load_cursor(conn)
             
-            self._save_synced_ids()
+            if cursor_state:
+                print(f"Reading iMessages after ROWID {cursor_state['rowid']}...")
+                pages = self._read_message_pages(conn, cursor_state['rowid'], 0)
+            else:
+                print(f"Reading iMessages since {since}...")
+                pages = self._read_message_pages(conn, 0, self._datetime_to_apple_time(since))
             
-            print(f"Sync complete: {result.get('processed', 0)} processed, {result.get('failed', 0)} failed")
-            return result
+            for rows in pages:
+                conversations = self._get_conversations(rows, handles)
+                conversation_count += len(conversations)
+                if self.append_mode:
+                    items, sent = self._build_delta_items(conversations)
+                else:
+                    items, sent = self._build_items(conversations), None
+                
+                if items:
+                    # Don't hold up Messages.app's WAL checkpoints while waiting on the server
+                    if self._snapshot:
+                        self._snapshot.release()
+                    print(f"Syncing {len(items)} conversations...")
+                    sync_type = "incremental" if not force else "full"
+                    if sent is None:
+                        result = self.client.push_items(source="imessage", items=items, sync_type=sync_type)
+                        self.synced_ids.update(
+                            item_result.get('id') for item_result in result.get('results', [])
+                            if item_result.get('status') in ['created', 'skipped']
+                        )
+                    else:
+                        result = self.threads.push(
+                            self.client, items, sent,
+                            rebuild=lambda ids: self._build_delta_items(conversations, only=ids),
+                            sync_type=sync_type
+                        )
+                    
+                    totals["syncId"] = result.get("syncId")
+                    totals["received"] += result.get("received", len(items))
+                    totals["processed"] += result.get("processed", 0)
+                    totals["failed"] += result.get("failed", 0)
+                    totals["results"].extend(result.get("results", []))
+                    
+                    stored = {
+                        item_result.get('id') for item_result in result.get('results', [])
+                        if item_result.get('status') in SENT_STATUSES
+                    }
+                    pushed = {item['externalId'] for item in items}
+                    unstored = [
+                        rowid for external_id, rowid in self._first_rowids(conversations).items()
+                        if external_id in pushed and external_id not in stored
+                    ]
+                    if unstored:
+                        stop_at = min(unstored)
+                        done = [row for row in rows if row[0] < stop_at]
+                        if done:
+                            self._save_cursor(done[-1][0], done[-1][3], done[-1][1])
+                        print(f"Stopping at ROWID {stop_at}: {len(unstored)} conversations not stored, retrying next sync")
+                        break
+                
+                last = rows[-1]
+                self._save_cursor(last[0], last[3], last[1])
+        except sqlite3.Error as e:
+            return {"error": f"Database error: {e}"}
         except Exception as e:
             return {"error": str(e)}
+        
+        print(f"Found {conversation_count} conversations with new messages")
+        
+        if not totals["received"]:
+            print("No new conversations to sync")
+            return {"synced": 0, "message": "No new conversations"}
+        
+        print(f"Sync complete: {totals['processed']} processed, {totals['failed']} failed")
+        return totals
     
-    def search_messages(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
-        """Search iMessage database for messages containing query"""
+    def search_messages(
+        self,
+        query: str,
+        limit: int = 20,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        contact: Optional[str] = None,
+        reindex: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Search iMessage database for messages containing query
         
-        if not self._check_database_access():
+        Uses the FTS5 sidecar index (see imessage_search.py), which is
+        brought up to date from chat.db first. Falls back to a LIKE scan
+        of chat.db if this SQLite build lacks FTS5.
+        """
+        with self.reading() as conn:
+            if conn is None:
+                return []
+            
+            if not has_fts5():
+                return self._search_messages_like(conn, query, limit)
+            
+            return self._search_index(conn, query, limit, since, until, contact, reindex)
+    
+    def _search_index(
+        self,
+        conn: sqlite3.Connection,
+        query: str,
+        limit: int,
+        since: Optional[datetime],
+        until: Optional[datetime],
+        contact: Optional[str],
+        reindex: bool
+    ) -> List[Dict[str, Any]]:
+        index = MessageSearchIndex(self.db_path)
+        try:
+            if reindex:
+                index.clear()
+            added = index.update(conn)
+            if added:
+                print(f"Indexed {added} new messages")
+            
+            return index.search(query, limit=limit, since=since, until=until, contact=contact)
+        except Exception as e:
+            print(f"Search error: {e}")
             return []
-        
+        finally:
+            index.close()
+    
+    def _search_messages_like(self, conn: sqlite3.Connection, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Unindexed substring search directly against chat.db"""
         try:
-            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
             cursor = conn.execute("""
                 SELECT 
                     m.text,
                     m.date,
                     m.is_from_me,
-                    h.id as handle_id
+                    h.id as handle_id,
+                    m.ROWID,
+                    m.attributedBody
                 FROM message m
                 LEFT JOIN handle h ON m.handle_id = h.ROWID
                 WHERE m.text LIKE ?
+                   OR (m.text IS NULL AND instr(m.attributedBody, CAST(? AS BLOB)) > 0)
                 ORDER BY m.date DESC
                 LIMIT ?
-            """, (f"%{query}%", limit))
+            """, (f"%{query}%", query, limit))
             
             results = []
             for row in cursor:
                 results.append({
-                    "text": row[0],
+                    "text": message_text(row[4], row[0], row[5]),
                     "date": self._apple_time_to_datetime(row[1]).isoformat(),
                     "isFromMe": bool(row[2]),
                     "contact": row[3],
                 })
             
-            conn.close()
             return results
         except Exception as e:
             print(f"Search error: {e}")
@@ -295,6 +562,10 @@ def main():
     parser.add_argument("--hours", type=int, default=24, help="Hours of history to sync")
     parser.add_argument("--force", action="store_true", help="Force full sync")
     parser.add_argument("--search", help="Search messages instead of syncing")
+    parser.add_argument("--contact", help="With --search: only messages with this phone/email")
+    parser.add_argument("--days", type=int, help="With --search: only the last N days")
+    parser.add_argument("--limit", type=int, default=20, help="With --search: maximum results")
+    parser.add_argument("--reindex", action="store_true", help="With --search: rebuild the search index")
     parser.add_argument("--url", default=NINJA_OS_URL, help="Ninja OS URL")
     
     args = parser.parse_args()
@@ -302,7 +573,10 @@ def main():
     agent = IMessageSyncAgent(args.url)
     
     if args.search:
-        results = agent.search_messages(args.search)
+        since = datetime.now() - timedelta(days=args.days) if args.days else None
+        results = agent.search_messages(
+            args.search, limit=args.limit, since=since, contact=args.contact, reindex=args.reindex
+        )
         print(json.dumps(results, indent=2))
     else:
         result = agent.sync(since_hours=args.hours, force=args.force)
@@ -8,117 +8,286 @@ import os
 import sys
 import json
 import time
+import queue
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Set
 
-from config import NINJA_OS_URL, SYNC_INTERVAL_MINUTES
+from config import (
+    NINJA_OS_URL, SYNC_INTERVAL_MINUTES, SYNC_CONCURRENCY, SYNC_SOURCE_TIMEOUT_SECONDS,
+    WATCH_DEBOUNCE_SECONDS, OUTBOX_ENABLED
+)
 
 
-def run_all_syncs(url: str, sources: List[str] = None, force: bool = False) -> Dict[str, Any]:
-    """Run all sync agents and return combined results"""
+SOURCE_RUNNERS: Dict[str, Callable[[str, bool], Dict[str, Any]]] = {}
+
+# Sources whose agent is still running, including ones abandoned after a timeout
+_in_flight: Set[str] = set()
+_in_flight_lock = threading.Lock()
+
+
+def _source_runner(name: str):
+    """Register a per-source sync function under the given source name"""
+    def decorator(func):
+        SOURCE_RUNNERS[name] = func
+        return func
+    return decorator
+
+
+def _print_header(title: str):
+    print("\n" + "="*50)
+    print(title)
+    print("="*50)
+
+
+@_source_runner('granola')
+def _sync_granola(url: str, force: bool) -> Dict[str, Any]:
+    try:
+        from sync_granola import GranolaSyncAgent
+        from config import GRANOLA_CACHE_PATH
+        
+        _print_header("SYNCING GRANOLA")
+        
+        agent = GranolaSyncAgent(url, GRANOLA_CACHE_PATH)
+        return agent.sync(force=force)
+    except ImportError as e:
+        return {"error": f"Import error: {e}"}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@_source_runner('imessage')
+def _sync_imessage(url: str, force: bool) -> Dict[str, Any]:
+    try:
+        from sync_imessage import IMessageSyncAgent
+        
+        _print_header("SYNCING IMESSAGE")
+        
+        agent = IMessageSyncAgent(url)
+        return agent.sync(force=force)
+    except ImportError as e:
+        return {"error": f"Import error: {e}"}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@_source_runner('plaud')
+def _sync_plaud(url: str, force: bool) -> Dict[str, Any]:
+    # Only runs if the Plaud directory exists
+    try:
+        from sync_plaud import PlaudSyncAgent
+        from config import PLAUD_DATA_PATH
+        
+        plaud_path = os.path.expanduser(PLAUD_DATA_PATH)
+        if not os.path.exists(plaud_path):
+            return {"skipped": True, "message": f"Directory not found: {plaud_path}"}
+        
+        _print_header("SYNCING PLAUD")
+        
+        agent = PlaudSyncAgent(url, PLAUD_DATA_PATH)
+        return agent.sync_directory(force=force)
+    except ImportError as e:
+        return {"error": f"Import error: {e}"}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@_source_runner('whatsapp')
+def _sync_whatsapp(url: str, force: bool) -> Dict[str, Any]:
+    # Only runs if the WhatsApp directory exists
+    try:
+        from sync_whatsapp import WhatsAppSyncAgent
+        from config import WHATSAPP_DATA_PATH
+        
+        whatsapp_path = os.path.expanduser(WHATSAPP_DATA_PATH)
+        if not os.path.exists(whatsapp_path):
+            return {"skipped": True, "message": f"Directory not found: {whatsapp_path}"}
+        
+        _print_header("SYNCING WHATSAPP")
+        
+        agent = WhatsAppSyncAgent(url)
+        return agent.sync_directory(whatsapp_path, force=force)
+    except ImportError as e:
+        return {"error": f"Import error: {e}"}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@_source_runner('fathom')
+def _sync_fathom(url: str, force: bool) -> Dict[str, Any]:
+    # Requires an API key in config.py
+    try:
+        from sync_fathom import FathomSyncAgent
+        from config import FATHOM_API_KEY
+        
+        if not FATHOM_API_KEY:
+            return {"skipped": True, "message": "API key not configured in config.py"}
+        
+        _print_header("SYNCING FATHOM.VIDEO")
+        
+        agent = FathomSyncAgent(url, FATHOM_API_KEY)
+        return agent.sync(force=force)
+    except ImportError as e:
+        return {"error": f"Import error: {e}"}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def run_all_syncs(
+    url: str,
+    sources: List[str] = None,
+    force: bool = False,
+    concurrency: int = SYNC_CONCURRENCY,
+    source_timeout: Optional[float] = SYNC_SOURCE_TIMEOUT_SECONDS,
+    on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Run all sync agents and return combined results
     
-    results = {}
+    Args:
+        url: Ninja OS URL
+        sources: Sources to sync (default: granola and imessage)
+        force: Force full sync
+        concurrency: Maximum number of sources syncing at once (1 = sequential)
+        source_timeout: Seconds a single source may run before it is reported
+            as timed out (None or 0 = no limit). This doesn't stop the agent: it keeps running in the background, and
+            the source is skipped by later runs until it has finished.
+        on_result: Called with (source, result) as soon as each source finishes
+    
+    Returns:
+        Dict of source -> result, in the order the sources finished
+    """
     enabled_sources = sources or ['granola', 'imessage']  # Default to these two
+    enabled_sources = [s for s in SOURCE_RUNNERS if s in enabled_sources]
     
-    # Granola
-    if 'granola' in enabled_sources:
-        try:
-            from sync_granola import GranolaSyncAgent
-            from config import GRANOLA_CACHE_PATH
-            
-            print("\n" + "="*50)
-            print("SYNCING GRANOLA")
-            print("="*50)
-            
-            agent = GranolaSyncAgent(url, GRANOLA_CACHE_PATH)
-            results['granola'] = agent.sync(force=force)
-        except ImportError as e:
-            results['granola'] = {"error": f"Import error: {e}"}
-        except Exception as e:
-            results['granola'] = {"error": str(e)}
+    try:
+        replay_outbox(url)
+    except Exception as e:
+        print(f"Outbox replay failed: {e}")
     
-    # iMessage
-    if 'imessage' in enabled_sources:
-        try:
-            from sync_imessage import IMessageSyncAgent
-            
-            print("\n" + "="*50)
-            print("SYNCING IMESSAGE")
-            print("="*50)
-            
-            agent = IMessageSyncAgent(url)
-            results['imessage'] = agent.sync(force=force)
-        except ImportError as e:
-            results['imessage'] = {"error": f"Import error: {e}"}
-        except Exception as e:
-            results['imessage'] = {"error": str(e)}
+    results = {}
+    with _in_flight_lock:
+        busy = [source for source in enabled_sources if source in _in_flight]
+    for source in busy:
+        results[source] = {"skipped": True, "message": "previous sync still running"}
+        if on_result:
+            on_result(source, results[source])
+    enabled_sources = [source for source in enabled_sources if source not in busy]
     
-    # Plaud (only if directory exists)
-    if 'plaud' in enabled_sources:
-        try:
-            from sync_plaud import PlaudSyncAgent
-            from config import PLAUD_DATA_PATH
-            
-            plaud_path = os.path.expanduser(PLAUD_DATA_PATH)
-            if os.path.exists(plaud_path):
-                print("\n" + "="*50)
-                print("SYNCING PLAUD")
-                print("="*50)
-                
-                agent = PlaudSyncAgent(url, PLAUD_DATA_PATH)
-                results['plaud'] = agent.sync_directory(force=force)
-            else:
-                results['plaud'] = {"skipped": True, "message": f"Directory not found: {plaud_path}"}
-        except ImportError as e:
-            results['plaud'] = {"error": f"Import error: {e}"}
-        except Exception as e:
-            results['plaud'] = {"error": str(e)}
+    if concurrency <= 1 or len(enabled_sources) <= 1:
+        # One at a time, each still under its own time limit
+        for source in enabled_sources:
+            results.update(_run_concurrently(url, [source], force, 1, source_timeout, on_result))
+        return results
     
-    # WhatsApp (only if directory exists)
-    if 'whatsapp' in enabled_sources:
-        try:
-            from sync_whatsapp import WhatsAppSyncAgent
-            from config import WHATSAPP_DATA_PATH
-            
-            whatsapp_path = os.path.expanduser(WHATSAPP_DATA_PATH)
-            if os.path.exists(whatsapp_path):
-                print("\n" + "="*50)
-                print("SYNCING WHATSAPP")
-                print("="*50)
-                
-                agent = WhatsAppSyncAgent(url)
-                results['whatsapp'] = agent.sync_directory(whatsapp_path, force=force)
-            else:
-                results['whatsapp'] = {"skipped": True, "message": f"Directory not found: {whatsapp_path}"}
-        except ImportError as e:
-            results['whatsapp'] = {"error": f"Import error: {e}"}
-        except Exception as e:
-            results['whatsapp'] = {"error": str(e)}
+    results.update(_run_concurrently(url, enabled_sources, force, concurrency, source_timeout, on_result))
+    return results
+
+
+def _run_source(source: str, url: str, force: bool) -> Dict[str, Any]:
+    """Run one source's agent, tracking it in _in_flight until it returns"""
+    with _in_flight_lock:
+        _in_flight.add(source)
+    try:
+        return SOURCE_RUNNERS[source](url, force)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(source)
+
+
+def _run_concurrently(
+    url: str,
+    sources: List[str],
+    force: bool,
+    concurrency: int,
+    source_timeout: Optional[float],
+    on_result: Optional[Callable[[str, Dict[str, Any]], None]]
+) -> Dict[str, Any]:
+    """Run sources on a thread pool, reporting each result as it completes"""
+    results = {}
+    started: Dict[str, float] = {}
     
-    # Fathom.video (requires API key)
-    if 'fathom' in enabled_sources:
-        try:
-            from sync_fathom import FathomSyncAgent
-            from config import FATHOM_API_KEY
+    def run(source: str) -> Dict[str, Any]:
+        started[source] = time.monotonic()
+        return _run_source(source, url, force)
+    
+    def record(source: str, result: Dict[str, Any]):
+        results[source] = result
+        if on_result:
+            on_result(source, result)
+    
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="sync")
+    pending = {executor.submit(run, source): source for source in sources}
+    
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
             
-            if FATHOM_API_KEY:
-                print("\n" + "="*50)
-                print("SYNCING FATHOM.VIDEO")
-                print("="*50)
-                
-                agent = FathomSyncAgent(url, FATHOM_API_KEY)
-                results['fathom'] = agent.sync(force=force)
-            else:
-                results['fathom'] = {"skipped": True, "message": "API key not configured in config.py"}
-        except ImportError as e:
-            results['fathom'] = {"error": f"Import error: {e}"}
-        except Exception as e:
-            results['fathom'] = {"error": str(e)}
+            for future in done:
+                source = pending.pop(future)
+                try:
+                    record(source, future.result())
+                except Exception as e:
+                    record(source, {"error": str(e)})
+            
+            if not source_timeout:
+                continue
+            
+            # Threads can't be killed, so a timed-out agent is abandoned and
+            # keeps its worker until it returns; its result is discarded, and
+            # it stays in _in_flight so later runs skip it meanwhile
+            now = time.monotonic()
+            for future, source in list(pending.items()):
+                start = started.get(source)
+                if start is not None and now - start > source_timeout:
+                    del pending[future]
+                    record(source, {"error": f"Timed out after {source_timeout:g}s"})
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
     
     return results
 
 
+def replay_outbox(url: str) -> Dict[str, int]:
+    """Resend queued pushes/transcriptions whose retry time has come"""
+    if not OUTBOX_ENABLED:
+        return {}
+    
+    from outbox import get_outbox
+    from sync_client import NinjaOSSyncClient
+    
+    outbox = get_outbox()
+    if not outbox.depth():
+        return {}
+    
+    # Fail fast: the outbox has its own backoff between replays
+    client = NinjaOSSyncClient(url, max_retries=0, use_outbox=False)
+    counts = outbox.replay(client)
+    if any(counts.values()):
+        print(f"Outbox replay: {counts['sent']} sent, {counts['failed']} still failing, "
+              f"{counts['rejected']} rejected, {counts['expired']} expired")
+    return counts
+
+
+def format_result(source: str, result: Dict[str, Any]) -> str:
+    """Format a single source result as a one-line status"""
+    if 'error' in result:
+        return f"{source}: ERROR - {result['error']}"
+    elif result.get('skipped'):
+        return f"{source}: SKIPPED - {result.get('message', '')}"
+    else:
+        synced = result.get('synced', result.get('processed', 0))
+        failed = result.get('failed', 0)
+        return f"{source}: {synced} synced, {failed} failed"
+
+
+def print_result(source: str, result: Dict[str, Any]):
+    """Print a source result as soon as it finishes"""
+    print(f"\n>>> {format_result(source, result)}")
+
+
 def print_summary(results: Dict[str, Any]):
     """Print a summary of sync results"""
     print("\n" + "="*50)
@@ -126,28 +295,40 @@ def print_summary(results: Dict[str, Any]):
     print("="*50)
     
     for source, result in results.items():
-        if 'error' in result:
-            print(f"  {source}: ERROR - {result['error']}")
-        elif result.get('skipped'):
-            print(f"  {source}: SKIPPED - {result.get('message', '')}")
-        else:
-            synced = result.get('synced', result.get('processed', 0))
-            failed = result.get('failed', 0)
-            print(f"  {source}: {synced} synced, {failed} failed")
+        print(f"  {format_result(source, result)}")
+    
+    if OUTBOX_ENABLED:
+        from outbox import get_outbox
+        
+        depth = get_outbox().depth()
+        if depth:
+            per_source = ", ".join(f"{source}: {count}" for source, count in depth.items())
+            print(f"  outbox: {sum(depth.values())} queued for retry ({per_source})")
 
 
-def run_daemon(url: str, sources: List[str], interval_minutes: int):
+def run_daemon(
+    url: str,
+    sources: List[str],
+    interval_minutes: int,
+    concurrency: int = SYNC_CONCURRENCY,
+    source_timeout: Optional[float] = SYNC_SOURCE_TIMEOUT_SECONDS
+):
     """Run sync continuously at specified interval"""
     print(f"Starting sync daemon (interval: {interval_minutes} minutes)")
-    print(f"Sources: {', '.join(sources)}")
+    print(f"Sources: {', '.join(sources)} (concurrency: {concurrency})")
     print(f"URL: {url}")
-    print(f"Press Ctrl+C to stop\n")
+    print("Press Ctrl+C to stop\n")
     
     while True:
         print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting sync...")
         
         try:
-            results = run_all_syncs(url, sources)
+            results = run_all_syncs(
+                url, sources,
+                concurrency=concurrency,
+                source_timeout=source_timeout,
+                on_result=print_result
+            )
             print_summary(results)
         except KeyboardInterrupt:
             raise
@@ -158,6 +339,97 @@ def run_daemon(url: str, sources: List[str], interval_minutes: int):
         time.sleep(interval_minutes * 60)
 
 
+def _watch_paths() -> Dict[str, List[str]]:
+    """Local files/directories whose changes should trigger each source"""
+    from config import GRANOLA_CACHE_PATH, IMESSAGE_DB_PATH, PLAUD_DATA_PATH, WHATSAPP_DATA_PATH
+    
+    return {
+        'granola': [GRANOLA_CACHE_PATH],
+        'imessage': [IMESSAGE_DB_PATH, IMESSAGE_DB_PATH + "-wal"],
+        'plaud': [PLAUD_DATA_PATH],
+        'whatsapp': [WHATSAPP_DATA_PATH],
+    }
+
+
+def run_watch_daemon(
+    url: str,
+    sources: List[str],
+    interval_minutes: int,
+    concurrency: int = SYNC_CONCURRENCY,
+    source_timeout: Optional[float] = SYNC_SOURCE_TIMEOUT_SECONDS,
+    debounce_seconds: float = WATCH_DEBOUNCE_SECONDS,
+    polling: bool = False
+):
+    """
+    Sync each source shortly after its local data changes
+    
+    Changes are debounced per source so a burst of writes (Messages
+    flushing its WAL, Granola rewriting its cache) triggers one sync.
+    A full sweep of every source still runs every interval_minutes as a
+    safety net, and covers sources with nothing to watch (Fathom).
+    """
+    from file_watcher import create_watcher
+    
+    watcher = create_watcher(polling=polling)
+    watch_paths = _watch_paths()
+    for source in sources:
+        if source in watch_paths:
+            watcher.watch(source, watch_paths[source])
+    
+    print(f"Starting sync daemon in watch mode ({type(watcher).__name__}, "
+          f"sweep every {interval_minutes} minutes)")
+    print(f"Sources: {', '.join(sources)} (concurrency: {concurrency})")
+    print(f"URL: {url}")
+    print("Press Ctrl+C to stop\n")
+    
+    events: "queue.Queue[str]" = queue.Queue()
+    watcher.start(events.put)
+    
+    def run(batch: List[str], reason: str):
+        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {reason}: {', '.join(batch)}")
+        try:
+            results = run_all_syncs(
+                url, batch,
+                concurrency=concurrency,
+                source_timeout=source_timeout,
+                on_result=print_result
+            )
+            print_summary(results)
+        except Exception as e:
+            print(f"Sync failed: {e}")
+    
+    last_event: Dict[str, float] = {}
+    next_sweep = time.monotonic()
+    
+    try:
+        while True:
+            # Drain events without skipping the checks below, so a steady
+            # stream of them can't hold back the sweep or other sources
+            try:
+                source = events.get(timeout=0.5)
+                last_event[source] = time.monotonic()
+                while True:
+                    source = events.get_nowait()
+                    last_event[source] = time.monotonic()
+            except queue.Empty:
+                pass
+            
+            now = time.monotonic()
+            if now >= next_sweep:
+                last_event.clear()
+                run(sources, "Interval sweep")
+                next_sweep = time.monotonic() + interval_minutes * 60
+                continue
+            
+            ready = [s for s, t in last_event.items() if now - t >= debounce_seconds]
+            if ready:
+                for source in ready:
+                    del last_event[source]
+                run(ready, "Change detected")
+    finally:
+        watcher.stop()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Ninja OS Unified Sync Manager",
@@ -166,8 +438,10 @@ def main():
 Examples:
   python sync_manager.py                    # Run all syncs once
   python sync_manager.py --daemon           # Run continuously
+  python sync_manager.py --daemon --watch   # Sync on file changes
   python sync_manager.py --sources granola fathom  # Only specific sources
   python sync_manager.py --force            # Force re-sync all
+  python sync_manager.py --concurrency 1    # Run sources one after another
 
 Available sources: granola, plaud, imessage, whatsapp, fathom
         """
@@ -177,9 +451,18 @@ Available sources: granola, plaud, imessage, whatsapp, fathom
                         choices=['granola', 'plaud', 'imessage', 'whatsapp', 'fathom'],
                         help="Sources to sync (default: all)")
     parser.add_argument("--daemon", action="store_true", help="Run continuously")
+    parser.add_argument("--watch", action="store_true",
+                        help="With --daemon, sync each source when its local files change")
+    parser.add_argument("--poll", action="store_true",
+                        help="With --watch, poll for changes instead of using native file events")
     parser.add_argument("--interval", type=int, default=SYNC_INTERVAL_MINUTES,
                         help=f"Sync interval in minutes (default: {SYNC_INTERVAL_MINUTES})")
     parser.add_argument("--force", action="store_true", help="Force full sync")
+    parser.add_argument("--concurrency", type=int, default=SYNC_CONCURRENCY,
+                        help=f"Max sources syncing at once (default: {SYNC_CONCURRENCY}, 1 = sequential)")
+    parser.add_argument("--timeout", type=float, default=SYNC_SOURCE_TIMEOUT_SECONDS,
+                        help=f"Per-source timeout in seconds (default: {SYNC_SOURCE_TIMEOUT_SECONDS}, 0 = none); "
+                             "a timed-out source keeps running in the background")
     
     args = parser.parse_args()
     
@@ -187,17 +470,28 @@ Available sources: granola, plaud, imessage, whatsapp, fathom
     if args.url == "https://your-ninja-os.replit.app":
         print("ERROR: Please update NINJA_OS_URL in config.py with your actual Ninja OS URL")
         print("\nYou can find your URL in the Replit webview or after deployment.")
+        print("To try the agents offline, run python local_server.py and pass --url http://127.0.0.1:5055")
         sys.exit(1)
     
     sources = args.sources or ['granola', 'plaud', 'imessage', 'whatsapp', 'fathom']
     
     if args.daemon:
         try:
-            run_daemon(args.url, sources, args.interval)
+            if args.watch:
+                run_watch_daemon(args.url, sources, args.interval, args.concurrency, args.timeout,
+                                 polling=args.poll)
+            else:
+                run_daemon(args.url, sources, args.interval, args.concurrency, args.timeout)
         except KeyboardInterrupt:
             print("\n\nSync daemon stopped.")
     else:
-        results = run_all_syncs(args.url, sources, force=args.force)
+        results = run_all_syncs(
+            args.url, sources,
+            force=args.force,
+            concurrency=args.concurrency,
+            source_timeout=args.timeout,
+            on_result=print_result
+        )
         print_summary(results)
         print(f"\nFull results:\n{json.dumps(results, indent=2, default=str)}")
 
@@ -12,12 +12,14 @@ import os
 import json
 import base64
 import hashlib
+import requests
 from datetime import datetime, timedelta
-from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 
 from sync_client import NinjaOSSyncClient
-from config import NINJA_OS_URL, PLAUD_DATA_PATH, LOOKBACK_HOURS, MAX_ITEMS_PER_SYNC
+from sync_state import SyncedIdSet, FileChangeIndex
+from file_scanner import ScannedFile, scan_files
+from config import NINJA_OS_URL, PLAUD_DATA_PATH, LOOKBACK_HOURS, MAX_ITEMS_PER_SYNC, STREAMING_UPLOAD
 
 
 class PlaudSyncAgent:
@@ -28,84 +30,121 @@ class PlaudSyncAgent:
     def __init__(self, ninja_url: str, data_path: Optional[str] = None):
         self.client = NinjaOSSyncClient(ninja_url)
         self.data_path = os.path.expanduser(data_path) if data_path else None
-        self.synced_ids_file = os.path.expanduser("~/.ninja_os_plaud_synced.json")
-        self.synced_ids = self._load_synced_ids()
+        self.synced_ids = SyncedIdSet("plaud", legacy_file="~/.ninja_os_plaud_synced.json")
+        self.files = FileChangeIndex("plaud")
+        self.streaming_upload = STREAMING_UPLOAD
     
-    def _load_synced_ids(self) -> set:
-        if os.path.exists(self.synced_ids_file):
-            try:
-                with open(self.synced_ids_file, 'r') as f:
-                    return set(json.load(f))
-            except:
-                pass
-        return set()
-    
-    def _save_synced_ids(self):
-        with open(self.synced_ids_file, 'w') as f:
-            json.dump(list(self.synced_ids), f)
-    
-    def _generate_external_id(self, file_path: str) -> str:
+    def _generate_external_id(self, file_path: str, stat: Optional[os.stat_result] = None) -> str:
         """Generate unique ID from file"""
-        stat = os.stat(file_path)
+        stat = stat or os.stat(file_path)
         unique_str = f"plaud_{os.path.basename(file_path)}_{stat.st_size}_{stat.st_mtime}"
         return hashlib.md5(unique_str.encode()).hexdigest()
     
-    def _find_recordings(self, directory: str) -> List[str]:
-        """Find audio recordings in directory"""
-        recordings = []
-        path = Path(directory)
-        
-        if not path.exists():
+    def _find_recordings(
+        self,
+        directory: str,
+        include: Optional[Callable[[str, os.stat_result], bool]] = None,
+        newest: Optional[int] = None
+    ) -> List[ScannedFile]:
+        """Find audio recordings in directory, newest first"""
+        if not os.path.isdir(directory):
             print(f"Directory not found: {directory}")
             return []
         
-        for file in path.rglob("*"):
-            if file.suffix.lower() in self.SUPPORTED_FORMATS:
-                recordings.append(str(file))
+        return scan_files(directory, self.SUPPORTED_FORMATS, include=include, newest=newest)
+    
+    def _transcribe_base64(
+        self,
+        file_path: str,
+        external_id: str,
+        timestamp: str,
+        person_hint: Optional[Dict[str, str]]
+    ) -> Dict[str, Any]:
+        """Send the whole recording base64-encoded in the JSON body"""
+        print(f"Reading audio file: {file_path}")
+        with open(file_path, 'rb') as f:
+            audio_base64 = base64.b64encode(f.read()).decode('utf-8')
         
-        # Sort by modification time (newest first)
-        recordings.sort(key=lambda f: os.path.getmtime(f), reverse=True)
-        return recordings
+        return self.client.transcribe_audio(
+            audio_base64=audio_base64,
+            external_id=external_id,
+            source="plaud",
+            timestamp=timestamp,
+            person_hint=person_hint
+        )
     
-    def sync_file(self, file_path: str, person_name: Optional[str] = None) -> Dict[str, Any]:
+    def _transcribe_streaming(
+        self,
+        file_path: str,
+        external_id: str,
+        timestamp: str,
+        person_hint: Optional[Dict[str, str]]
+    ) -> Dict[str, Any]:
+        """
+        Upload the recording from disk in chunks, then transcribe it
+        
+        The upload is keyed by external_id, so an interrupted upload resumes
+        at the last byte the server received on the next run. Falls back to
+        base64 if the server has no upload endpoint.
+        """
+        try:
+            self.client.upload_audio_file(file_path, upload_id=external_id, source="plaud")
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                print("Server does not support streaming uploads, sending base64")
+                self.streaming_upload = False
+                return self._transcribe_base64(file_path, external_id, timestamp, person_hint)
+            raise
+        
+        return self.client.transcribe_audio(
+            upload_id=external_id,
+            filename=os.path.basename(file_path),
+            external_id=external_id,
+            source="plaud",
+            timestamp=timestamp,
+            person_hint=person_hint
+        )
+    
+    def sync_file(
+        self,
+        file_path: str,
+        person_name: Optional[str] = None,
+        file_stat: Optional[os.stat_result] = None
+    ) -> Dict[str, Any]:
         """Sync a single audio file"""
-        if not os.path.exists(file_path):
+        try:
+            file_stat = file_stat or os.stat(file_path)
+        except OSError:
             return {"error": f"File not found: {file_path}"}
         
-        external_id = self._generate_external_id(file_path)
+        external_id = self._generate_external_id(file_path, file_stat)
         
         if external_id in self.synced_ids:
             return {"status": "skipped", "message": "Already synced"}
         
-        # Read and encode audio
-        print(f"Reading audio file: {file_path}")
-        with open(file_path, 'rb') as f:
-            audio_data = f.read()
-        
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+        # A queued transcription already holds the audio; let the outbox send it
+        if self.client.outbox and self.client.outbox.is_queued("plaud", external_id):
+            return {"status": "queued", "message": "Waiting in outbox for retry"}
         
         # Get file timestamp
-        timestamp = datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
+        timestamp = datetime.fromtimestamp(file_stat.st_mtime).isoformat()
         
         # Prepare person hint
         person_hint = None
         if person_name:
             person_hint = {"name": person_name}
         
-        print(f"Transcribing and uploading ({len(audio_data) / 1024:.1f} KB)...")
+        print(f"Transcribing and uploading ({file_stat.st_size / 1024:.1f} KB)...")
         
         try:
-            result = self.client.transcribe_audio(
-                audio_base64=audio_base64,
-                external_id=external_id,
-                source="plaud",
-                timestamp=timestamp,
-                person_hint=person_hint
-            )
+            if self.streaming_upload:
+                result = self._transcribe_streaming(file_path, external_id, timestamp, person_hint)
+            else:
+                result = self._transcribe_base64(file_path, external_id, timestamp, person_hint)
             
             if result.get('status') in ['created', 'skipped']:
                 self.synced_ids.add(external_id)
-                self._save_synced_ids()
+                self.files.record(file_path, file_stat)
             
             print(f"Result: {result.get('status', 'unknown')}")
             if result.get('transcriptLength'):
@@ -124,28 +163,28 @@ class PlaudSyncAgent:
             return {"error": "No directory specified"}
         
         print(f"Scanning directory: {dir_path}")
-        recordings = self._find_recordings(dir_path)
-        print(f"Found {len(recordings)} audio files")
         
         if force:
-            self.synced_ids = set()
+            self.synced_ids.clear()
         
-        # Filter to unsynced and recent
-        to_sync = []
-        cutoff = datetime.now() - timedelta(hours=LOOKBACK_HOURS * 24)  # Default to 24 days
+        # Filter to unsynced and recent while scanning, so only the newest
+        # MAX_ITEMS_PER_SYNC candidates are kept
+        cutoff = (datetime.now() - timedelta(hours=LOOKBACK_HOURS * 24)).timestamp()  # Default to 24 days
+        unchanged = 0
         
-        for recording in recordings:
-            external_id = self._generate_external_id(recording)
-            if external_id in self.synced_ids:
-                continue
-            
-            mtime = datetime.fromtimestamp(os.path.getmtime(recording))
-            if mtime < cutoff:
-                continue
-            
-            to_sync.append(recording)
-            if len(to_sync) >= MAX_ITEMS_PER_SYNC:
-                break
+        def needs_sync(recording: str, stat: os.stat_result) -> bool:
+            nonlocal unchanged
+            if not force and self.files.is_unchanged(recording, stat):
+                unchanged += 1
+                return False
+            if stat.st_mtime < cutoff:
+                return False
+            return self._generate_external_id(recording, stat) not in self.synced_ids
+        
+        to_sync = self._find_recordings(dir_path, include=needs_sync, newest=MAX_ITEMS_PER_SYNC)
+        
+        if unchanged:
+            print(f"Skipped {unchanged} already-synced recordings")
         
         if not to_sync:
             print("No new recordings to sync")
@@ -154,8 +193,8 @@ class PlaudSyncAgent:
         print(f"Syncing {len(to_sync)} recordings...")
         
         results = []
-        for recording in to_sync:
-            result = self.sync_file(recording)
+        for recording, stat in to_sync:
+            result = self.sync_file(recording, file_stat=stat)
             results.append({
                 "file": os.path.basename(recording),
                 "result": result
@@ -221,11 +260,10 @@ class PlaudSyncAgent:
             sync_type="incremental"
         )
         
-        for item_result in result.get('results', []):
-            if item_result.get('status') in ['created', 'skipped']:
-                self.synced_ids.add(item_result.get('id'))
-        
-        self._save_synced_ids()
+        self.synced_ids.update(
+            item_result.get('id') for item_result in result.get('results', [])
+            if item_result.get('status') in ['created', 'skipped']
+        )
         return result
 
 
@@ -0,0 +1,338 @@
+"""
+Ninja OS Sync State Store
+Shared SQLite-backed store for dedup IDs and per-agent sync state
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from config import SYNC_STATE_DB_PATH, FINGERPRINT_HASH_CONTENT
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS synced_ids (
+    source TEXT NOT NULL,
+    external_id TEXT NOT NULL,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (source, external_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS file_fingerprints (
+    namespace TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    content_hash TEXT,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY (namespace, path)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS outbox (
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    external_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    queued_at TEXT NOT NULL,
+    PRIMARY KEY (kind, source, external_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TEXT NOT NULL
+);
+"""
+
+
+class SyncStateStore:
+    """
+    Local state shared by all sync agents
+
+    One connection is shared across threads (sync_manager runs agents
+    concurrently), so every statement goes through a lock. WAL mode lets a
+    second process (e.g. a manual run alongside the daemon) read while
+    this one writes.
+    """
+
+    def __init__(self, db_path: str = SYNC_STATE_DB_PATH):
+        self.db_path = os.path.expanduser(db_path)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run several statements atomically"""
+        with self._lock:
+            try:
+                yield self.conn
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+    
+    def query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        """Run a read-only statement and return all rows"""
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    # ---- Dedup IDs ----
+
+    def has_synced(self, source: str, external_id: str) -> bool:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM synced_ids WHERE source = ? AND external_id = ?",
+                (source, external_id)
+            ).fetchone()
+        return row is not None
+
+    def mark_synced(self, source: str, external_ids: Iterable[str]):
+        """Record IDs as synced in a single transaction"""
+        now = datetime.now().isoformat()
+        rows = [(source, external_id, now) for external_id in external_ids if external_id]
+        if not rows:
+            return
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO synced_ids (source, external_id, synced_at) VALUES (?, ?, ?)",
+                rows
+            )
+
+    def clear_synced(self, source: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM synced_ids WHERE source = ?", (source,))
+
+    def count_synced(self, source: str) -> int:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM synced_ids WHERE source = ?", (source,)
+            ).fetchone()[0]
+
+    # ---- Key/value state (cursors, checkpoints) ----
+
+    def get_state(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM sync_state WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_state(self, namespace: str, key: str, value: Any):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), datetime.now().isoformat())
+            )
+
+    def delete_state(self, namespace: str, key: Optional[str] = None):
+        with self.transaction() as conn:
+            if key is None:
+                conn.execute("DELETE FROM sync_state WHERE namespace = ?", (namespace,))
+            else:
+                conn.execute(
+                    "DELETE FROM sync_state WHERE namespace = ? AND key = ?", (namespace, key)
+                )
+
+    # ---- File fingerprints ----
+
+    def get_fingerprint(self, namespace: str, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, inode, content_hash FROM file_fingerprints "
+                "WHERE namespace = ? AND path = ?",
+                (namespace, path)
+            ).fetchone()
+        if not row:
+            return None
+        return {"size": row[0], "mtime_ns": row[1], "inode": row[2], "content_hash": row[3]}
+
+    def set_fingerprint(self, namespace: str, path: str, fingerprint: Dict[str, Any]):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_fingerprints "
+                "(namespace, path, size, mtime_ns, inode, content_hash, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, path, fingerprint["size"], fingerprint["mtime_ns"], fingerprint["inode"],
+                 fingerprint.get("content_hash"), datetime.now().isoformat())
+            )
+
+    # ---- Migration ----
+
+    def migrate_json_ids(self, source: str, legacy_path: str):
+        """
+        One-time import of a legacy ~/.ninja_os_*_synced.json file
+
+        The file is renamed to *.migrated afterwards so it is kept as a
+        backup but never read again. If it can't be read or parsed, it is
+        left as it is and the migration is retried on the next start.
+        """
+        name = f"json_ids:{source}"
+        legacy_path = os.path.expanduser(legacy_path)
+
+        with self._lock:
+            applied = self.conn.execute(
+                "SELECT 1 FROM migrations WHERE name = ?", (name,)
+            ).fetchone()
+            if applied:
+                return
+
+            ids = []
+            if os.path.exists(legacy_path):
+                try:
+                    with open(legacy_path, 'r') as f:
+                        ids = json.load(f)
+                except (OSError, ValueError) as e:
+                    # Not marked as applied, so the next start tries again
+                    print(f"Could not read {legacy_path}, will retry the migration: {e}")
+                    return
+
+            now = datetime.now().isoformat()
+            with self.transaction() as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO synced_ids (source, external_id, synced_at) VALUES (?, ?, ?)",
+                    [(source, external_id, now) for external_id in ids if isinstance(external_id, str)]
+                )
+                conn.execute(
+                    "INSERT INTO migrations (name, applied_at) VALUES (?, ?)", (name, now)
+                )
+
+            if ids:
+                print(f"Migrated {len(ids)} synced IDs for {source} from {legacy_path}")
+                try:
+                    os.replace(legacy_path, legacy_path + ".migrated")
+                except OSError:
+                    pass
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class SyncedIdSet:
+    """
+    Set-like view over one source's synced IDs
+
+    Drop-in replacement for the in-memory set agents used to load from
+    JSON: membership is an indexed lookup and adds are committed
+    immediately, so there is nothing to save at the end of a run.
+    """
+
+    def __init__(self, source: str, legacy_file: Optional[str] = None,
+                 store: Optional["SyncStateStore"] = None):
+        self.source = source
+        self.store = store or get_state_store()
+        if legacy_file:
+            self.store.migrate_json_ids(source, legacy_file)
+
+    def __contains__(self, external_id: object) -> bool:
+        return isinstance(external_id, str) and self.store.has_synced(self.source, external_id)
+
+    def __len__(self) -> int:
+        return self.store.count_synced(self.source)
+
+    def add(self, external_id: str):
+        self.store.mark_synced(self.source, [external_id])
+
+    def update(self, external_ids: Iterable[str]):
+        self.store.mark_synced(self.source, external_ids)
+
+    def clear(self):
+        self.store.clear_synced(self.source)
+
+
+class FileChangeIndex:
+    """
+    Remembers which input files an agent has fully processed
+
+    A file is unchanged if its (size, mtime_ns, inode) match what was
+    recorded, which costs one stat and one indexed lookup. With
+    hash_content, a file whose stat changed but whose size didn't is
+    also hashed, so a touch or copy that keeps the bytes is still skipped.
+    """
+
+    def __init__(self, namespace: str, hash_content: bool = FINGERPRINT_HASH_CONTENT,
+                 store: Optional[SyncStateStore] = None):
+        self.namespace = namespace
+        self.hash_content = hash_content
+        self.store = store or get_state_store()
+
+    def _hash(self, path: str) -> str:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def fingerprint(self, path: str, stat: Optional[os.stat_result] = None) -> Dict[str, Any]:
+        stat = stat or os.stat(path)
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "inode": stat.st_ino,
+            "content_hash": self._hash(path) if self.hash_content else None,
+        }
+
+    def is_unchanged(self, path: str, stat: Optional[os.stat_result] = None) -> bool:
+        path = os.path.abspath(path)
+        recorded = self.store.get_fingerprint(self.namespace, path)
+        if not recorded:
+            return False
+
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return False
+
+        if (stat.st_size, stat.st_mtime_ns, stat.st_ino) == \
+                (recorded["size"], recorded["mtime_ns"], recorded["inode"]):
+            return True
+
+        if self.hash_content and recorded["content_hash"] and stat.st_size == recorded["size"]:
+            fingerprint = self.fingerprint(path, stat)
+            if fingerprint["content_hash"] == recorded["content_hash"]:
+                self.store.set_fingerprint(self.namespace, path, fingerprint)
+                return True
+
+        return False
+
+    def record(self, path: str, stat: Optional[os.stat_result] = None):
+        """Mark a file as fully processed in its current state"""
+        path = os.path.abspath(path)
+        try:
+            self.store.set_fingerprint(self.namespace, path, self.fingerprint(path, stat))
+        except OSError:
+            pass
+
+
+_store: Optional[SyncStateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> SyncStateStore:
+    """Return the process-wide state store, opening it on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SyncStateStore()
+        return _store
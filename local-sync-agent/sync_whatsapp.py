@@ -11,16 +11,232 @@ METHODS:
 This script primarily supports the chat export method.
 """
 
+import io
 import os
 import re
 import json
+import locale
 import hashlib
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from pathlib import Path
-from typing import List, Dict, Any, Optional
+from itertools import chain, islice
+from typing import IO, List, Dict, Any, Iterator, Optional, Set, Tuple
 
 from sync_client import NinjaOSSyncClient
-from config import NINJA_OS_URL, WHATSAPP_DATA_PATH, LOOKBACK_HOURS, MAX_ITEMS_PER_SYNC
+from sync_state import SyncedIdSet, FileChangeIndex
+from file_scanner import scan_files
+from conversation_threads import ConversationThreads
+from normalization import get_identifier_index
+from config import (
+    NINJA_OS_URL, WHATSAPP_DATA_PATH, LOOKBACK_HOURS, MAX_ITEMS_PER_SYNC,
+    WHATSAPP_DATE_ORDER, WHATSAPP_PARSE_WORKERS, PUSH_BATCH_MAX_ITEMS, CONVERSATION_APPEND_MODE,
+)
+
+
+# Message header line styles. Groups: date part 1, date part 2, year,
+# hour, minute, second, AM/PM, then "Sender: text" (or a system message).
+EXPORT_LINE_FORMATS = [
+    # Bracket format (iOS): [15/01/2024, 15:45:30] Name: Message
+    re.compile(
+        r'\[(\d{1,2})[/.\-](\d{1,2})[/.\-](\d{2,4}),? (\d{1,2})[:.](\d{2})(?:[:.](\d{2}))?'
+        r'\s*([AaPp]\.?\s?[Mm]\.?)?\] (.*)'
+    ),
+    # Dash format (Android): 1/15/24, 3:45 PM - Name: Message
+    re.compile(
+        r'(\d{1,2})[/.\-](\d{1,2})[/.\-](\d{2,4}),? (\d{1,2})[:.](\d{2})(?:[:.](\d{2}))?'
+        r'\s*([AaPp]\.?\s?[Mm]\.?)? - (.*)'
+    ),
+]
+FORMAT_DETECT_LINES = 20
+# Messages held back while waiting for a date that settles day/month order
+DATE_ORDER_DETECT_MESSAGES = 1000
+
+# iOS exports prefix some lines with invisible direction marks
+DIRECTION_MARKS = '\u200e\u200f'
+
+
+def _detect_line_format(head: List[str]) -> Optional["re.Pattern"]:
+    """Pick the header style that matches the most of an export's first lines"""
+    best, best_count = None, 0
+    for pattern in EXPORT_LINE_FORMATS:
+        count = sum(1 for line in head if pattern.match(line))
+        if count > best_count:
+            best, best_count = pattern, count
+    return best
+
+
+@lru_cache(maxsize=None)
+def _locale_day_first() -> Optional[bool]:
+    """Whether the system locale writes dates day first (None if it doesn't say)"""
+    try:
+        saved = locale.setlocale(locale.LC_TIME)
+        try:
+            # C / C.UTF-8 / POSIX mean no locale was chosen
+            name = locale.setlocale(locale.LC_TIME, "")
+            if name.split('.')[0] in ('C', 'POSIX'):
+                return None
+            date_format = locale.nl_langinfo(locale.D_FMT)
+        finally:
+            locale.setlocale(locale.LC_TIME, saved)
+    except (locale.Error, AttributeError, ValueError):
+        return None
+    day, month = date_format.find('%d'), date_format.find('%m')
+    if day < 0 or month < 0:
+        return None
+    return day < month
+
+
+def _resolve_day_first(max_first: int, max_second: int, uses_ampm: bool, name: str = "export") -> bool:
+    """
+    Decide whether dates are DD/MM or MM/DD
+    
+    Any component above 12 settles it. Otherwise WHATSAPP_DATE_ORDER
+    applies; under "auto" a warning is printed and the system locale's
+    date order is used, or if it has none, a guess from the clock:
+    12-hour exports are usually US (month first), 24-hour ones day first.
+    """
+    if max_first > 12:
+        return True
+    if max_second > 12:
+        return False
+    if WHATSAPP_DATE_ORDER in ('dmy', 'mdy'):
+        return WHATSAPP_DATE_ORDER == 'dmy'
+    
+    day_first = _locale_day_first()
+    reason = "the system locale"
+    if day_first is None:
+        day_first = not uses_ampm
+        reason = "its 12-hour clock" if uses_ampm else "its 24-hour clock"
+    if max_first:
+        print(f"Warning: can't tell whether dates in {name} are day or month first; "
+              f"assuming {'DD/MM' if day_first else 'MM/DD'} from {reason} "
+              f"(set WHATSAPP_DATE_ORDER to 'dmy' or 'mdy' to choose)")
+    return day_first
+
+
+def _export_lines(f: IO[str]) -> Iterator[str]:
+    return (line.rstrip('\r\n').lstrip(DIRECTION_MARKS) for line in f)
+
+
+def _raw_export_messages(pattern: "re.Pattern", lines: Iterator[str]) -> Iterator[Tuple]:
+    """
+    Yield (first, second, year, hour, minute, sec, ampm, sender, text) per message
+    
+    Lines that don't start a new message continue the previous one;
+    system messages ("Messages are end-to-end encrypted", ...) are dropped.
+    """
+    header = None
+    parts: List[str] = []
+    for line in lines:
+        match = pattern.match(line)
+        if not match:
+            # Multi-line message continuation
+            if header is not None:
+                parts.append(line)
+            continue
+        
+        if header is not None:
+            yield header + ("\n".join(parts).strip(),)
+        
+        first, second, year, hour, minute, sec, ampm, rest = match.groups()
+        sender, sep, text = rest.partition(': ')
+        if not sep:
+            header = None
+            continue
+        
+        header = (int(first), int(second), int(year), int(hour), int(minute), int(sec or 0),
+                  ampm, sender.strip())
+        parts = [text]
+    
+    if header is not None:
+        yield header + ("\n".join(parts).strip(),)
+
+
+def _dated_message(raw: Tuple, day_first: bool) -> Optional[Dict[str, Any]]:
+    """A raw message as {date, sender, text}, or None for media and impossible dates"""
+    first, second, year, hour, minute, sec, ampm, sender, text = raw
+    
+    # Skip media messages
+    if '<Media omitted>' in text or 'image omitted' in text.lower():
+        return None
+    
+    month, day = (second, first) if day_first else (first, second)
+    if year < 100:
+        year += 2000
+    if ampm:
+        hour = hour % 12 + (12 if ampm[0] in 'Pp' else 0)
+    
+    try:
+        parsed_date = datetime(year, month, day, hour, minute, sec)
+    except ValueError:
+        return None
+    return {"date": parsed_date, "sender": sender, "text": text}
+
+
+def _iter_export_messages(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield an export's messages ({date, sender, text}) in file order, in one pass
+    
+    The line style is detected from the first lines. Day/month order is
+    settled by the first date with a component above 12; messages before
+    it are held back, up to DATE_ORDER_DETECT_MESSAGES of them, after which
+    _resolve_day_first decides from what it has seen. A later date that
+    contradicts that guess can't be placed, and is reported and skipped.
+    """
+    name = os.path.basename(file_path)
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        lines = _export_lines(f)
+        head = list(islice(lines, FORMAT_DETECT_LINES))
+        pattern = _detect_line_format(head)
+        if pattern is None:
+            return
+        
+        day_first: Optional[bool] = None
+        guessed = False
+        held: List[Tuple] = []
+        max_first = max_second = 0
+        uses_ampm = False
+        
+        for raw in _raw_export_messages(pattern, chain(head, lines)):
+            if day_first is None:
+                max_first = max(max_first, raw[0])
+                max_second = max(max_second, raw[1])
+                uses_ampm = uses_ampm or bool(raw[6])
+                held.append(raw)
+                if max_first <= 12 and max_second <= 12 and len(held) < DATE_ORDER_DETECT_MESSAGES:
+                    continue
+                guessed = max_first <= 12 and max_second <= 12
+                day_first = _resolve_day_first(max_first, max_second, uses_ampm, name)
+                for held_raw in held:
+                    message = _dated_message(held_raw, day_first)
+                    if message:
+                        yield message
+                held = []
+                continue
+            
+            if guessed and raw[1 if day_first else 0] > 12:
+                print(f"Warning: a date in {name} contradicts the assumed "
+                      f"{'DD/MM' if day_first else 'MM/DD'} order; skipping it")
+                guessed = False
+            message = _dated_message(raw, day_first)
+            if message:
+                yield message
+        
+        if held:
+            day_first = _resolve_day_first(max_first, max_second, uses_ampm, name)
+            for held_raw in held:
+                message = _dated_message(held_raw, day_first)
+                if message:
+                    yield message
+
+
+def _parse_export_worker(file_path: str) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    """Process pool entry point: parse one export, returning errors instead of raising"""
+    try:
+        return file_path, WhatsAppSyncAgent._parse_export_file(file_path), None
+    except Exception as e:
+        return file_path, None, f"Failed to parse export: {e}"
 
 
 class WhatsAppSyncAgent:
@@ -29,97 +245,70 @@ class WhatsAppSyncAgent:
     def __init__(self, ninja_url: str, data_path: Optional[str] = None):
         self.client = NinjaOSSyncClient(ninja_url)
         self.data_path = os.path.expanduser(data_path) if data_path else None
-        self.synced_ids_file = os.path.expanduser("~/.ninja_os_whatsapp_synced.json")
-        self.synced_ids = self._load_synced_ids()
-    
-    def _load_synced_ids(self) -> set:
-        if os.path.exists(self.synced_ids_file):
-            try:
-                with open(self.synced_ids_file, 'r') as f:
-                    return set(json.load(f))
-            except:
-                pass
-        return set()
+        self.synced_ids = SyncedIdSet("whatsapp", legacy_file="~/.ninja_os_whatsapp_synced.json")
+        self.files = FileChangeIndex("whatsapp")
+        self.threads = ConversationThreads("whatsapp")
+        self.append_mode = CONVERSATION_APPEND_MODE
+        # Senders without a saved contact name appear as numbers; send them as phones
+        self.identifiers = get_identifier_index()
     
-    def _save_synced_ids(self):
-        with open(self.synced_ids_file, 'w') as f:
-            json.dump(list(self.synced_ids), f)
-    
-    def _parse_export_file(self, file_path: str) -> Dict[str, Any]:
+    @staticmethod
+    def _parse_export_file(file_path: str) -> Dict[str, Any]:
         """
         Parse WhatsApp chat export file (.txt)
         
         Format: "MM/DD/YY, HH:MM - Contact Name: Message"
         or: "[DD/MM/YYYY, HH:MM:SS] Contact Name: Message"
-        """
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
         
+        The file is read once, line by line, and its messages are
+        written straight into the chat's transcript in file order (the
+        order WhatsApp exported them in); see _iter_export_messages for how
+        day- and month-first dates are told apart.
+        """
         # Try to extract chat name from filename
         filename = os.path.basename(file_path)
         chat_name = filename.replace("WhatsApp Chat with ", "").replace(".txt", "").replace("_", " ")
         
-        # Parse messages with various date formats
-        patterns = [
-            # US format: 1/15/24, 3:45 PM - Name: Message
-            r'(\d{1,2}/\d{1,2}/\d{2,4}, \d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?) - ([^:]+): (.+?)(?=\n\d{1,2}/\d{1,2}/|\Z)',
-            # EU format: 15/01/2024, 15:45 - Name: Message  
-            r'(\d{1,2}/\d{1,2}/\d{2,4}, \d{1,2}:\d{2}(?::\d{2})?) - ([^:]+): (.+?)(?=\n\d{1,2}/\d{1,2}/|\Z)',
-            # Bracket format: [15/01/2024, 15:45:30] Name: Message
-            r'\[(\d{1,2}/\d{1,2}/\d{2,4}, \d{1,2}:\d{2}(?::\d{2})?)\] ([^:]+): (.+?)(?=\n\[|\Z)',
-        ]
-        
-        messages = []
+        transcript = io.StringIO()
+        participants = set()
         latest_date = None
+        message_count = 0
         
-        for pattern in patterns:
-            matches = re.findall(pattern, content, re.DOTALL)
-            if matches:
-                for match in matches:
-                    date_str, sender, text = match
-                    text = text.strip()
-                    
-                    # Skip media messages
-                    if '<Media omitted>' in text or 'image omitted' in text.lower():
-                        continue
-                    
-                    # Parse date
-                    parsed_date = None
-                    for fmt in [
-                        '%m/%d/%y, %I:%M %p',
-                        '%m/%d/%Y, %I:%M %p',
-                        '%d/%m/%y, %H:%M',
-                        '%d/%m/%Y, %H:%M',
-                        '%d/%m/%Y, %H:%M:%S',
-                    ]:
-                        try:
-                            parsed_date = datetime.strptime(date_str.strip(), fmt)
-                            break
-                        except ValueError:
-                            continue
-                    
-                    if parsed_date:
-                        messages.append({
-                            "date": parsed_date,
-                            "sender": sender.strip(),
-                            "text": text,
-                        })
-                        if not latest_date or parsed_date > latest_date:
-                            latest_date = parsed_date
-                break
-        
-        # Extract participant names (everyone except "You")
-        participants = set()
-        for msg in messages:
+        for msg in _iter_export_messages(file_path):
+            if not latest_date or msg['date'] > latest_date:
+                latest_date = msg['date']
+            
+            # Participant names are everyone except "You"
             if msg['sender'].lower() not in ['you', 'me']:
                 participants.add(msg['sender'])
+            
+            if message_count:
+                transcript.write("\n")
+            transcript.write(f"[{msg['date'].strftime('%H:%M')}] {msg['sender']}: {msg['text']}")
+            message_count += 1
         
         return {
             "chatName": chat_name,
             "participants": list(participants),
-            "messages": messages,
+            "transcript": transcript.getvalue(),
             "latestDate": latest_date,
-            "messageCount": len(messages),
+            "messageCount": message_count,
+        }
+    
+    def _build_export_item(self, chat_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn a parsed export into a sync item"""
+        # Generate external ID
+        external_id = hashlib.md5(
+            f"whatsapp_{chat_data['chatName']}_{chat_data['latestDate']}".encode()
+        ).hexdigest()
+        
+        return {
+            "externalId": external_id,
+            "type": "text",
+            "title": f"WhatsApp: {chat_data['chatName']}",
+            "transcript": chat_data['transcript'],
+            "timestamp": chat_data['latestDate'].isoformat() if chat_data['latestDate'] else datetime.now().isoformat(),
+            "participants": [self.identifiers.participant(p) for p in chat_data['participants']],
         }
     
     def sync_export(self, file_path: str, force: bool = False) -> Dict[str, Any]:
@@ -130,42 +319,26 @@ class WhatsAppSyncAgent:
         
         print(f"Parsing WhatsApp export: {file_path}")
         
+        # Stat before parsing so a write during the sync is seen next time
+        file_stat = os.stat(file_path)
+        
         try:
             chat_data = self._parse_export_file(file_path)
         except Exception as e:
             return {"error": f"Failed to parse export: {e}"}
         
-        if not chat_data['messages']:
+        if not chat_data['messageCount']:
             return {"error": "No messages found in export"}
         
         print(f"Found {chat_data['messageCount']} messages with {len(chat_data['participants'])} participants")
         
-        # Generate external ID
-        external_id = hashlib.md5(
-            f"whatsapp_{chat_data['chatName']}_{chat_data['latestDate']}".encode()
-        ).hexdigest()
+        item = self._build_export_item(chat_data)
+        external_id = item['externalId']
         
         if external_id in self.synced_ids and not force:
+            self.files.record(file_path, file_stat)
             return {"status": "skipped", "message": "Already synced"}
         
-        # Build transcript
-        transcript_lines = []
-        for msg in sorted(chat_data['messages'], key=lambda m: m['date']):
-            timestamp = msg['date'].strftime("%H:%M")
-            transcript_lines.append(f"[{timestamp}] {msg['sender']}: {msg['text']}")
-        
-        transcript = "\n".join(transcript_lines)
-        
-        # Prepare item
-        item = {
-            "externalId": external_id,
-            "type": "text",
-            "title": f"WhatsApp: {chat_data['chatName']}",
-            "transcript": transcript,
-            "timestamp": chat_data['latestDate'].isoformat() if chat_data['latestDate'] else datetime.now().isoformat(),
-            "participants": [{"name": p} for p in chat_data['participants']],
-        }
-        
         print("Syncing to Ninja OS...")
         
         try:
@@ -177,50 +350,137 @@ class WhatsAppSyncAgent:
             
             if result.get('processed', 0) > 0:
                 self.synced_ids.add(external_id)
-                self._save_synced_ids()
+                self.files.record(file_path, file_stat)
             
             return result
         except Exception as e:
             return {"error": str(e)}
     
-    def sync_directory(self, directory: str, force: bool = False) -> Dict[str, Any]:
-        """Sync all WhatsApp exports in a directory"""
+    def _parse_exports(self, files: List[str], workers: int) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+        """
+        Parse exports, yielding (path, chat_data, error) as each finishes
         
-        path = Path(directory)
-        if not path.exists():
+        With more than one worker, files are parsed in a process pool and
+        yielded in completion order so pushing overlaps with parsing.
+        """
+        if workers <= 1 or len(files) <= 1:
+            for file_path in files:
+                yield _parse_export_worker(file_path)
+            return
+        
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            futures = {pool.submit(_parse_export_worker, file_path): file_path for file_path in files}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    # Worker process died (e.g. BrokenProcessPool)
+                    yield futures[future], None, f"Failed to parse export: {e}"
+    
+    def _push_exports(self, pending: List[Tuple[str, os.stat_result, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """Push a batch of export items in one request, returning a result per file"""
+        try:
+            result = self.client.push_items(
+                source="whatsapp",
+                items=[item for _, _, item in pending],
+                sync_type="incremental"
+            )
+        except Exception as e:
+            return {file_path: {"error": str(e)} for file_path, _, _ in pending}
+        
+        item_results = {r.get('id'): r for r in result.get('results', [])}
+        file_results = {}
+        for file_path, file_stat, item in pending:
+            item_result = item_results.get(item['externalId'], {})
+            status = item_result.get('status')
+            if status in ['created', 'skipped']:
+                self.synced_ids.add(item['externalId'])
+                self.files.record(file_path, file_stat)
+                file_results[file_path] = {"status": status, "processed": 1}
+            else:
+                file_results[file_path] = {"error": item_result.get('error', 'Push failed')}
+        return file_results
+    
+    def sync_directory(self, directory: str, force: bool = False,
+                       workers: int = WHATSAPP_PARSE_WORKERS) -> Dict[str, Any]:
+        """
+        Sync all WhatsApp exports in a directory
+        
+        Exports are parsed in parallel (workers=0 means one process per
+        core) and pushed in shared batches rather than one request per
+        file. A file that fails to parse or push is reported in results
+        without stopping the rest.
+        """
+        
+        if not os.path.isdir(directory):
             return {"error": f"Directory not found: {directory}"}
         
-        exports = list(path.glob("*.txt")) + list(path.glob("**/*.txt"))
-        print(f"Found {len(exports)} text files in {directory}")
+        unchanged = 0
+        
+        # Skip files that haven't changed since they were last processed
+        def changed(file_path: str, file_stat: os.stat_result) -> bool:
+            nonlocal unchanged
+            if not force and self.files.is_unchanged(file_path, file_stat):
+                unchanged += 1
+                return False
+            return True
+        
+        exports = scan_files(directory, {'.txt'}, include=changed, newest=MAX_ITEMS_PER_SYNC)
+        print(f"Found {len(exports) + unchanged} text files in {directory}")
+        
+        if unchanged:
+            print(f"Skipped {unchanged} unchanged files")
         
-        results = []
-        synced = 0
-        failed = 0
+        # The scan's stat is taken before parsing, so a write during the
+        # sync is seen next time
+        file_stats = {}
         
-        for export_file in exports[:MAX_ITEMS_PER_SYNC]:
+        for export_file, file_stat in exports:
             # Check if it looks like a WhatsApp export
             try:
                 with open(export_file, 'r', encoding='utf-8') as f:
                     first_line = f.readline()
                     if not any(pattern in first_line for pattern in ['- ', '] ', ':']):
+                        self.files.record(export_file, file_stat)
                         continue
             except:
                 continue
             
-            result = self.sync_export(str(export_file), force=force)
-            results.append({
-                "file": str(export_file),
-                "result": result
-            })
+            file_stats[export_file] = file_stat
+        
+        workers = workers or os.cpu_count() or 1
+        file_results: Dict[str, Dict[str, Any]] = {}
+        pending: List[Tuple[str, os.stat_result, Dict[str, Any]]] = []
+        
+        for file_path, chat_data, error in self._parse_exports(list(file_stats), workers):
+            if error:
+                file_results[file_path] = {"error": error}
+                continue
+            if not chat_data['messageCount']:
+                file_results[file_path] = {"error": "No messages found in export"}
+                continue
+            
+            item = self._build_export_item(chat_data)
+            if item['externalId'] in self.synced_ids and not force:
+                self.files.record(file_path, file_stats[file_path])
+                file_results[file_path] = {"status": "skipped", "message": "Already synced"}
+                continue
             
-            if result.get('processed', 0) > 0 or result.get('status') == 'skipped':
-                synced += 1
-            elif 'error' in result:
-                failed += 1
+            pending.append((file_path, file_stats[file_path], item))
+            if len(pending) >= PUSH_BATCH_MAX_ITEMS:
+                file_results.update(self._push_exports(pending))
+                pending = []
+        
+        if pending:
+            file_results.update(self._push_exports(pending))
+        
+        results = [{"file": file_path, "result": result} for file_path, result in file_results.items()]
+        failed = sum(1 for r in results if 'error' in r['result'])
         
         return {
-            "synced": synced,
+            "synced": len(results) - failed,
             "failed": failed,
+            "unchanged": unchanged,
             "total": len(results),
             "results": results
         }
@@ -242,6 +502,10 @@ class WhatsAppSyncAgent:
                 }
             ]
         }
+        
+        In append mode (CONVERSATION_APPEND_MODE) each chat is one
+        interaction per day and only messages not yet synced are sent, so
+        the bridge can pass overlapping windows.
         """
         messages = bridge_data.get('messages', [])
         
@@ -256,6 +520,9 @@ class WhatsAppSyncAgent:
                 chats[chat_id] = []
             chats[chat_id].append(msg)
         
+        if self.append_mode:
+            return self._sync_bridge_deltas(chats)
+        
         items = []
         for chat_id, chat_messages in chats.items():
             # Sort by timestamp
@@ -291,7 +558,7 @@ class WhatsAppSyncAgent:
                 "title": f"WhatsApp: {chat_name or chat_id}",
                 "transcript": "\n".join(transcript_lines),
                 "timestamp": datetime.fromtimestamp(latest).isoformat(),
-                "participants": [{"name": p} for p in participants],
+                "participants": [self.identifiers.participant(p) for p in participants],
             })
         
         if not items:
@@ -303,12 +570,77 @@ class WhatsAppSyncAgent:
             sync_type="incremental"
         )
         
-        for item_result in result.get('results', []):
-            if item_result.get('status') in ['created', 'skipped']:
-                self.synced_ids.add(item_result.get('id'))
-        
-        self._save_synced_ids()
+        self.synced_ids.update(
+            item_result.get('id') for item_result in result.get('results', [])
+            if item_result.get('status') in ['created', 'skipped']
+        )
         return result
+    
+    def _sync_bridge_deltas(self, chats: Dict[str, List[Dict]]) -> Dict[str, Any]:
+        """Push each chat's unsynced messages as appends to its per-day interaction"""
+        items, sent = self._build_bridge_deltas(chats)
+        if not items:
+            return {"synced": 0, "message": "No new messages"}
+        
+        return self.threads.push(
+            self.client, items, sent,
+            rebuild=lambda ids: self._build_bridge_deltas(chats, only=ids)
+        )
+    
+    def _build_bridge_deltas(
+        self,
+        chats: Dict[str, List[Dict]],
+        only: Optional[Set[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+        """Append items for the unsynced messages of each chat-day (only those in only, if given)"""
+        items = []
+        sent = {}
+        
+        for chat_id, chat_messages in chats.items():
+            days: Dict[Any, List[Dict[str, Any]]] = {}
+            for msg in chat_messages:
+                timestamp = msg.get('timestamp', 0)
+                days.setdefault(datetime.fromtimestamp(timestamp).date(), []).append({
+                    "id": msg.get('id') or f"{timestamp}_{msg.get('sender')}",
+                    "date": timestamp,
+                    "message": msg,
+                })
+            
+            for day, day_messages in days.items():
+                external_id = self.threads.thread_id(chat_id, day)
+                if only is not None and external_id not in only:
+                    continue
+                fresh, append_after = self.threads.pending(external_id, day_messages)
+                if not fresh:
+                    continue
+                
+                transcript_lines = []
+                participants = set()
+                chat_name = None
+                
+                for entry in fresh:
+                    msg = entry['message']
+                    sender = msg.get('sender', 'Unknown')
+                    if sender.lower() not in ['me', 'you']:
+                        participants.add(sender)
+                        if not chat_name:
+                            chat_name = msg.get('chatName', sender)
+                    
+                    ts = datetime.fromtimestamp(entry['date']).strftime("%H:%M")
+                    transcript_lines.append(f"[{ts}] {sender}: {msg.get('text', '')}")
+                
+                items.append({
+                    "externalId": external_id,
+                    **self.threads.delta_fields(fresh, append_after),
+                    "type": "text",
+                    "title": f"WhatsApp: {chat_name or chat_id}",
+                    "transcript": "\n".join(transcript_lines),
+                    "timestamp": datetime.fromtimestamp(fresh[-1]['date']).isoformat(),
+                    "participants": [self.identifiers.participant(p) for p in participants],
+                })
+                sent[external_id] = [{"id": e['id'], "date": e['date']} for e in fresh]
+        
+        return items, sent
 
 
 def main():
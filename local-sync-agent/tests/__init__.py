@@ -0,0 +1,6 @@
+"""Tests for the sync agents. Their state files go to a temporary HOME, not the user's."""
+
+import os
+import tempfile
+
+os.environ["HOME"] = tempfile.mkdtemp(prefix="ninja_os_tests_")
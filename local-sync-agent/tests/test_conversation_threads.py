@@ -0,0 +1,146 @@
+"""
+Append cursors of conversation_threads.ConversationThreads
+
+chat.db dates are nanoseconds since 2001 (19 digits), past the 2**53 a
+JavaScript number holds exactly, so they must survive the server's JSON
+handling as strings.
+
+Run from local-sync-agent/ with: python -m pytest tests
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import unittest
+from typing import Dict, List, Optional, Set
+
+from conversation_threads import ConversationThreads
+from local_server import LocalSyncServer
+from sync_client import NinjaOSSyncClient
+from sync_state import SyncStateStore
+
+# Messages one nanosecond apart: all of them round to the same double
+DATE = 788918400123456789
+THREAD = "thread-day"
+ROUTES_TS = os.path.join(os.path.dirname(__file__), "..", "..", "server", "routes.ts")
+
+# How POST /api/sync/push builds an interaction's appendCursor from an item
+CURSOR_EXPRESSION = re.compile(
+    r'appendCursor: item\.mode === "append" && item\.lastMessageId\s*\?\s*(\{ id: item\.lastMessageId, date: .*? \})'
+)
+
+
+def make_messages(count: int) -> List[Dict]:
+    return [{"id": f"m{i}", "date": DATE + i, "text": f"message {i}"} for i in range(1, count + 1)]
+
+
+def route_cursor(item: Dict) -> Optional[Dict]:
+    """
+    The appendCursor server/routes.ts stores for an item
+
+    The item goes through JSON.parse as express.json does, and the
+    cursor is built with the route's own expression.
+    """
+    with open(ROUTES_TS, encoding="utf-8") as f:
+        match = CURSOR_EXPRESSION.search(f.read())
+    if match is None:
+        raise AssertionError("appendCursor expression not found in server/routes.ts")
+    script = (
+        "const item = JSON.parse(require('fs').readFileSync(0, 'utf8'));\n"
+        f"process.stdout.write(JSON.stringify({match.group(1)}));\n"
+    )
+    output = subprocess.run(
+        ["node", "-e", script], input=json.dumps(item), capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+class ThreadsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.store = SyncStateStore(os.path.join(self.tmp, "state.db"))
+        self.threads = ConversationThreads("imessage", self.store)
+        self.messages = make_messages(5)
+
+    def tearDown(self):
+        self.store.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+@unittest.skipUnless(shutil.which("node"), "node is not installed")
+class RouteRoundTripTest(ThreadsTestCase):
+    def test_cursor_date_survives_the_route(self):
+        item = self.threads.delta_fields(self.messages[:3], None)
+
+        cursor = route_cursor(item)
+
+        self.assertEqual(cursor, {"id": "m3", "date": str(DATE + 3)})
+
+    def test_adopted_cursor_resends_exactly_the_missing_messages(self):
+        cursor = route_cursor(self.threads.delta_fields(self.messages[:3], None))
+        later = self.messages[3:]
+
+        self.threads.adopt(THREAD, cursor, later)
+        fresh, append_after = self.threads.pending(THREAD, later)
+
+        self.assertEqual([m["id"] for m in fresh], ["m4", "m5"])
+        self.assertEqual(append_after, "m3")
+
+    def test_numeric_dates_would_lose_precision(self):
+        item = dict(self.threads.delta_fields(self.messages[:3], None), lastMessageDate=DATE + 3)
+
+        cursor = route_cursor(item)
+
+        self.assertNotEqual(int(cursor["date"]), DATE + 3)
+
+
+class CursorLineUpTest(ThreadsTestCase):
+    def test_pending_lines_up_on_the_cursor_message(self):
+        # A cursor stored before dates were sent as strings, already rounded
+        self.threads.adopt(THREAD, {"id": "m3", "date": str(int(float(DATE + 3)))}, self.messages)
+
+        fresh, append_after = self.threads.pending(THREAD, self.messages)
+
+        self.assertEqual([m["id"] for m in fresh], ["m4", "m5"])
+        self.assertEqual(append_after, "m3")
+
+
+class LocalServerConflictTest(ThreadsTestCase):
+    def build(self, messages: List[Dict], only: Optional[Set[str]] = None):
+        if only is not None and THREAD not in only:
+            return [], {}
+        fresh, append_after = self.threads.pending(THREAD, messages)
+        if not fresh:
+            return [], {}
+        item = {
+            "externalId": THREAD,
+            **self.threads.delta_fields(fresh, append_after),
+            "type": "text",
+            "transcript": "\n".join(m["text"] for m in fresh),
+        }
+        return [item], {THREAD: fresh}
+
+    def push(self, client: NinjaOSSyncClient, messages: List[Dict]):
+        items, sent = self.build(messages)
+        return self.threads.push(client, items, sent, rebuild=lambda ids: self.build(messages, only=ids))
+
+    def test_conflict_resend_neither_repeats_nor_drops_messages(self):
+        with LocalSyncServer() as server:
+            client = NinjaOSSyncClient(server.url, max_retries=0, use_outbox=False, resolve_people=False)
+            self.push(client, self.messages[:3])
+            # The client lost track of m3 (e.g. its state was restored from a backup)
+            self.threads.reset()
+            self.threads.mark_sent(THREAD, self.messages[:2])
+
+            result = self.push(client, self.messages[3:])
+
+            transcript = server.interactions[THREAD]["transcript"]
+        self.assertEqual(result["results"][0]["status"], "appended")
+        self.assertEqual(transcript.splitlines(), [f"message {i}" for i in range(1, 6)])
+
+
+if __name__ == "__main__":
+    unittest.main()
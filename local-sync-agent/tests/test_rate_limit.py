@@ -0,0 +1,156 @@
+"""
+Throttling behaviour of rate_limit.RateLimiter and send_with_retries
+
+Run from local-sync-agent/ with: python -m pytest tests
+"""
+
+import threading
+import time
+import unittest
+from typing import List, Optional
+
+import requests
+
+from local_server import LocalSyncServer
+from rate_limit import RateLimiter, send_with_retries
+
+RETRY_AFTER = 0.3
+
+
+def make_response(status: int, headers: Optional[dict] = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return response
+
+
+class FakeSession:
+    """Answers with the given statuses in turn (200 once they run out), recording each call"""
+
+    def __init__(self, limiter: RateLimiter, statuses: List[int]):
+        self.limiter = limiter
+        self.statuses = list(statuses)
+        self.calls: List[float] = []
+        self.rates: List[float] = []
+        self.lock = threading.Lock()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        with self.lock:
+            self.calls.append(time.monotonic())
+            self.rates.append(self.limiter.rate)
+            status = self.statuses.pop(0) if self.statuses else 200
+        if status == 429:
+            return make_response(429, {"Retry-After": str(RETRY_AFTER)})
+        return make_response(status)
+
+
+class RateLimiterThrottlingTest(unittest.TestCase):
+    def setUp(self):
+        self.limiter = RateLimiter("test", rate=100.0, burst=10, max_concurrency=4)
+
+    def send(self, session: FakeSession) -> requests.Response:
+        return send_with_retries(session, "GET", "http://ninja.test/api", self.limiter, max_retries=2)
+
+    def test_retry_waits_for_retry_after(self):
+        session = FakeSession(self.limiter, [429])
+
+        response = self.send(session)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(session.calls), 2)
+        self.assertGreaterEqual(session.calls[1] - session.calls[0], RETRY_AFTER)
+
+    def test_429_slows_the_limiter(self):
+        session = FakeSession(self.limiter, [429])
+
+        self.send(session)
+
+        self.assertEqual(session.rates, [100.0, 50.0])
+        self.assertEqual(self.limiter.concurrency, 2)
+
+    def test_pause_holds_back_other_requests(self):
+        self.limiter.acquire()
+        self.limiter.release(make_response(429, {"Retry-After": str(RETRY_AFTER)}))
+
+        started = time.monotonic()
+        self.limiter.acquire()
+        waited = time.monotonic() - started
+        self.limiter.release(make_response(200))
+
+        self.assertGreaterEqual(waited, RETRY_AFTER * 0.9)
+
+    def test_recovers_after_successes(self):
+        self.send(FakeSession(self.limiter, [429]))
+        self.assertLess(self.limiter.rate, self.limiter.configured_rate)
+
+        session = FakeSession(self.limiter, [])
+        for _ in range(30):
+            self.send(session)
+
+        self.assertEqual(self.limiter.rate, self.limiter.configured_rate)
+        self.assertEqual(self.limiter.concurrency, self.limiter.max_concurrency)
+        self.assertEqual(len(session.calls), 30)
+
+    def test_concurrency_limit_is_enforced(self):
+        self.limiter = RateLimiter("test", rate=0.0, max_concurrency=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        class SlowSession(FakeSession):
+            def request(self, method, url, **kwargs):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.pop()
+                return make_response(200)
+
+        session = SlowSession(self.limiter, [])
+        threads = [threading.Thread(target=self.send, args=(session,)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(max(peak), 2)
+
+
+class LocalServerThrottlingTest(unittest.TestCase):
+    """The same behaviour against local_server's injected 429s"""
+
+    def setUp(self):
+        self.limiter = RateLimiter("test", rate=100.0, burst=10, max_concurrency=4)
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+
+    def send(self, server: LocalSyncServer, max_retries: int) -> requests.Response:
+        return send_with_retries(
+            self.session, "GET", f"{server.url}/api/sync/logs", self.limiter, max_retries=max_retries
+        )
+
+    def test_retry_waits_for_the_servers_retry_after(self):
+        with LocalSyncServer(error_rate=1.0, error_status=429, retry_after=RETRY_AFTER) as server:
+            started = time.monotonic()
+            response = self.send(server, max_retries=1)
+            elapsed = time.monotonic() - started
+            requests_seen = server.stats()["requests"]
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(requests_seen, 2)
+        self.assertGreaterEqual(elapsed, RETRY_AFTER)
+        self.assertEqual(self.limiter.rate, 25.0)
+        self.assertEqual(self.limiter.concurrency, 1)
+
+    def test_retry_after_zero_doesnt_pause(self):
+        with LocalSyncServer(error_rate=1.0, error_status=429, retry_after=0) as server:
+            self.send(server, max_retries=0)
+
+        self.assertLessEqual(self.limiter.paused_until, time.monotonic())
+
+
+if __name__ == "__main__":
+    unittest.main()
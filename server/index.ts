@@ -58,6 +58,9 @@ app.post(
 app.use(
   express.json({
     limit: '50mb',
+    // Accept Content-Encoding: gzip/deflate bodies (local sync agents gzip
+    // their /api/sync/push and /api/sync/transcribe payloads)
+    inflate: true,
     verify: (req, _res, buf) => {
       req.rawBody = buf;
     },
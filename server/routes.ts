@@ -46,6 +46,8 @@ import { fromZodError } from "zod-validation-error";
 import multer from "multer";
 import path from "path";
 import fs from "fs";
+import { Transform } from "stream";
+import { pipeline } from "stream/promises";
 import OpenAI from "openai";
 import * as googleCalendar from "./google-calendar";
 import { logIssueToSheet } from "./google-sheets";
@@ -6260,6 +6262,9 @@ Return ONLY valid JSON, no explanations.`
 
   // ============ SYNC API ROUTES ============
   // API endpoints for local sync agents (Granola, Plaud, iMessage, WhatsApp)
+  // Request bodies may arrive gzip-compressed; express.json() inflates them
+  // before these handlers run and answers 415 for encodings it can't decode,
+  // which tells the agent to fall back to uncompressed bodies.
   
   // Get sync status and logs
   app.get("/api/sync/logs", async (req, res) => {
@@ -6300,7 +6305,7 @@ Return ONLY valid JSON, no explanations.`
       
       let processed = 0;
       let failed = 0;
-      const results: { id: string; status: string; personId?: string; interactionId?: string; error?: string }[] = [];
+      const results: { id: string; status: string; personId?: string; interactionId?: string; appendCursor?: unknown; error?: string }[] = [];
       
       for (const item of items) {
         try {
@@ -6313,20 +6318,74 @@ Return ONLY valid JSON, no explanations.`
             continue;
           }
           
+          const ctx = getTenantContext(req);
+          
           // Check if this interaction already exists (deduplication)
           const existing = await storage.getInteractionByExternalId(externalId);
+          if (existing && item.mode === "append" && transcript) {
+            // Append-only conversation sync: the item carries the messages
+            // after appendAfter (the last message the agent believes is
+            // stored), ending at lastMessageId. The interaction remembers
+            // the last message applied (appendCursor): a retried delta that
+            // ends there changes nothing, and a delta that doesn't start
+            // there is a conflict, which the agent resends from the cursor
+            // returned with it. The transcript is only replaced when the
+            // agent asks for a rewrite. The cursor date is kept as a string:
+            // chat.db dates are past Number.MAX_SAFE_INTEGER.
+            const cursor = existing.appendCursor as { id: string; date: unknown } | null;
+            const previous = existing.transcript || "";
+            let updated: string;
+            if (item.rewrite) {
+              updated = transcript;
+            } else if (cursor && item.lastMessageId && item.lastMessageId === cursor.id) {
+              results.push({ id: externalId, status: "appended", interactionId: existing.id });
+              processed++;
+              continue;
+            } else if (cursor && item.appendAfter === cursor.id) {
+              updated = previous ? `${previous}\n${transcript}` : transcript;
+            } else if (!cursor && item.appendAfter && previous) {
+              // Stored before cursors were kept: fall back to the text check
+              updated = previous.endsWith(transcript) ? previous : `${previous}\n${transcript}`;
+            } else {
+              results.push({
+                id: externalId,
+                status: "conflict",
+                interactionId: existing.id,
+                appendCursor: cursor,
+                error: "appendAfter is not the last stored message",
+              });
+              failed++;
+              continue;
+            }
+            
+            const names = participants?.map((p: any) => p.name || p.phone || p.email).filter(Boolean) || [];
+            const occurredAt = timestamp ? new Date(timestamp) : existing.occurredAt;
+            await storage.updateInteraction(existing.id, {
+              transcript: updated,
+              occurredAt: occurredAt > existing.occurredAt ? occurredAt : existing.occurredAt,
+              participants: Array.from(new Set([...(existing.participants || []), ...names])),
+              appendCursor: item.lastMessageId
+                ? { id: item.lastMessageId, date: item.lastMessageDate == null ? null : String(item.lastMessageDate) }
+                : cursor,
+            }, ctx);
+            
+            results.push({ id: externalId, status: "appended", interactionId: existing.id });
+            processed++;
+            continue;
+          }
           if (existing) {
             results.push({ id: externalId, status: "skipped", interactionId: existing.id });
             processed++;
             continue;
           }
           
-          // Try to match to a person
-          let personId: string | undefined;
+          // Try to match to a person. Agents that already resolved the
+          // participants (via /api/sync/resolve-people) send personResolved,
+          // with personHint.id set when one matched.
+          let personId: string | undefined = item.personResolved ? personHint?.id || undefined : undefined;
           
           // Try by phone number from participants
-          const ctx = getTenantContext(req);
-          if (participants && Array.isArray(participants)) {
+          if (!item.personResolved && participants && Array.isArray(participants)) {
             for (const participant of participants) {
               if (participant.phone) {
                 const person = await storage.getPersonByPhone(participant.phone, ctx);
@@ -6353,7 +6412,7 @@ Return ONLY valid JSON, no explanations.`
           }
           
           // Use personHint if provided and no match yet
-          if (!personId && personHint) {
+          if (!personId && personHint && !item.personResolved) {
             if (personHint.id) {
               personId = personHint.id;
             } else if (personHint.phone) {
@@ -6383,6 +6442,9 @@ Return ONLY valid JSON, no explanations.`
             participants: participants?.map((p: any) => p.name || p.phone || p.email).filter(Boolean) || null,
             tags: [source],
             aiExtractedData: null,
+            appendCursor: item.mode === "append" && item.lastMessageId
+              ? { id: item.lastMessageId, date: item.lastMessageDate == null ? null : String(item.lastMessageDate) }
+              : null,
             deletedAt: null,
           });
           
@@ -6426,56 +6488,173 @@ Return ONLY valid JSON, no explanations.`
     }
   });
   
-  // Transcribe audio and create interaction (for Plaud)
-  app.post("/api/sync/transcribe", async (req, res) => {
+  // Resumable raw audio uploads (for Plaud). The agent PUTs the file in
+  // chunks at increasing byte offsets, then calls /api/sync/transcribe with
+  // the uploadId instead of audioBase64, so audio never passes through JSON.
+  const SYNC_UPLOAD_ID = /^[A-Za-z0-9_-]{1,128}$/;
+  const syncUploadPath = (uploadId: string) => path.join(uploadDir, `sync_upload_${uploadId}`);
+  const syncUploadOffset = (uploadId: string) => {
+    const filePath = syncUploadPath(uploadId);
+    return fs.existsSync(filePath) ? fs.statSync(filePath).size : 0;
+  };
+  // The source an upload was started for, kept next to it (uploadIds can't
+  // contain ".", so this never collides with an upload)
+  const syncUploadSourcePath = (uploadId: string) => `${syncUploadPath(uploadId)}.source`;
+  const removeSyncUpload = (uploadId: string) => {
+    fs.rmSync(syncUploadPath(uploadId), { force: true });
+    fs.rmSync(syncUploadSourcePath(uploadId), { force: true });
+  };
+  
+  // Whisper rejects larger files (same limit as uploadAudio), and a source
+  // can't leave more than this many uploads waiting for transcription
+  const SYNC_UPLOAD_MAX_BYTES = 25 * 1024 * 1024;
+  const SYNC_UPLOAD_MAX_PENDING = 20;
+  const pendingSyncUploads = (source: string) => {
+    let count = 0;
+    for (const name of fs.readdirSync(uploadDir)) {
+      if (!name.startsWith("sync_upload_") || !name.endsWith(".source")) continue;
+      const uploadId = name.slice("sync_upload_".length, -".source".length);
+      try {
+        if (fs.readFileSync(path.join(uploadDir, name), "utf8") === source && fs.existsSync(syncUploadPath(uploadId))) {
+          count++;
+        }
+      } catch {
+        // Removed by a concurrent request
+      }
+    }
+    return count;
+  };
+  
+  // An upload is kept until its transcription succeeds, so a failed
+  // transcription can be retried with the same uploadId. Uploads nobody
+  // came back for are removed after a week (checked at most hourly).
+  const SYNC_UPLOAD_MAX_AGE_MS = 7 * 24 * 60 * 60 * 1000;
+  let syncUploadsPrunedAt = 0;
+  const pruneSyncUploads = () => {
+    const now = Date.now();
+    if (now - syncUploadsPrunedAt < 60 * 60 * 1000) return;
+    syncUploadsPrunedAt = now;
+    for (const name of fs.readdirSync(uploadDir)) {
+      if (!name.startsWith("sync_upload_")) continue;
+      const filePath = path.join(uploadDir, name);
+      try {
+        if (now - fs.statSync(filePath).mtimeMs > SYNC_UPLOAD_MAX_AGE_MS) {
+          fs.unlinkSync(filePath);
+        }
+      } catch {
+        // Removed by a concurrent request
+      }
+    }
+  };
+  
+  // Current byte offset of an upload (0 if not started)
+  app.get("/api/sync/uploads/:uploadId", (req, res) => {
+    const { uploadId } = req.params;
+    if (!SYNC_UPLOAD_ID.test(uploadId)) {
+      return res.status(400).json({ message: "Invalid uploadId" });
+    }
+    res.json({ uploadId, offset: syncUploadOffset(uploadId) });
+  });
+  
+  // Append a raw (application/octet-stream) chunk at ?offset=N for ?source=
+  app.put("/api/sync/uploads/:uploadId", async (req, res) => {
+    let tooLarge = false;
     try {
-      const { audioUrl, audioBase64, source, externalId, timestamp, personHint } = req.body;
+      const { uploadId } = req.params;
+      if (!SYNC_UPLOAD_ID.test(uploadId)) {
+        return res.status(400).json({ message: "Invalid uploadId" });
+      }
       
-      if (!audioUrl && !audioBase64) {
-        return res.status(400).json({ message: "Either audioUrl or audioBase64 required" });
+      pruneSyncUploads();
+      const current = syncUploadOffset(uploadId);
+      const offset = Number(req.query.offset ?? 0);
+      if (offset !== current) {
+        return res.status(409).json({ message: "Offset mismatch", uploadId, offset: current });
       }
       
-      if (!externalId) {
-        return res.status(400).json({ message: "externalId required for deduplication" });
+      // Answered without reading the body, so the connection can't be reused
+      const declared = Number(req.headers["content-length"] ?? 0);
+      if (current + declared > SYNC_UPLOAD_MAX_BYTES) {
+        res.set("Connection", "close");
+        return res.status(413).json({ message: `Uploads are limited to ${SYNC_UPLOAD_MAX_BYTES} bytes` });
       }
       
-      // Check for existing
-      const existing = await storage.getInteractionByExternalId(externalId);
-      if (existing) {
-        return res.json({ 
-          status: "skipped", 
-          message: "Already exists",
-          interactionId: existing.id 
-        });
+      if (!fs.existsSync(syncUploadPath(uploadId))) {
+        const source = String(req.query.source ?? "unknown");
+        if (pendingSyncUploads(source) >= SYNC_UPLOAD_MAX_PENDING) {
+          res.set("Connection", "close");
+          return res.status(429).json({ message: `Too many pending uploads for ${source}` });
+        }
+        fs.writeFileSync(syncUploadSourcePath(uploadId), source);
       }
       
-      // Transcribe with Whisper
-      let transcript: string;
-      const openaiClient = getOpenAI();
+      // Stops a body sent without Content-Length once it passes the limit
+      let written = current;
+      const limit = new Transform({
+        transform(chunk, _encoding, callback) {
+          written += chunk.length;
+          if (written > SYNC_UPLOAD_MAX_BYTES) {
+            tooLarge = true;
+            return callback(new Error("Upload too large"));
+          }
+          callback(null, chunk);
+        },
+      });
       
-      if (audioBase64) {
-        // Decode base64 to buffer
-        const buffer = Buffer.from(audioBase64, 'base64');
-        const tempPath = path.join(uploadDir, `temp_${Date.now()}.m4a`);
-        fs.writeFileSync(tempPath, buffer);
-        
-        const file = fs.createReadStream(tempPath);
-        const transcription = await openaiClient.audio.transcriptions.create({
-          file,
-          model: "whisper-1",
-          response_format: "text",
-        });
-        transcript = transcription;
-        
-        // Clean up temp file
-        fs.unlinkSync(tempPath);
-      } else {
-        // Download from URL
-        const response = await fetch(audioUrl);
-        const buffer = Buffer.from(await response.arrayBuffer());
-        const tempPath = path.join(uploadDir, `temp_${Date.now()}.m4a`);
-        fs.writeFileSync(tempPath, buffer);
-        
+      // A dropped connection leaves whatever arrived on disk; the agent
+      // resumes from the offset reported by GET
+      await pipeline(req, limit, fs.createWriteStream(syncUploadPath(uploadId), { flags: "a" }));
+      res.json({ uploadId, offset: syncUploadOffset(uploadId) });
+    } catch (error: any) {
+      if (!res.headersSent) {
+        if (tooLarge) {
+          res.set("Connection", "close");
+          return res.status(413).json({ message: `Uploads are limited to ${SYNC_UPLOAD_MAX_BYTES} bytes` });
+        }
+        res.status(500).json({ message: error.message });
+      }
+    }
+  });
+  
+  // Transcriptions in progress, by uploadId (or externalId). A client that
+  // timed out and sends the request again waits for the running
+  // transcription instead of sending the recording to Whisper a second time.
+  const syncTranscriptions = new Map<string, Promise<{ code: number; body: Record<string, any> }>>();
+  
+  const transcribeSyncAudio = async (body: any, ctx: TenantContext) => {
+    const { audioUrl, audioBase64, uploadId, filename, source, externalId, timestamp, personHint } = body;
+    
+    // Check for existing (before the upload: a retry of a request that
+    // succeeded finds its upload already removed)
+    const existing = await storage.getInteractionByExternalId(externalId);
+    if (existing) {
+      if (uploadId) {
+        removeSyncUpload(uploadId);
+      }
+      return { code: 200, body: { 
+        status: "skipped", 
+        message: "Already exists",
+        interactionId: existing.id 
+      } };
+    }
+    
+    if (uploadId && !fs.existsSync(syncUploadPath(uploadId))) {
+      return { code: 400, body: { message: "Unknown uploadId" } };
+    }
+    pruneSyncUploads();
+    
+    // Transcribe with Whisper
+    let transcript: string;
+    const openaiClient = getOpenAI();
+    
+    if (uploadId) {
+      // Whisper detects the format from the extension. The upload stays
+      // in place until the interaction exists (see pruneSyncUploads).
+      const ext = path.extname(filename || "") || ".m4a";
+      const tempPath = path.join(uploadDir, `temp_${Date.now()}${ext}`);
+      fs.linkSync(syncUploadPath(uploadId), tempPath);
+      
+      try {
         const file = fs.createReadStream(tempPath);
         const transcription = await openaiClient.audio.transcriptions.create({
           file,
@@ -6483,54 +6662,119 @@ Return ONLY valid JSON, no explanations.`
           response_format: "text",
         });
         transcript = transcription;
-        
+      } finally {
         fs.unlinkSync(tempPath);
       }
+    } else if (audioBase64) {
+      // Decode base64 to buffer
+      const buffer = Buffer.from(audioBase64, 'base64');
+      const tempPath = path.join(uploadDir, `temp_${Date.now()}.m4a`);
+      fs.writeFileSync(tempPath, buffer);
       
-      // Try to match person
-      const ctx = getTenantContext(req);
-      let personId: string | undefined;
-      if (personHint) {
-        if (personHint.id) {
-          personId = personHint.id;
-        } else if (personHint.phone) {
-          const person = await storage.getPersonByPhone(personHint.phone, ctx);
-          if (person) personId = person.id;
-        } else if (personHint.name) {
-          const matches = await storage.searchPeopleByName(personHint.name, ctx);
-          if (matches.length === 1) personId = matches[0].id;
-        }
-      }
+      const file = fs.createReadStream(tempPath);
+      const transcription = await openaiClient.audio.transcriptions.create({
+        file,
+        model: "whisper-1",
+        response_format: "text",
+      });
+      transcript = transcription;
       
-      // Create interaction
-      const interaction = await storage.createInteraction({
-        personId: personId || null,
-        type: "call",
-        source: source || "plaud",
-        title: `Plaud Recording ${new Date(timestamp || Date.now()).toLocaleDateString()}`,
-        summary: null,
-        transcript,
-        externalId,
-        externalLink: audioUrl || null,
-        duration: null,
-        occurredAt: timestamp ? new Date(timestamp) : new Date(),
-        participants: null,
-        tags: ["plaud", "transcribed"],
-        aiExtractedData: null,
-        deletedAt: null,
+      // Clean up temp file
+      fs.unlinkSync(tempPath);
+    } else {
+      // Download from URL
+      const response = await fetch(audioUrl);
+      const buffer = Buffer.from(await response.arrayBuffer());
+      const tempPath = path.join(uploadDir, `temp_${Date.now()}.m4a`);
+      fs.writeFileSync(tempPath, buffer);
+      
+      const file = fs.createReadStream(tempPath);
+      const transcription = await openaiClient.audio.transcriptions.create({
+        file,
+        model: "whisper-1",
+        response_format: "text",
       });
+      transcript = transcription;
       
-      // Update person's lastContact if matched
-      if (personId) {
-        await storage.updatePerson(personId, { lastContact: interaction.occurredAt }, ctx);
+      fs.unlinkSync(tempPath);
+    }
+    
+    // Try to match person
+    let personId: string | undefined;
+    if (personHint) {
+      if (personHint.id) {
+        personId = personHint.id;
+      } else if (personHint.phone) {
+        const person = await storage.getPersonByPhone(personHint.phone, ctx);
+        if (person) personId = person.id;
+      } else if (personHint.name) {
+        const matches = await storage.searchPeopleByName(personHint.name, ctx);
+        if (matches.length === 1) personId = matches[0].id;
       }
+    }
+    
+    // Create interaction
+    const interaction = await storage.createInteraction({
+      personId: personId || null,
+      type: "call",
+      source: source || "plaud",
+      title: `Plaud Recording ${new Date(timestamp || Date.now()).toLocaleDateString()}`,
+      summary: null,
+      transcript,
+      externalId,
+      externalLink: audioUrl || null,
+      duration: null,
+      occurredAt: timestamp ? new Date(timestamp) : new Date(),
+      participants: null,
+      tags: ["plaud", "transcribed"],
+      aiExtractedData: null,
+      deletedAt: null,
+    });
+    
+    if (uploadId) {
+      removeSyncUpload(uploadId);
+    }
+    
+    // Update person's lastContact if matched
+    if (personId) {
+      await storage.updatePerson(personId, { lastContact: interaction.occurredAt }, ctx);
+    }
+    
+    return { code: 200, body: {
+      status: "created",
+      interactionId: interaction.id,
+      personId,
+      transcriptLength: transcript.length,
+    } };
+  };
+  
+  // Transcribe audio and create interaction (for Plaud)
+  app.post("/api/sync/transcribe", async (req, res) => {
+    try {
+      const { audioUrl, audioBase64, uploadId, externalId } = req.body;
       
-      res.json({
-        status: "created",
-        interactionId: interaction.id,
-        personId,
-        transcriptLength: transcript.length,
-      });
+      if (!audioUrl && !audioBase64 && !uploadId) {
+        return res.status(400).json({ message: "Either audioUrl, audioBase64 or uploadId required" });
+      }
+      
+      if (uploadId && !SYNC_UPLOAD_ID.test(uploadId)) {
+        return res.status(400).json({ message: "Invalid uploadId" });
+      }
+      
+      if (!externalId) {
+        return res.status(400).json({ message: "externalId required for deduplication" });
+      }
+      
+      const key = uploadId || externalId;
+      let pending = syncTranscriptions.get(key);
+      if (!pending) {
+        pending = transcribeSyncAudio(req.body, getTenantContext(req))
+          .finally(() => syncTranscriptions.delete(key));
+        syncTranscriptions.set(key, pending);
+      }
+      
+      const { code, body } = await pending;
+      res.status(code).json(body);
     } catch (error: any) {
       res.status(500).json({ message: error.message });
     }
@@ -6563,6 +6807,63 @@ Return ONLY valid JSON, no explanations.`
     }
   });
 
+  // Resolve many participants at once (local agents send personHint.id
+  // with their pushes instead of having every item matched here).
+  // Each identifier is {phone} | {email} | {name}; a name resolves only
+  // when exactly one person matches, as in /api/sync/push.
+  app.post("/api/sync/resolve-people", async (req, res) => {
+    try {
+      const { identifiers } = req.body;
+      const ctx = getTenantContext(req);
+      
+      if (!identifiers || !Array.isArray(identifiers)) {
+        return res.status(400).json({ message: "Identifiers array required" });
+      }
+      if (identifiers.length > 1000) {
+        return res.status(400).json({ message: "At most 1000 identifiers per request" });
+      }
+      
+      // Read the people table once for the whole request and match in
+      // memory, by the same rules as getPersonByPhone, getPersonByEmail
+      // and searchPeopleByName.
+      const allPeople = await storage.getAllPeople(ctx);
+      const phones = allPeople
+        .filter((person) => person.phone)
+        .map((person) => ({ id: person.id, digits: person.phone!.replace(/\D/g, '') }))
+        .filter((p) => p.digits);
+      const emails = new Map<string, string>();
+      for (const person of allPeople) {
+        const email = person.email?.toLowerCase();
+        if (email && !emails.has(email)) emails.set(email, person.id);
+      }
+      const names = allPeople.map((person) => ({ id: person.id, name: person.name.toLowerCase() }));
+      
+      const personIds = identifiers.map((identifier: any) => {
+        if (identifier?.phone) {
+          const digits = String(identifier.phone).replace(/\D/g, '');
+          if (!digits) return null;
+          const match = phones.find((p) =>
+            p.digits === digits || p.digits.endsWith(digits) || digits.endsWith(p.digits)
+          );
+          return match ? match.id : null;
+        }
+        if (identifier?.email) {
+          return emails.get(String(identifier.email).toLowerCase()) ?? null;
+        }
+        if (identifier?.name) {
+          const lowerName = String(identifier.name).toLowerCase();
+          const matches = names.filter((p) => p.name.includes(lowerName));
+          return matches.length === 1 ? matches[0].id : null;
+        }
+        return null;
+      });
+      
+      res.json({ personIds });
+    } catch (error: any) {
+      res.status(500).json({ message: error.message });
+    }
+  });
+
   // ===== HANDWRITTEN NOTE UPLOADS =====
   
   // Get all handwritten note uploads
@@ -2039,6 +2039,7 @@ export class DatabaseStorage implements IStorage {
   async getPersonByPhone(phone: string, ctx?: TenantContext): Promise<Person | undefined> {
     // Normalize phone for matching (strip non-digits)
     const normalized = phone.replace(/\D/g, '');
+    if (!normalized) return undefined;
     const filter = this.getTenantFilter(people, ctx);
     const allPeople = filter 
       ? await db.select().from(people).where(filter)
@@ -2046,6 +2047,7 @@ export class DatabaseStorage implements IStorage {
     const match = allPeople.find(p => {
       if (!p.phone) return false;
       const pNormalized = p.phone.replace(/\D/g, '');
+      if (!pNormalized) return false;
       return pNormalized === normalized || pNormalized.endsWith(normalized) || normalized.endsWith(pNormalized);
     });
     return match || undefined;
@@ -734,6 +734,7 @@ export const interactions = pgTable("interactions", {
   tags: text("tags").array(),
   aiExtractedData: jsonb("ai_extracted_data"), // FORD notes, action items, etc.
   coachingAnalysis: jsonb("coaching_analysis"), // AI coaching feedback on conversation quality
+  appendCursor: jsonb("append_cursor"), // {id, date} of the last message appended by a sync agent
   deletedAt: timestamp("deleted_at"), // soft delete - null means not deleted
   createdAt: timestamp("created_at").defaultNow().notNull(),
   updatedAt: timestamp("updated_at").defaultNow().notNull(),